@@ -1,13 +1,30 @@
 import os
 import logging
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context, session
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+import io
 import tempfile
 import json
+import tarfile
+import zipfile
 from utils.ai_service import AIService
 from utils.simple_security import SimpleSecurityAnalyzer
 from utils.code_executor import CodeExecutor
+from utils.pytest_forkserver import PytestForkServer
+from utils.sandbox_pool import SandboxPool
+from utils.resource_limits import ResourceLimits
+from utils.response_cache import ResponseCache
+from utils.report_cache import SecurityReportCache
+from utils.test_result_cache import TestResultCache
+from utils.artifact_store import ArtifactStore, ArtifactNotFound
+from utils.rate_limiter import RateLimiter
+from utils.job_queue import JobQueue
+from utils.batch_converter import BatchConverter
+from utils.auto_fix import AutoFixRunner
+from utils.client_registry import ClientRegistry
+from utils.model_cache import ModelListCache
+from utils.code_fences import strip_code_fences
 
 # Enable debug logging
 logging.basicConfig(level=logging.DEBUG)
@@ -21,13 +38,153 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 UPLOAD_FOLDER = tempfile.gettempdir()
 ALLOWED_EXTENSIONS = {'php', 'txt'}
 
-ai_service = AIService()
-security_analyzer = SimpleSecurityAnalyzer()
-code_executor = CodeExecutor()
+# PHP files longer than this are converted chunk by chunk
+LARGE_FILE_LINES = int(os.environ.get('LARGE_FILE_LINES', '300'))
+# Fix candidates requested and tested in parallel per auto-fix round (1 = one at a time)
+AUTO_FIX_CANDIDATES = int(os.environ.get('AUTO_FIX_CANDIDATES', '1'))
+# Downloads are streamed in chunks without temp files; unknown extensions are sent as text/plain
+DOWNLOAD_MIME_TYPES = {'py': 'text/x-python', 'php': 'application/x-httpd-php', 'md': 'text/markdown'}
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+# Request fields that may be sent as '<field>_artifact' IDs returned by an earlier response
+ARTIFACT_FIELDS = ('php_code', 'python_code', 'code', 'security_report', 'test_code')
+
+response_cache = ResponseCache.from_env()
+rate_limiter = RateLimiter.from_env()
+# Each browser session gets its own connected client; caches and limits are shared
+client_registry = ClientRegistry(
+    lambda: AIService(response_cache=response_cache, rate_limiter=rate_limiter),
+    idle_ttl=int(os.environ.get('CLIENT_IDLE_TTL', '1800')),
+    sweep_interval=int(os.environ.get('CLIENT_SWEEP_INTERVAL', '60')),
+    model_cache=ModelListCache(
+        ttl=int(os.environ.get('MODEL_LIST_TTL', str(6 * 3600))),
+        refresh_after=int(os.environ.get('MODEL_LIST_REFRESH_AFTER', '3600'))
+    )
+)
+security_report_cache = SecurityReportCache.from_env()
+artifact_store = ArtifactStore.from_env()
+security_analyzer = SimpleSecurityAnalyzer(report_cache=security_report_cache)
+job_queue = JobQueue(
+    max_workers=int(os.environ.get('JOB_WORKERS', '2')),
+    result_ttl=int(os.environ.get('JOB_RESULT_TTL', '3600'))
+)
+test_job_queue = JobQueue(
+    max_workers=int(os.environ.get('TEST_JOB_WORKERS', '2')),
+    result_ttl=int(os.environ.get('JOB_RESULT_TTL', '3600'))
+)
+test_result_cache = TestResultCache.from_env()
+# Test runs that can execute at once: one per test worker, times the fix candidates tested in parallel
+concurrent_test_runs = test_job_queue.max_workers * max(1, AUTO_FIX_CANDIDATES)
+code_executor = CodeExecutor(
+    fork_server=PytestForkServer.from_env(),
+    # One sandbox per concurrent run (code only runs from test jobs); a run's shards share its sandbox
+    sandbox_pool=SandboxPool.from_env(default_size=concurrent_test_runs),
+    resource_limits=ResourceLimits.from_env(),
+    max_output_bytes=int(os.environ.get('EXEC_MAX_OUTPUT_BYTES', str(1024 * 1024))),
+    # Opt-in: split large or slow suites across several pytest processes, never more than the
+    # CPUs each concurrent run can have
+    max_shards=min(int(os.environ.get('EXEC_TEST_SHARDS', '1')),
+                   max(1, (os.cpu_count() or 1) // concurrent_test_runs)),
+    shard_min_tests=int(os.environ.get('EXEC_SHARD_MIN_TESTS', '20')),
+    shard_min_seconds=float(os.environ.get('EXEC_SHARD_MIN_SECONDS', '5')),
+    result_cache=test_result_cache
+)
+security_job_queue = JobQueue(
+    max_workers=int(os.environ.get('SECURITY_JOB_WORKERS', '4')),
+    result_ttl=int(os.environ.get('JOB_RESULT_TTL', '3600'))
+)
+batch_converter = BatchConverter(
+    max_workers=int(os.environ.get('BATCH_FILE_WORKERS', '4')),
+    large_file_lines=LARGE_FILE_LINES
+)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def load_provider_config():
+    """Read an optional server-side provider from AI_PROVIDER_CONFIG (JSON file) or AI_* variables"""
+    config = {}
+    config_path = os.environ.get('AI_PROVIDER_CONFIG')
+    if config_path:
+        with open(config_path) as f:
+            config = json.load(f)
+    
+    base_url = os.environ.get('AI_BASE_URL', config.get('base_url', '')).strip()
+    api_key = os.environ.get('AI_API_KEY', config.get('api_key', '')).strip()
+    default_model = os.environ.get('AI_DEFAULT_MODEL', config.get('default_model', '')).strip()
+    
+    if base_url and api_key:
+        return {'base_url': base_url, 'api_key': api_key, 'default_model': default_model or None}
+    return None
+
+provider_config = load_provider_config()
+if provider_config:
+    client_registry.configure_default(
+        provider_config['base_url'], provider_config['api_key'], provider_config['default_model']
+    )
+    logging.info(f"Using preconfigured AI provider at {provider_config['base_url']}")
+
+def get_ai_service():
+    """Return the AI client connected by this browser session.
+
+    Sessions that have not connected use the preconfigured provider if there is
+    one, otherwise an unconnected client whose requests fail with the usual
+    "API not connected" error.
+    """
+    client = client_registry.get(session.get('client_id'))
+    if client is None:
+        return AIService(response_cache=response_cache, rate_limiter=rate_limiter)
+    return client
+
+def invalidate_security_reports(language, *codes):
+    """Drop cached security reports for code that a fix endpoint has changed"""
+    if security_report_cache:
+        for code in codes:
+            security_report_cache.invalidate(code, language)
+
+def artifact_ids(**documents):
+    """Store documents and return their artifact IDs for the response's 'artifacts' map"""
+    return {field: artifact_store.put(value, field) for field, value in documents.items() if value}
+
+@app.before_request
+def resolve_artifact_references():
+    """Swap '<field>_artifact' IDs in JSON bodies for the stored documents before any endpoint runs"""
+    if request.method != 'POST' or not request.is_json:
+        return None
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None
+    try:
+        for field in ARTIFACT_FIELDS:
+            artifact_store.resolve(data, field)
+    except ArtifactNotFound as e:
+        # The client still holds the document and can resend it inline
+        return jsonify({'error': str(e), 'artifact_missing': e.field}), 404
+    return None
+
+def sse_event(data, event=None):
+    """Format a Server-Sent Events message with a JSON payload"""
+    message = f'event: {event}\n' if event else ''
+    return message + f'data: {json.dumps(data)}\n\n'
+
+def stream_completion(tokens, finalize, error_prefix):
+    """Relay AI tokens to the browser as SSE, then send the final result as a 'done' event"""
+    def generate():
+        chunks = []
+        try:
+            for token in tokens:
+                chunks.append(token)
+                yield sse_event({'token': token})
+            yield sse_event(finalize(''.join(chunks)), 'done')
+        except Exception as e:
+            logging.error(f"{error_prefix}: {str(e)}")
+            yield sse_event({'error': f'{error_prefix}: {str(e)}'}, 'error')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/')
 def index():
     """Main application page"""
@@ -44,8 +201,11 @@ def connect_api():
         if not base_url or not api_key:
             return jsonify({'error': 'Base URL and API Key are required'}), 400
         
+        if 'client_id' not in session:
+            session['client_id'] = ClientRegistry.new_client_id()
+        
         # Test connection and get models
-        models = ai_service.connect_and_get_models(base_url, api_key)
+        models = client_registry.connect(session['client_id'], base_url, api_key)
         
         return jsonify({
             'success': True,
@@ -57,10 +217,32 @@ def connect_api():
         logging.error(f"API connection error: {str(e)}")
         return jsonify({'error': f'Connection failed: {str(e)}'}), 500
 
+@app.route('/api/config')
+def provider_status():
+    """Tell the browser whether a server-side provider is ready, with its models"""
+    client = client_registry.default_client
+    if not client:
+        return jsonify({'success': True, 'preconfigured': False})
+    
+    try:
+        models = client_registry.model_cache.get_or_fetch(client.base_url, client.api_key, client.fetch_models)
+    except Exception as e:
+        logging.error(f"Preconfigured provider error: {str(e)}")
+        return jsonify({'success': False, 'preconfigured': True, 'error': f'Connection failed: {str(e)}'}), 502
+    
+    return jsonify({
+        'success': True,
+        'preconfigured': True,
+        'provider': client.provider,
+        'default_model': client_registry.default_model,
+        'models': models
+    })
+
 @app.route('/api/convert', methods=['POST'])
 def convert_code():
     """Convert PHP code to Python using AI"""
     try:
+        ai_service = get_ai_service()
         data = request.get_json()
         php_code = data.get('php_code', '').strip()
         model = data.get('model', '')
@@ -72,29 +254,51 @@ def convert_code():
         if not model:
             return jsonify({'error': 'Model selection is required'}), 400
         
+        def finalize(raw_code):
+            # Clean up the code - remove markdown formatting if present
+            python_code = strip_code_fences(raw_code)
+            
+            # Analyze security but don't auto-fix - let user decide
+            security_report = None
+            security_report_id = None
+            if apply_security:
+                if security_report_cache:
+                    security_report = security_report_cache.get(python_code, 'python', model)
+                if security_report is None:
+                    # Return the instant pattern-based result now and compute the AI report in the background
+                    security_report = security_analyzer._pattern_security_analysis(python_code, 'python')
+                    security_report['ai_report_pending'] = True
+                    job = security_job_queue.submit(
+                        'security_report',
+                        lambda job: security_analyzer.analyze_code_security(python_code, 'python', model, ai_service)
+                    )
+                    security_report_id = job.id
+            
+            return {
+                'success': True,
+                'python_code': python_code,
+                'security_report': security_report,
+                'security_report_id': security_report_id,
+                'artifacts': artifact_ids(
+                    php_code=php_code, python_code=python_code,
+                    security_report=None if security_report_id else security_report
+                )
+            }
+        
+        # Large files are split at top-level declarations and converted in parallel
+        large_file = data.get('large_file', php_code.count('\n') + 1 > LARGE_FILE_LINES)
+        if large_file:
+            python_code = ai_service.convert_large_php_to_python(php_code, model, apply_security)
+            return jsonify(finalize(python_code))
+        
+        if data.get('stream'):
+            tokens = ai_service.convert_php_to_python(php_code, model, apply_security, stream=True)
+            return stream_completion(tokens, finalize, 'Conversion failed')
+        
         # Convert PHP to Python
         python_code = ai_service.convert_php_to_python(php_code, model, apply_security)
         
-        # Clean up the code - remove markdown formatting if present
-        python_code = python_code.strip()
-        if python_code.startswith('```python'):
-            python_code = python_code[9:]
-        if python_code.startswith('```'):
-            python_code = python_code[3:]
-        if python_code.endswith('```'):
-            python_code = python_code[:-3]
-        python_code = python_code.strip()
-        
-        # Analyze security but don't auto-fix - let user decide
-        security_report = None
-        if apply_security:
-            security_report = security_analyzer.analyze_code_security(python_code, 'python', model, ai_service)
-        
-        return jsonify({
-            'success': True,
-            'python_code': python_code,
-            'security_report': security_report
-        })
+        return jsonify(finalize(python_code))
         
     except Exception as e:
         logging.error(f"Code conversion error: {str(e)}")
@@ -104,6 +308,7 @@ def convert_code():
 def explain_code():
     """Generate code explanation using AI"""
     try:
+        ai_service = get_ai_service()
         data = request.get_json()
         code = data.get('code', '').strip()
         language = data.get('language', 'python')
@@ -112,6 +317,13 @@ def explain_code():
         if not code:
             return jsonify({'error': 'Code is required'}), 400
         
+        if data.get('stream'):
+            tokens = ai_service.explain_code(code, language, model, stream=True)
+            return stream_completion(
+                tokens, lambda explanation: {'success': True, 'explanation': explanation},
+                'Explanation failed'
+            )
+        
         explanation = ai_service.explain_code(code, language, model)
         
         return jsonify({
@@ -123,13 +335,30 @@ def explain_code():
         logging.error(f"Code explanation error: {str(e)}")
         return jsonify({'error': f'Explanation failed: {str(e)}'}), 500
 
+@app.route('/api/security-report/<report_id>')
+def security_report_status(report_id):
+    """Fetch the AI security report deferred by /api/convert"""
+    job = security_job_queue.get(report_id)
+    if not job or job.kind != 'security_report':
+        return jsonify({'error': 'Security report not found'}), 404
+    
+    return jsonify({
+        'success': job.status != 'failed',
+        'status': job.status,
+        'security_report': job.result if job.status == 'completed' else None,
+        'error': job.error,
+        'artifacts': artifact_ids(security_report=job.result) if job.status == 'completed' else {}
+    })
+
 @app.route('/api/analyze-security', methods=['POST'])
 def analyze_security():
     """Analyze code security for PHP or Python with fresh implementation"""
+    # Read first: the fallback report below needs it even if anything else fails
+    data = request.get_json(silent=True) or {}
+    language = str(data.get('language') or 'python').lower()
     try:
-        data = request.get_json()
+        ai_service = get_ai_service()
         code = data.get('code', '').strip()
-        language = data.get('language', 'python').lower()
         model = data.get('model', '')
         
         if not code:
@@ -138,108 +367,15 @@ def analyze_security():
         if not model:
             return jsonify({'error': 'Model selection is required'}), 400
         
-        # Fresh security analysis using AI directly
-        if language == 'php':
-            prompt = f"""Analyze this PHP code for security vulnerabilities and return a JSON response:
-
-PHP Code:
-```php
-{code}
-```
-
-Return exactly this JSON format:
-{{
-    "vulnerabilities_found": 0,
-    "security_score": 85,
-    "overall_assessment": "Brief security assessment",
-    "issues": [
-        {{
-            "type": "sql_injection",
-            "severity": "High",
-            "line": 5,
-            "title": "SQL Injection Risk",
-            "description": "User input not properly sanitized",
-            "fix": "Use prepared statements with PDO"
-        }}
-    ],
-    "recommendations": [
-        "Use prepared statements for database queries",
-        "Escape output with htmlspecialchars()",
-        "Validate all user inputs"
-    ]
-}}"""
-        else:
-            prompt = f"""Analyze this Python code for security vulnerabilities and return a JSON response:
-
-Python Code:
-```python
-{code}
-```
-
-Return exactly this JSON format:
-{{
-    "vulnerabilities_found": 0,
-    "security_score": 85,
-    "overall_assessment": "Brief security assessment",
-    "issues": [
-        {{
-            "type": "code_injection",
-            "severity": "High",
-            "line": 3,
-            "title": "Code Injection Risk",
-            "description": "Use of eval() function",
-            "fix": "Replace eval() with safe alternatives"
-        }}
-    ],
-    "recommendations": [
-        "Avoid eval(), exec(), compile() functions",
-        "Use parameterized queries",
-        "Validate all inputs"
-    ]
-}}"""
-
-        messages = [{"role": "user", "content": prompt}]
-        response = ai_service._make_chat_request(messages, model)
+        # Whole-file reports are reused as-is; otherwise only changed functions/classes go to the model
+        security_report = security_analyzer.analyze_code_security(code, language, model, ai_service)
         
-        # Parse JSON response
-        import json
-        try:
-            # Clean response
-            clean_response = response.strip()
-            if clean_response.startswith('```json'):
-                clean_response = clean_response[7:]
-            if clean_response.startswith('```'):
-                clean_response = clean_response[3:]
-            if clean_response.endswith('```'):
-                clean_response = clean_response[:-3]
-            
-            security_report = json.loads(clean_response.strip())
-            security_report['language'] = language.upper()
-            
-            return jsonify({
-                'success': True,
-                'security_report': security_report,
-                'language': language
-            })
-            
-        except json.JSONDecodeError:
-            # Fallback response if JSON parsing fails
-            return jsonify({
-                'success': True,
-                'security_report': {
-                    'vulnerabilities_found': 0,
-                    'security_score': 80,
-                    'overall_assessment': f'{language.upper()} security analysis completed',
-                    'issues': [],
-                    'recommendations': [
-                        'Use secure coding practices',
-                        'Validate all user inputs',
-                        'Keep dependencies updated'
-                    ],
-                    'language': language.upper()
-                },
-                'language': language
-            })
+        return jsonify({
+            'success': True,
+            'security_report': security_report,
+            'language': language,
+            'artifacts': artifact_ids(security_report=security_report)
+        })
         
     except Exception as e:
         logging.error(f"Security analysis error: {str(e)}")
@@ -264,6 +400,7 @@ Return exactly this JSON format:
 def apply_security_fixes():
     """Apply security fixes to PHP or Python code when user clicks apply"""
     try:
+        ai_service = get_ai_service()
         data = request.get_json()
         php_code = data.get('php_code', '').strip()
         python_code = data.get('python_code', '').strip()
@@ -333,17 +470,12 @@ Apply these Python security fixes:
 Return only the fixed Python code without any markdown formatting or explanations."""
 
         messages = [{"role": "user", "content": prompt}]
-        response = ai_service._make_chat_request(messages, model)
-        
-        # Clean up the fixed code
-        fixed_code = response.strip()
-        if fixed_code.startswith(f'```{language}'):
-            fixed_code = fixed_code[len(f'```{language}'):]
-        if fixed_code.startswith('```'):
-            fixed_code = fixed_code[3:]
-        if fixed_code.endswith('```'):
-            fixed_code = fixed_code[:-3]
-        fixed_code = fixed_code.strip()
+        response = ai_service._make_chat_request(messages, model, cache_namespace='security_fix')
+        
+        fixed_code = strip_code_fences(response)
+        
+        # Reports for the old code no longer describe what the user has
+        invalidate_security_reports(language, code_to_fix, fixed_code)
         
         # Create response
         response_data = {
@@ -365,10 +497,11 @@ Return only the fixed Python code without any markdown formatting or explanation
         }
         
         # Add the fixed code with the appropriate key
-        if language == 'php':
-            response_data['php_code'] = fixed_code
-        else:
-            response_data['python_code'] = fixed_code
+        code_field = 'php_code' if language == 'php' else 'python_code'
+        response_data[code_field] = fixed_code
+        response_data['artifacts'] = artifact_ids(
+            **{code_field: fixed_code}, security_report=response_data['security_report']
+        )
         
         return jsonify(response_data)
         
@@ -401,8 +534,8 @@ def apply_individual_security_fix():
         
         logging.info(f"Applying individual {language.upper()} security fix for: {issue.get('title', 'Unknown issue')}")
         
-        ai_service = AIService()
-        if not ai_service.connect():
+        ai_service = get_ai_service()
+        if not ai_service.api_key:
             return jsonify({'error': 'AI service not available'}), 503
         
         # Create targeted security fix prompt
@@ -427,17 +560,11 @@ Return ONLY the fixed {language.upper()} code without any explanations or markdo
 """
         
         messages = [{"role": "user", "content": prompt}]
-        response = ai_service._make_chat_request(messages, model)
-        
-        # Clean up the fixed code
-        fixed_code = response.strip()
-        if fixed_code.startswith(f'```{language}'):
-            fixed_code = fixed_code[len(f'```{language}'):]
-        if fixed_code.startswith('```'):
-            fixed_code = fixed_code[3:]
-        if fixed_code.endswith('```'):
-            fixed_code = fixed_code[:-3]
-        fixed_code = fixed_code.strip()
+        response = ai_service._make_chat_request(messages, model, cache_namespace='security_fix')
+        
+        fixed_code = strip_code_fences(response)
+        
+        invalidate_security_reports(language, code_to_fix, fixed_code)
         
         # Create response
         response_data = {
@@ -447,10 +574,9 @@ Return ONLY the fixed {language.upper()} code without any explanations or markdo
         }
         
         # Add the fixed code with the appropriate key
-        if language == 'php':
-            response_data['php_code'] = fixed_code
-        else:
-            response_data['python_code'] = fixed_code
+        code_field = 'php_code' if language == 'php' else 'python_code'
+        response_data[code_field] = fixed_code
+        response_data['artifacts'] = artifact_ids(**{code_field: fixed_code})
         
         return jsonify(response_data)
         
@@ -460,8 +586,9 @@ Return ONLY the fixed {language.upper()} code without any explanations or markdo
 
 @app.route('/api/test', methods=['POST'])
 def test_code():
-    """Generate and run tests for Python code with automatic fixing"""
+    """Queue test generation, execution and automatic fixing for Python code"""
     try:
+        ai_service = get_ai_service()
         data = request.get_json()
         python_code = data.get('python_code', '').strip()
         model = data.get('model', '')
@@ -469,61 +596,98 @@ def test_code():
         if not python_code:
             return jsonify({'error': 'Python code is required'}), 400
         
-        # Generate test cases using AI
-        test_code = ai_service.generate_tests(python_code, model)
+        by_reference = bool(data.get('python_code_artifact'))
         
-        # Execute tests
-        test_results = code_executor.run_tests(python_code, test_code)
-        
-        # If tests fail, automatically fix the code with multiple attempts
-        fixed_code = python_code
-        fix_attempts = 0
-        max_attempts = 3
-        
-        while not test_results['success'] and fix_attempts < max_attempts:
-            fix_attempts += 1
-            logging.info(f"Tests failed, attempting automatic fix (attempt {fix_attempts}/{max_attempts})...")
-            
-            # Try to fix the code
-            attempt_fixed_code = ai_service.fix_failing_code(
-                fixed_code, test_code, test_results, model
+        def run_test_job(job):
+            result = AutoFixRunner(ai_service, code_executor, candidates=AUTO_FIX_CANDIDATES).run(
+                python_code, model, progress=job.update, on_event=job.emit, cancel=job.cancelled
             )
-            
-            # Re-run tests on fixed code
-            if attempt_fixed_code != fixed_code and attempt_fixed_code.strip():
-                fixed_code = attempt_fixed_code
-                new_test_results = code_executor.run_tests(fixed_code, test_code)
-                
-                if new_test_results['success']:
-                    test_results = new_test_results
-                    test_results['auto_fixed'] = True
-                    test_results['fix_attempts'] = fix_attempts
-                    test_results['original_code'] = python_code
-                    test_results['fixed_code'] = fixed_code
-                    logging.info(f"Code successfully fixed after {fix_attempts} attempts!")
-                    break
-                else:
-                    test_results = new_test_results
-                    logging.info(f"Fix attempt {fix_attempts} still has issues, trying again...")
-            else:
-                logging.warning(f"Fix attempt {fix_attempts} produced no changes")
-                break
+            result['artifacts'] = artifact_ids(python_code=result['python_code'], test_code=result['test_code'])
+            # Don't echo back code the client sent by reference unless auto-fix changed it
+            if by_reference and result['python_code'] == python_code:
+                del result['python_code']
+            return result
+        
+        # The cycle can take minutes, so it runs on the job queue and the client polls
+        job = test_job_queue.submit('test', run_test_job)
         
         return jsonify({
             'success': True,
-            'test_code': test_code,
-            'test_results': test_results,
-            'python_code': fixed_code if 'auto_fixed' in test_results else python_code
-        })
+            'job_id': job.id,
+            'status_url': f'/api/test/{job.id}',
+            'events_url': f'/api/test/{job.id}/events',
+            'cancel_url': f'/api/test/{job.id}/cancel'
+        }), 202
         
     except Exception as e:
         logging.error(f"Code testing error: {str(e)}")
         return jsonify({'error': f'Testing failed: {str(e)}'}), 500
 
+@app.route('/api/test/<job_id>')
+def test_status(job_id):
+    """Poll a test job; once completed the result holds test_code, test_results and python_code"""
+    job = test_job_queue.get(job_id)
+    if not job or job.kind != 'test':
+        return jsonify({'error': 'Test job not found'}), 404
+    
+    status = job.to_dict()
+    if job.status == 'failed':
+        status['error'] = f'Testing failed: {job.error}'
+    
+    return jsonify({'success': job.status != 'failed', **status})
+
+@app.route('/api/test/<job_id>/events')
+def test_events(job_id):
+    """Stream a test job as SSE: stage changes, pytest output and per-test results with the fix round.
+
+    Reconnecting clients resume after the Last-Event-ID they saw. Closing the
+    stream leaves the job running; stop it with POST /api/test/<job_id>/cancel.
+    """
+    job = test_job_queue.get(job_id)
+    if not job or job.kind != 'test':
+        return jsonify({'error': 'Test job not found'}), 404
+    
+    last_seq = request.headers.get('Last-Event-ID', type=int) or 0
+    
+    def generate():
+        seq = last_seq
+        job.subscribe()
+        try:
+            while True:
+                events = job.events_since(seq)
+                for seq, event in events:
+                    yield f'id: {seq}\n' + sse_event(event, event['type'])
+                if job.finished and not job.events_since(seq, timeout=0):
+                    break
+                if not events:
+                    # Keep proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+            status = job.to_dict()
+            yield sse_event(status, 'done' if job.status == 'completed' else 'error')
+        finally:
+            job.unsubscribe()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/test/<job_id>/cancel', methods=['POST'])
+def cancel_test(job_id):
+    """Stop a running test job at its next checkpoint"""
+    job = test_job_queue.get(job_id)
+    if not job or job.kind != 'test':
+        return jsonify({'error': 'Test job not found'}), 404
+    
+    job.cancel()
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
+
 @app.route('/api/generate-docs', methods=['POST'])
 def generate_docs():
     """Generate documentation for converted code"""
     try:
+        ai_service = get_ai_service()
         data = request.get_json()
         python_code = data.get('python_code', '').strip()
         php_code = data.get('php_code', '').strip()
@@ -533,13 +697,28 @@ def generate_docs():
         if not python_code:
             return jsonify({'error': 'Python code is required'}), 400
         
+        if data.get('stream'):
+            tokens = ai_service.generate_documentation(
+                python_code, php_code, security_report, model, stream=True
+            )
+            return stream_completion(
+                tokens,
+                lambda documentation: {
+                    'success': True,
+                    'documentation': documentation,
+                    'artifacts': artifact_ids(documentation=documentation)
+                },
+                'Documentation generation failed'
+            )
+        
         documentation = ai_service.generate_documentation(
             python_code, php_code, security_report, model
         )
         
         return jsonify({
             'success': True,
-            'documentation': documentation
+            'documentation': documentation,
+            'artifacts': artifact_ids(documentation=documentation)
         })
         
     except Exception as e:
@@ -566,44 +745,131 @@ def upload_file():
         return jsonify({
             'success': True,
             'content': content,
-            'filename': secure_filename(file.filename)
+            'filename': secure_filename(file.filename),
+            'artifacts': artifact_ids(php_code=content)
         })
         
     except Exception as e:
         logging.error(f"File upload error: {str(e)}")
         return jsonify({'error': f'File upload failed: {str(e)}'}), 500
 
-@app.route('/api/download/<file_type>')
+@app.route('/api/batch/convert', methods=['POST'])
+def batch_convert():
+    """Start a background job converting every PHP file in an uploaded project archive"""
+    try:
+        ai_service = get_ai_service()
+        if 'file' not in request.files:
+            return jsonify({'error': 'No project archive provided'}), 400
+        
+        file = request.files['file']
+        model = request.form.get('model', '')
+        apply_security = request.form.get('apply_security', 'true').lower() != 'false'
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        if not model:
+            return jsonify({'error': 'Model selection is required'}), 400
+        
+        try:
+            files = batch_converter.extract_php_files(file.filename, file.read())
+        except (ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+            return jsonify({'error': f'Invalid project archive: {str(e)}'}), 400
+        
+        job = job_queue.submit('batch_convert', batch_converter.convert, ai_service, files, model, apply_security)
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'total_files': len(files)
+        }), 202
+        
+    except Exception as e:
+        logging.error(f"Batch conversion error: {str(e)}")
+        return jsonify({'error': f'Batch conversion failed: {str(e)}'}), 500
+
+@app.route('/api/batch/<job_id>')
+def batch_status(job_id):
+    """Report per-file progress, failures and timings of a batch conversion job"""
+    job = job_queue.get(job_id)
+    if not job or job.kind != 'batch_convert':
+        return jsonify({'error': 'Batch job not found'}), 404
+    
+    status = job.to_dict(include_result=False)
+    if job.status == 'completed':
+        status['failures'] = job.result['failures']
+        status['total_seconds'] = job.result['total_seconds']
+        status['download_url'] = f'/api/batch/{job.id}/download'
+    
+    return jsonify({'success': True, **status})
+
+@app.route('/api/batch/<job_id>/download')
+def batch_download(job_id):
+    """Download the converted project tree as a zip archive"""
+    job = job_queue.get(job_id)
+    if not job or job.kind != 'batch_convert':
+        return jsonify({'error': 'Batch job not found'}), 404
+    
+    if job.status != 'completed':
+        return jsonify({'error': f'Batch job is {job.status}'}), 409
+    
+    archive = batch_converter.build_archive(job.result, job.progress)
+    return send_file(
+        io.BytesIO(archive),
+        as_attachment=True,
+        download_name=f'converted_project_{job.id[:8]}.zip',
+        mimetype='application/zip'
+    )
+
+def stream_download(body, file_type, filename, etag):
+    """Send already-loaded text as an attachment in chunks, with Content-Length and a content-hash ETag"""
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+    
+    data = body.encode('utf-8')
+    
+    def generate():
+        for start in range(0, len(data), DOWNLOAD_CHUNK_BYTES):
+            yield data[start:start + DOWNLOAD_CHUNK_BYTES]
+    
+    download_name = secure_filename(f'{filename}.{file_type}') or f'download.{file_type}'
+    return Response(
+        generate(),
+        mimetype=DOWNLOAD_MIME_TYPES.get(file_type, 'text/plain'),
+        headers={
+            'Content-Length': str(len(data)),
+            'ETag': f'"{etag}"',
+            'Content-Disposition': f'attachment; filename="{download_name}"',
+            # Revalidate with the ETag instead of refetching unchanged content
+            'Cache-Control': 'no-cache'
+        }
+    )
+
+@app.route('/api/download/<file_type>', methods=['GET', 'POST'])
 def download_file(file_type):
-    """Download converted code or documentation"""
+    """Download converted code or documentation by artifact ID (GET) or posted content (POST).
+
+    No temporary file is written. Posted content is served from the request;
+    artifacts come from ArtifactStore, which may read them from its SQLite tier.
+    """
     try:
-        content = request.args.get('content', '')
-        filename = request.args.get('filename', 'converted')
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            content = data.get('content', '')
+            filename = data.get('filename', 'converted')
+            if not content:
+                return jsonify({'error': 'No content to download'}), 400
+            return stream_download(content, file_type, filename, ArtifactStore.artifact_id(content))
         
-        if not content:
+        filename = request.args.get('filename', 'converted')
+        artifact_id = request.args.get('artifact', '')
+        if not artifact_id:
             return jsonify({'error': 'No content to download'}), 400
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, 
-                                       suffix=f'.{file_type}') as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        
-        # Determine MIME type
-        mime_type = 'text/plain'
-        if file_type == 'py':
-            mime_type = 'text/x-python'
-        elif file_type == 'php':
-            mime_type = 'application/x-httpd-php'
-        elif file_type == 'md':
-            mime_type = 'text/markdown'
-        
-        return send_file(
-            temp_file_path,
-            as_attachment=True,
-            download_name=f'{filename}.{file_type}',
-            mimetype=mime_type
-        )
+        artifact = artifact_store.get(artifact_id)
+        if artifact is None or not isinstance(artifact['value'], str):
+            return jsonify({'error': 'Download not found or expired', 'artifact_missing': 'content'}), 404
+        return stream_download(artifact['body'], file_type, filename, artifact['id'])
         
     except Exception as e:
         logging.error(f"File download error: {str(e)}")
@@ -613,6 +879,7 @@ def download_file(file_type):
 def generate_tests():
     """Generate test cases for PHP or Python code"""
     try:
+        ai_service = get_ai_service()
         data = request.get_json()
         code = data.get('code', '').strip()
         language = data.get('language', '').lower()
@@ -673,6 +940,35 @@ Generate complete pytest test file with proper imports, fixtures if needed, and
         logging.error(f"Test generation error: {str(e)}")
         return jsonify({'error': f'Test generation failed: {str(e)}'}), 500
 
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Report AI response, security report, test result and artifact cache hit/miss counters for this worker"""
+    if not response_cache:
+        return jsonify({
+            'success': True,
+            'enabled': False,
+            'security_reports': security_report_cache.stats() if security_report_cache else None,
+            'test_results': test_result_cache.stats() if test_result_cache else None,
+            'artifacts': artifact_store.stats()
+        })
+    
+    return jsonify({
+        'success': True,
+        'enabled': True,
+        'stats': response_cache.stats(),
+        'security_reports': security_report_cache.stats() if security_report_cache else None,
+        'test_results': test_result_cache.stats() if test_result_cache else None,
+        'artifacts': artifact_store.stats()
+    })
+
+@app.route('/api/rate-limits')
+def rate_limit_stats():
+    """Report client-side rate limiter state per provider and model"""
+    return jsonify({
+        'success': True,
+        'limits': rate_limiter.stats()
+    })
+
 @app.errorhandler(413)
 def too_large(e):
     return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
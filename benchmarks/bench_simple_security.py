@@ -0,0 +1,95 @@
+"""Benchmark SimpleSecurityAnalyzer pattern scanning on large inputs.
+
+Compares the compiled single-pass scanner against the previous approach
+(re.search for every line x vulnerability type x pattern) and checks that both
+produce the same findings.
+
+    python benchmarks/bench_simple_security.py [--lines 10000] [--repeat 3]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.simple_security import SimpleSecurityAnalyzer
+
+PHP_SAMPLE = [
+    '<?php',
+    '$username = $_POST["username"];',
+    'function render_user($user) {',
+    '    echo htmlspecialchars($user["name"]);',
+    '    $total = $user["score"] * 2;',
+    '    return $total;',
+    '}',
+    '$result = mysql_query("SELECT * FROM users WHERE id = " . $_GET["id"]);',
+    'echo $_GET["name"];',
+    'include($_GET["page"]);',
+    '// plain comment line with nothing interesting',
+    '$items = array_map(function ($x) { return $x + 1; }, $items);',
+]
+
+PYTHON_SAMPLE = [
+    'import os',
+    'def load_user(user_id):',
+    '    query = "SELECT * FROM users WHERE id = %s" % user_id',
+    '    cursor.execute("SELECT * FROM users WHERE id = %s" % user_id)',
+    '    return cursor.fetchone()',
+    'def run(cmd):',
+    '    os.system(cmd)',
+    '    return eval(cmd)',
+    'total = sum(value for value in range(10))',
+    'data = pickle.loads(payload)',
+    '# nothing to see here',
+    'print(f"hello {name}")',
+]
+
+def legacy_scan(patterns, code):
+    """The previous per-line implementation, kept here as the baseline"""
+    issues = []
+    for line_num, line in enumerate(code.split('\n'), 1):
+        for vuln_type, pattern_list in patterns.items():
+            for pattern in pattern_list:
+                if re.search(pattern, line, re.IGNORECASE):
+                    issues.append((line_num, vuln_type, line.strip()))
+    return issues
+
+def build_input(sample, lines):
+    return '\n'.join(sample[i % len(sample)] for i in range(lines))
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--lines', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    analyzer = SimpleSecurityAnalyzer()
+
+    for language, sample, patterns in (
+        ('php', PHP_SAMPLE, analyzer.php_patterns),
+        ('python', PYTHON_SAMPLE, analyzer.python_patterns),
+    ):
+        code = build_input(sample, args.lines)
+
+        legacy_time, legacy_issues = best_time(lambda: legacy_scan(patterns, code), args.repeat)
+        new_time, report = best_time(lambda: analyzer._pattern_security_analysis(code, language), args.repeat)
+
+        new_issues = [(i['line'], i['type'], i['code_snippet']) for i in report['issues']]
+        assert new_issues == legacy_issues, f'{language}: scanner results differ from the per-line baseline'
+
+        print(f'{language:>6} {args.lines} lines, {len(new_issues)} findings: '
+              f'per-line {legacy_time * 1000:.1f} ms, compiled {new_time * 1000:.1f} ms, '
+              f'speedup {legacy_time / new_time:.1f}x')
+
+if __name__ == '__main__':
+    main()
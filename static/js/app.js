@@ -6,6 +6,8 @@ class PHPToPythonConverter {
         this.currentPythonCode = '';
         this.currentDocumentation = '';
         this.currentSecurityReport = null;
+        // Documents the server has stored, mapped to their artifact IDs
+        this.artifacts = new Map();
         
         this.init();
     }
@@ -14,6 +16,31 @@ class PHPToPythonConverter {
         this.setupEventListeners();
         this.initializeTabSystem();
         this.setupFileUpload();
+        this.loadServerProvider();
+    }
+
+    async loadServerProvider() {
+        // A provider configured on the server lets users convert without connecting first
+        try {
+            const response = await fetch('/api/config');
+            const data = await response.json();
+            if (!data.success || !data.preconfigured) return;
+
+            this.apiConnected = true;
+            this.populateModels(data.models);
+
+            const modelSelect = document.getElementById('model-select');
+            if (data.default_model && modelSelect &&
+                Array.from(modelSelect.options).some(opt => opt.value === data.default_model)) {
+                modelSelect.value = data.default_model;
+                this.selectedModel = data.default_model;
+                this.updateConvertButtonState();
+            }
+
+            this.showStatus(`Using server-configured provider. Found ${data.models.length} models.`, 'connected');
+        } catch (error) {
+            console.error('Provider configuration error:', error);
+        }
     }
 
     setupEventListeners() {
@@ -404,23 +431,32 @@ class PHPToPythonConverter {
 
         this.showLoading('Converting PHP to Python...');
         this.setButtonLoading(convertBtn, true);
+        this.pendingSecurityReportId = null;
 
         try {
-            const response = await fetch('/api/convert', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    php_code: phpCode,
-                    model: this.selectedModel,
-                    apply_security: applySecurity
-                })
+            const response = await this.postWithArtifacts('/api/convert', {
+                php_code: phpCode,
+                model: this.selectedModel,
+                apply_security: applySecurity,
+                stream: true
             });
 
-            const data = await response.json();
+            // Fill the Python editor as tokens arrive
+            let streamedCode = '';
+            const data = await this.readEventStream(response, (token) => {
+                if (!streamedCode) this.hideLoading();
+                streamedCode += token;
+                window.monacoManager?.setCode('python', streamedCode);
+            });
 
             if (data.success) {
                 this.currentPythonCode = data.python_code;
                 window.monacoManager?.setCode('python', data.python_code);
+                this.rememberArtifacts(data, {
+                    php_code: phpCode,
+                    python_code: data.python_code,
+                    security_report: data.security_report
+                });
                 
                 // Enable Python explain, security, and test generation buttons
                 const explainPythonBtn = document.getElementById('explain-python-btn');
@@ -438,6 +474,11 @@ class PHPToPythonConverter {
                     this.displaySecurityReport(data.security_report);
                 }
 
+                // The full AI security report is computed after conversion returns
+                if (data.security_report_id) {
+                    this.pollSecurityReport(data.security_report_id);
+                }
+
                 this.showToast('Code converted successfully!', 'success');
             } else {
                 this.showToast(data.error, 'error');
@@ -451,6 +492,35 @@ class PHPToPythonConverter {
         }
     }
 
+    async pollSecurityReport(reportId, interval = 1500) {
+        this.pendingSecurityReportId = reportId;
+
+        while (this.pendingSecurityReportId === reportId) {
+            await new Promise((resolve) => setTimeout(resolve, interval));
+            if (this.pendingSecurityReportId !== reportId) return;
+
+            try {
+                const response = await fetch(`/api/security-report/${reportId}`);
+                const data = await response.json();
+
+                if (data.status === 'completed' && data.security_report) {
+                    this.rememberArtifacts(data, { security_report: data.security_report });
+                    this.currentSecurityReport = data.security_report;
+                    this.displaySecurityReport(data.security_report);
+                    break;
+                }
+                if (!response.ok || data.status === 'failed') break;
+            } catch (error) {
+                console.error('Security report polling error:', error);
+                break;
+            }
+        }
+
+        if (this.pendingSecurityReportId === reportId) {
+            this.pendingSecurityReportId = null;
+        }
+    }
+
     async uploadFile(file) {
         if (!file.name.match(/\.(php|txt)$/i)) {
             this.showToast('Please upload a PHP or TXT file', 'error');
@@ -472,6 +542,7 @@ class PHPToPythonConverter {
 
             if (data.success) {
                 window.monacoManager?.setCode('php', data.content);
+                this.rememberArtifacts(data, { php_code: data.content });
                 this.showToast(`File "${data.filename}" uploaded successfully!`, 'success');
             } else {
                 this.showToast(data.error, 'error');
@@ -586,14 +657,10 @@ class PHPToPythonConverter {
         this.showSecurityLoading(language);
 
         try {
-            const response = await fetch('/api/analyze-security', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    code: code,
-                    language: language,
-                    model: this.selectedModel
-                })
+            const response = await this.postWithArtifacts('/api/analyze-security', {
+                code: code,
+                language: language,
+                model: this.selectedModel
             });
 
             if (!response.ok) {
@@ -606,6 +673,7 @@ class PHPToPythonConverter {
                 console.log('Security analysis data:', data); // Debug log
                 
                 // Show security report in new modal
+                this.rememberArtifacts(data, { security_report: data.security_report });
                 this.showSecurityReport(data.security_report, language);
                 
                 this.showToast(`${language.toUpperCase()} security analysis completed!`, 'success');
@@ -681,21 +749,22 @@ class PHPToPythonConverter {
         this.showExplanationModal(language, true);
 
         try {
-            const response = await fetch('/api/explain', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    code: code,
-                    language: language,
-                    model: this.selectedModel
-                })
+            const response = await this.postWithArtifacts('/api/explain', {
+                code: code,
+                language: language,
+                model: this.selectedModel,
+                stream: true
             });
 
             if (!response.ok) {
                 throw new Error(`HTTP ${response.status}: ${response.statusText}`);
             }
 
-            const data = await response.json();
+            let streamedText = '';
+            const data = await this.readEventStream(response, (token) => {
+                streamedText += token;
+                this.displayExplanation(streamedText, language);
+            });
 
             if (data.success) {
                 this.displayExplanation(data.explanation, language);
@@ -1157,11 +1226,7 @@ class PHPToPythonConverter {
             
             console.log('Sending request data:', requestData);
 
-            const response = await fetch('/api/apply-security-fixes', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(requestData)
-            });
+            const response = await this.postWithArtifacts('/api/apply-security-fixes', requestData);
 
             const data = await response.json();
 
@@ -1177,6 +1242,7 @@ class PHPToPythonConverter {
                 if (fixedCode) {
                     // Update the correct editor
                     window.monacoManager?.setCode(this.currentSecurityLanguage, fixedCode);
+                    this.rememberArtifacts(data, { [`${this.currentSecurityLanguage}_code`]: fixedCode });
                     console.log(`Updated ${this.currentSecurityLanguage} editor with fixed code`);
                 }
                 
@@ -1247,15 +1313,11 @@ class PHPToPythonConverter {
         this.showLoading(`Applying ${language.toUpperCase()} security fixes...`);
 
         try {
-            const response = await fetch('/api/apply-security-fixes', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    [language === 'php' ? 'php_code' : 'python_code']: code,
-                    security_report: this.currentSecurityReport,
-                    model: this.selectedModel,
-                    language: language
-                })
+            const response = await this.postWithArtifacts('/api/apply-security-fixes', {
+                [language === 'php' ? 'php_code' : 'python_code']: code,
+                security_report: this.currentSecurityReport,
+                model: this.selectedModel,
+                language: language
             });
 
             const data = await response.json();
@@ -1267,6 +1329,10 @@ class PHPToPythonConverter {
                 if (data.security_report) {
                     this.currentSecurityReport = data.security_report;
                 }
+                this.rememberArtifacts(data, {
+                    [`${language}_code`]: fixedCode,
+                    security_report: data.security_report
+                });
 
                 this.showToast(`${language.toUpperCase()} security fixes applied successfully!`, 'success');
             } else {
@@ -1335,21 +1401,24 @@ class PHPToPythonConverter {
         this.showLoading('Generating documentation...');
 
         try {
-            const response = await fetch('/api/generate-docs', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    python_code: pythonCode,
-                    php_code: phpCode,
-                    security_report: this.currentSecurityReport,
-                    model: this.selectedModel
-                })
+            const response = await this.postWithArtifacts('/api/generate-docs', {
+                python_code: pythonCode,
+                php_code: phpCode,
+                security_report: this.currentSecurityReport,
+                model: this.selectedModel,
+                stream: true
             });
 
-            const data = await response.json();
+            let streamedDocs = '';
+            const data = await this.readEventStream(response, (token) => {
+                if (!streamedDocs) this.hideLoading();
+                streamedDocs += token;
+                this.displayDocumentation(streamedDocs);
+            });
 
             if (data.success) {
                 this.currentDocumentation = data.documentation;
+                this.rememberArtifacts(data, { documentation: data.documentation });
                 this.displayDocumentation(data.documentation);
                 
                 // Enable download docs button
@@ -1371,7 +1440,7 @@ class PHPToPythonConverter {
 
 
 
-    downloadFile(type) {
+    async downloadFile(type) {
         let content, filename, extension;
 
         if (type === 'python') {
@@ -1393,23 +1462,44 @@ class PHPToPythonConverter {
             return;
         }
 
-        // Create download URL
-        const params = new URLSearchParams({
-            content: content,
-            filename: filename
-        });
+        try {
+            // Stored documents are fetched by ID; anything else is posted in the request body
+            const id = this.artifacts.get(content);
+            let response = null;
+            if (id) {
+                const params = new URLSearchParams({ artifact: id, filename: filename });
+                response = await fetch(`/api/download/${extension}?${params.toString()}`);
+                if (response.status === 404) {
+                    this.artifacts.delete(content);
+                    response = null;
+                }
+            }
+            if (!response) {
+                response = await fetch(`/api/download/${extension}`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ content: content, filename: filename })
+                });
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
 
-        const url = `/api/download/${extension}?${params.toString()}`;
-        
-        // Create temporary link and trigger download
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = `${filename}.${extension}`;
-        document.body.appendChild(a);
-        a.click();
-        document.body.removeChild(a);
-        
-        this.showToast(`${type.charAt(0).toUpperCase() + type.slice(1)} downloaded!`, 'success');
+            // Trigger the download from the response body
+            const url = URL.createObjectURL(await response.blob());
+            const a = document.createElement('a');
+            a.href = url;
+            a.download = `${filename}.${extension}`;
+            document.body.appendChild(a);
+            a.click();
+            document.body.removeChild(a);
+            setTimeout(() => URL.revokeObjectURL(url), 1000);
+
+            this.showToast(`${type.charAt(0).toUpperCase() + type.slice(1)} downloaded!`, 'success');
+        } catch (error) {
+            this.showToast(`Failed to download ${type}`, 'error');
+            console.error('Download error:', error);
+        }
     }
 
     displaySecurityReport(report) {
@@ -1706,6 +1796,87 @@ class PHPToPythonConverter {
         }, 5000);
     }
 
+    rememberArtifacts(data, documents) {
+        // documents maps each response field to the value the page now holds for it
+        for (const [field, id] of Object.entries(data.artifacts || {})) {
+            if (documents[field]) this.artifacts.set(documents[field], id);
+        }
+    }
+
+    async postWithArtifacts(url, body) {
+        // Documents the server already holds are sent as IDs; expired ones are resent inline
+        const compact = { ...body };
+        let referenced = false;
+        for (const [field, value] of Object.entries(body)) {
+            const id = value && this.artifacts.get(value);
+            if (id) {
+                delete compact[field];
+                compact[`${field}_artifact`] = id;
+                referenced = true;
+            }
+        }
+
+        const post = (payload) => fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
+        });
+
+        const response = await post(compact);
+        if (referenced && response.status === 404) {
+            const data = await response.clone().json().catch(() => ({}));
+            if (data.artifact_missing) {
+                this.artifacts.clear();
+                return post(body);
+            }
+        }
+        return response;
+    }
+
+    async readEventStream(response, onToken) {
+        // Validation errors come back as plain JSON before any streaming starts
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('text/event-stream')) {
+            return response.json();
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = { success: false, error: 'Stream ended unexpectedly' };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let eventType = 'message';
+                let dataText = '';
+                for (const line of rawEvent.split('\n')) {
+                    if (line.startsWith('event:')) eventType = line.slice(6).trim();
+                    else if (line.startsWith('data:')) dataText += line.slice(5).trim();
+                }
+                if (!dataText) continue;
+
+                const payload = JSON.parse(dataText);
+                if (eventType === 'done') {
+                    result = payload;
+                } else if (eventType === 'error') {
+                    result = { success: false, error: payload.error };
+                } else if (payload.token) {
+                    onToken(payload.token);
+                }
+            }
+        }
+
+        return result;
+    }
+
     escapeHtml(text) {
         const div = document.createElement('div');
         div.textContent = text;
@@ -1805,15 +1976,11 @@ class PHPToPythonConverter {
         this.showLoading(`Applying all ${language.toUpperCase()} security fixes...`);
         
         try {
-            const response = await fetch('/api/apply-security-fixes', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    [language === 'php' ? 'php_code' : 'python_code']: code,
-                    security_report: this.currentSecurityReport,
-                    model: this.selectedModel,
-                    language: language
-                })
+            const response = await this.postWithArtifacts('/api/apply-security-fixes', {
+                [language === 'php' ? 'php_code' : 'python_code']: code,
+                security_report: this.currentSecurityReport,
+                model: this.selectedModel,
+                language: language
             });
 
             if (!response.ok) {
@@ -1826,6 +1993,7 @@ class PHPToPythonConverter {
                 // Update the code editor with fixed code
                 if (data.fixed_code) {
                     window.monacoManager?.setCode(language, data.fixed_code);
+                    this.rememberArtifacts(data, { [`${language}_code`]: data.fixed_code });
                 }
                 
                 this.showToast('Security fixes applied successfully!', 'success');
@@ -1870,15 +2038,11 @@ class PHPToPythonConverter {
         this.showLoading(`Applying fix for: ${issue.title}...`);
         
         try {
-            const response = await fetch('/api/apply-individual-security-fix', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    [language === 'php' ? 'php_code' : 'python_code']: code,
-                    issue: issue,
-                    model: this.selectedModel,
-                    language: language
-                })
+            const response = await this.postWithArtifacts('/api/apply-individual-security-fix', {
+                [language === 'php' ? 'php_code' : 'python_code']: code,
+                issue: issue,
+                model: this.selectedModel,
+                language: language
             });
 
             if (!response.ok) {
@@ -1891,6 +2055,7 @@ class PHPToPythonConverter {
                 // Update the code editor with fixed code
                 if (data.fixed_code) {
                     window.monacoManager?.setCode(language, data.fixed_code);
+                    this.rememberArtifacts(data, { [`${language}_code`]: data.fixed_code });
                 }
                 
                 this.showToast(`Fixed: ${issue.title}`, 'success');
@@ -0,0 +1,99 @@
+import pytest
+from utils.code_executor import CodeExecutor
+
+PYTHON_CODE = '''
+def add(a, b):
+    return a + b
+
+def test_reexported():
+    assert add(1, 1) == 2
+'''
+
+TEST_CODE = '''
+class TestAdd:
+    def test_one(self):
+        assert add(1, 0) == 1
+
+    def test_two(self):
+        assert add(1, 1) == 2
+
+@pytest.mark.parametrize('n', [1, 2, 3])
+def test_param(n):
+    assert add(n, 0) == n
+'''
+
+EXPECTED_IDS = {
+    'test_main.py::test_reexported',
+    'test_main.py::TestAdd::test_one',
+    'test_main.py::TestAdd::test_two',
+    'test_main.py::test_param[1]',
+    'test_main.py::test_param[2]',
+    'test_main.py::test_param[3]',
+}
+
+def node_ids(result):
+    return {test['nodeid'] for test in result['tests']}
+
+def test_single_process_by_default(monkeypatch):
+    executor = CodeExecutor()
+    monkeypatch.setattr(executor, '_collect_test_ids', lambda cwd, cancel: pytest.fail('collected'))
+    result = executor.run_tests(PYTHON_CODE, TEST_CODE)
+    assert result['success']
+    assert 'shards' not in result
+    assert node_ids(result) == EXPECTED_IDS
+
+def test_shards_classes_parametrized_and_reexported_tests():
+    result = CodeExecutor(max_shards=2, shard_min_tests=2).run_tests(PYTHON_CODE, TEST_CODE)
+    assert result['success']
+    assert result['shards'] == 2
+    assert node_ids(result) == EXPECTED_IDS
+
+def test_small_suite_is_not_sharded():
+    result = CodeExecutor(max_shards=2, shard_min_tests=50).run_tests(PYTHON_CODE, TEST_CODE)
+    assert result['success']
+    assert 'shards' not in result
+
+def test_slow_suite_is_sharded_on_the_next_run():
+    executor = CodeExecutor(max_shards=2, shard_min_tests=50, shard_min_seconds=0.001)
+    assert 'shards' not in executor.run_tests(PYTHON_CODE, TEST_CODE)
+    result = executor.run_tests(PYTHON_CODE, TEST_CODE)
+    assert result['shards'] == 2
+    assert node_ids(result) == EXPECTED_IDS
+
+def test_collection_error_falls_back_to_one_run():
+    result = CodeExecutor(max_shards=2, shard_min_tests=1).run_tests(
+        PYTHON_CODE, 'import missing_module\n\ndef test_x():\n    pass\n'
+    )
+    assert not result['success']
+    assert 'shards' not in result
+    assert 'missing_module' in result['stdout']
+
+def test_small_suite_is_not_collected(monkeypatch):
+    executor = CodeExecutor(max_shards=2, shard_min_tests=50)
+    monkeypatch.setattr(executor, '_collect_test_ids', lambda cwd, cancel: pytest.fail('collected'))
+    assert executor.run_tests(PYTHON_CODE, TEST_CODE)['success']
+    assert executor.run_tests(PYTHON_CODE, TEST_CODE.replace('add(1, 1)', '2'))['success']
+
+def test_collected_ids_are_reused_for_the_same_code(monkeypatch):
+    executor = CodeExecutor(max_shards=2, shard_min_tests=2)
+    collect = executor._collect_test_ids
+    calls = []
+
+    def counting_collect(cwd, cancel):
+        calls.append(cwd)
+        return collect(cwd, cancel)
+    monkeypatch.setattr(executor, '_collect_test_ids', counting_collect)
+
+    assert executor.run_tests(PYTHON_CODE, TEST_CODE)['shards'] == 2
+    assert executor.run_tests(PYTHON_CODE, TEST_CODE)['shards'] == 2
+    assert len(calls) == 1
+    executor.run_tests(PYTHON_CODE + '\n# changed\n', TEST_CODE)
+    assert len(calls) == 2
+
+def test_timed_out_suite_is_sharded_on_the_next_run():
+    slow_tests = 'import time\n\ndef test_slow():\n    time.sleep(5)\n\ndef test_fast():\n    pass\n'
+    executor = CodeExecutor(timeout=1, max_shards=2, shard_min_tests=50, shard_min_seconds=3)
+    first = executor.run_tests(PYTHON_CODE, slow_tests)
+    assert first['exit_code'] == -1
+    assert 'shards' not in first
+    assert executor.run_tests(PYTHON_CODE, slow_tests)['shards'] == 2
@@ -0,0 +1,34 @@
+import pytest
+from utils.code_fences import strip_code_fences
+from utils.preflight import PreflightChecker
+
+@pytest.mark.parametrize('text, expected', [
+    ('```python\nx = 1\n```', 'x = 1'),
+    ('\n\n```php\n<?php echo 1;\n```\n\n', '<?php echo 1;'),
+    ('```\nx = 1\n```', 'x = 1'),
+    ('```json\n{"a": 1}\n```', '{"a": 1}'),
+    ('```python\nx = 1```', 'x = 1'),
+    ('```python\n\nif x:\n    y = 1\n\n```', 'if x:\n    y = 1'),
+    ('x = 1', 'x = 1'),
+    ('```python\nx = 1', 'x = 1'),
+])
+def test_strips_surrounding_fence(text, expected):
+    assert strip_code_fences(text) == expected
+
+def test_keeps_fences_inside_the_code():
+    code = 'DOC = """\n```python\nprint(1)\n```\n"""\nx = 1'
+    assert strip_code_fences(code) == code
+    assert strip_code_fences(f'```python\n{code}\n```') == code
+
+def test_keeps_indentation_of_the_first_line():
+    assert strip_code_fences('```python\n    return x\n```') == '    return x'
+
+def test_preflight_only_strips_code_that_does_not_parse():
+    repairs = []
+    assert PreflightChecker._strip_fences('```python\nx = 1\n```\n', repairs) == 'x = 1\n'
+    assert repairs == ['Removed the markdown fence around the code']
+
+    parsed = 'x = """\n```\n"""\n'
+    repairs = []
+    assert PreflightChecker._strip_fences(parsed, repairs) == parsed
+    assert repairs == []
@@ -0,0 +1,85 @@
+from utils import job_queue
+from utils.job_queue import Job
+from utils.output_capture import output_listener
+
+def output(text, stream='stdout', **tags):
+    return {'type': 'output', 'stream': stream, 'text': text, **tags}
+
+def test_unread_output_is_merged():
+    job = Job('test')
+    job.emit(output('a'))
+    job.emit(output('b'))
+    job.emit(output('c', stream='stderr'))
+    job.emit(output('d', stream='stderr', candidate=1))
+    assert job.events_since(0, timeout=0) == [
+        (1, output('ab')), (2, output('c', stream='stderr')), (3, output('d', stream='stderr', candidate=1))
+    ]
+
+def test_output_already_read_is_not_merged():
+    job = Job('test')
+    job.emit(output('a'))
+    assert job.events_since(0, timeout=0) == [(1, output('a'))]
+    job.emit(output('b'))
+    assert job.events_since(1, timeout=0) == [(2, output('b'))]
+
+def test_merged_output_is_capped(monkeypatch):
+    monkeypatch.setattr(job_queue, 'EVENT_MERGE_BYTES', 4)
+    job = Job('test')
+    for text in ('ab', 'cd', 'ef'):
+        job.emit(output(text))
+    assert [event['text'] for _, event in job.events_since(0, timeout=0)] == ['abcd', 'ef']
+
+def test_event_log_is_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(job_queue, 'EVENT_BACKLOG_BYTES', 1000)
+    job = Job('test')
+    for i in range(50):
+        job.emit({'type': 'test', 'nodeid': f'test_main.py::test_{i}', 'outcome': 'passed'})
+    events = job.events_since(0, timeout=0)
+    assert 0 < len(events) < 50
+    assert events[-1][0] == 50
+    assert job._event_bytes <= 1000
+
+def test_progress_events_only_while_streamed():
+    job = Job('batch_convert')
+    job.update(total=2, files={'a.php': {'status': 'pending'}, 'b.php': {'status': 'pending'}})
+    job.update_item('files', 'a.php', {'status': 'running'})
+    assert job.events_since(0, timeout=0) == []
+
+    job.subscribe()
+    job.update_item('files', 'b.php', {'status': 'running'})
+    job.unsubscribe()
+    job.update(completed=1)
+
+    assert [event for _, event in job.events_since(0, timeout=0)] == [
+        {'type': 'progress', 'total': 2,
+         'files': {'a.php': {'status': 'running'}, 'b.php': {'status': 'pending'}}},
+        {'type': 'progress', 'files': {'b.php': {'status': 'running'}}},
+    ]
+    assert job.to_dict()['progress'] == {
+        'total': 2, 'completed': 1,
+        'files': {'a.php': {'status': 'running'}, 'b.php': {'status': 'running'}}
+    }
+
+def test_progress_snapshot_is_a_copy():
+    job = Job('batch_convert')
+    job.update(files={'a.php': {'status': 'pending'}})
+    snapshot = job.to_dict()['progress']
+    job.update_item('files', 'b.php', {'status': 'running'})
+    assert snapshot['files'] == {'a.php': {'status': 'pending'}}
+
+def test_live_output_stops_at_the_output_limit():
+    events = []
+    listener = output_listener(events.append, 'stdout', max_bytes=5)
+    listener(b'abc')
+    listener('dé'.encode('utf-8') + b'fgh')
+    listener(b'ijk')
+    assert ''.join(event['text'] for event in events).startswith('abcd\n... [live stdout truncated')
+    assert len(events) == 2
+
+def test_live_output_notice_after_exactly_filling_the_limit():
+    events = []
+    listener = output_listener(events.append, 'stderr', max_bytes=3)
+    listener(b'abc')
+    listener(b'd')
+    listener(b'e')
+    assert [event['text'] for event in events] == ['abc', '\n... [live stderr truncated after 3 bytes] ...\n']
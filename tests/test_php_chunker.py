@@ -0,0 +1,55 @@
+from utils.php_chunker import PHPChunker
+
+def declarations(code):
+    chunker = PHPChunker()
+    return [(kind, name, code[start:end]) for start, end, kind, name in chunker._find_declarations(code)]
+
+def test_heredoc_body_is_not_a_declaration():
+    code = '<?php\n$x = <<<EOT\nfunction fake() {\nEOT;\nfunction real() { return 1; }\n'
+    assert [(kind, name) for kind, name, _ in declarations(code)] == [('function', 'real')]
+
+def test_nowdoc_body_is_not_a_declaration():
+    code = "<?php\n$x = <<<'EOT'\nclass Fake {\nEOT;\nclass Real {}\n"
+    assert [(kind, name) for kind, name, _ in declarations(code)] == [('class', 'Real')]
+
+def test_class_constant_is_not_a_declaration():
+    code = '<?php\n$name = Foo::class;\n$other = Foo :: class;\nclass Foo {}\n'
+    assert [(kind, name) for kind, name, _ in declarations(code)] == [('class', 'Foo')]
+
+def test_anonymous_and_nested_declarations_are_skipped():
+    code = '<?php\n$o = new class {};\n$f = function ($a) { return $a; };\nclass A {\n    public function b() {}\n}\n'
+    assert [(kind, name) for kind, name, _ in declarations(code)] == [('class', 'A')]
+
+def test_braces_in_strings_and_comments_do_not_end_a_declaration():
+    code = '<?php\nclass A {\n    // }\n    public $s = "}";\n    /* } */\n}\nfunction b() {}\n'
+    found = declarations(code)
+    assert [(kind, name) for kind, name, _ in found] == [('class', 'A'), ('function', 'b')]
+    assert found[0][2].rstrip().endswith('/* } */\n}')
+
+def test_declaration_keeps_docblock_and_attributes():
+    code = '<?php\n$a = 1;\n/**\n * Doc\n */\n#[Attr]\nfinal class Foo {\n}\n'
+    (kind, name, text), = declarations(code)
+    assert (kind, name) == ('class', 'Foo')
+    assert text == '/**\n * Doc\n */\n#[Attr]\nfinal class Foo {\n}\n'
+
+def test_split_hoists_declarations_before_script():
+    code = '<?php\necho helper(1);\nfunction helper($a) { return $a; }\n'
+    chunks = PHPChunker().split(code)
+    assert [chunk['kind'] for chunk in chunks] == ['function', 'script']
+    assert chunks[0]['names'] == ['helper']
+    assert ''.join(chunk['code'] for chunk in chunks[::-1]).count('helper') == 2
+
+def test_split_packs_up_to_max_chunk_chars():
+    code = '<?php\n' + ''.join(f'function f{i}() {{ return {i}; }}\n' for i in range(4))
+    chunks = PHPChunker(max_chunk_chars=60).split(code)
+    assert [chunk['names'] for chunk in chunks if chunk['kind'] == 'function'] == [['f0', 'f1'], ['f2', 'f3']]
+
+def test_stitch_hoists_and_deduplicates_imports():
+    chunks = [
+        '```python\nimport os\nfrom typing import (\n    List,\n)\n\ndef a():\n    return os.sep\n```',
+        'from __future__ import annotations\nimport os\n\ndef b() -> List[int]:\n    return []',
+    ]
+    assert PHPChunker().stitch(chunks) == (
+        'from __future__ import annotations\nimport os\nfrom typing import (\n    List,\n)\n\n\n'
+        'def a():\n    return os.sep\n\n\ndef b() -> List[int]:\n    return []\n'
+    )
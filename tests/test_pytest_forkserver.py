@@ -0,0 +1,53 @@
+import os
+import pytest
+from utils.code_executor import CodeExecutor
+from utils.pytest_forkserver import PytestForkServer
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork server needs os.fork')
+
+PYTHON_CODE = 'def double(x):\n    return 2 * x\n'
+
+@pytest.fixture
+def fork_server():
+    server = PytestForkServer(preload=['pytest'])
+    yield server
+    server.close()
+
+def test_runs_tests_with_per_test_events(fork_server):
+    events = []
+    result = CodeExecutor(fork_server=fork_server).run_tests(
+        PYTHON_CODE, 'def test_ok():\n    assert double(2) == 4\n\ndef test_bad():\n    assert double(2) == 5\n',
+        on_event=events.append
+    )
+    assert fork_server._process is not None
+    assert result['exit_code'] == 1
+    assert {(t['nodeid'], t['outcome']) for t in result['tests']} == {
+        ('test_main.py::test_ok', 'passed'), ('test_main.py::test_bad', 'failed')
+    }
+    assert [e['type'] for e in events if e['type'] == 'test'] == ['test', 'test']
+
+def test_child_imports_from_the_sandbox_not_the_repository(fork_server):
+    test_code = (
+        'import importlib.util\n\n'
+        'def test_isolated():\n'
+        '    assert importlib.util.find_spec("utils") is None\n'
+    )
+    result = CodeExecutor(fork_server=fork_server).run_tests(PYTHON_CODE, test_code)
+    assert fork_server._process is not None
+    assert result['success'], result['stdout']
+
+def test_restart_and_close_remove_socket_directory(fork_server):
+    executor = CodeExecutor(fork_server=fork_server)
+    assert executor.run_tests(PYTHON_CODE, 'def test_ok():\n    pass\n')['success']
+    first_dir = fork_server._socket_dir
+    assert os.path.isdir(first_dir)
+
+    fork_server._process.kill()
+    fork_server._process.wait()
+    assert executor.run_tests(PYTHON_CODE, 'def test_again():\n    pass\n')['success']
+    assert not os.path.exists(first_dir)
+    second_dir = fork_server._socket_dir
+    assert os.path.isdir(second_dir)
+
+    fork_server.close()
+    assert not os.path.exists(second_dir)
@@ -0,0 +1,116 @@
+import re
+import pytest
+from utils.security_analyzer import SecurityAnalyzer
+
+# One sample per entry of the regex table the AST visitor replaced: (pattern type, old pattern, code)
+OLD_PATTERN_SAMPLES = [
+    ('dangerous_functions', r'\beval\s*\(', 'eval(expression)'),
+    ('dangerous_functions', r'\bexec\s*\(', 'exec(source)'),
+    ('dangerous_functions', r'\bos\.system\s*\(', 'os.system(command)'),
+    ('dangerous_functions', r'\bsubprocess\.call\s*\(', 'subprocess.call(args)'),
+    ('dangerous_functions', r'\bsubprocess\.run\s*\([^)]*shell\s*=\s*True', 'subprocess.run(command, shell=True)'),
+    ('dangerous_functions', r'\b__import__\s*\(', '__import__(module_name)'),
+    ('dangerous_functions', r'\bcompile\s*\(', 'compile(source, "<string>", "exec")'),
+    ('sql_injection', r'cursor\.execute\s*\(\s*["\'][^"\']*%[sd][^"\']*["\']',
+     'cursor.execute("SELECT * FROM users WHERE id = %s" % user_id)'),
+    ('sql_injection', r'cursor\.execute\s*\(\s*f["\'][^"\']*\{[^}]*\}',
+     'cursor.execute(f"SELECT * FROM users WHERE id = {user_id}")'),
+    ('sql_injection', r'["\'][^"\']*SELECT[^"\']*["\']\s*\+',
+     'query = "SELECT * FROM users WHERE id = " + user_id'),
+    ('xss_vulnerabilities', r'render_template_string\s*\([^)]*\{[^}]*\}',
+     'render_template_string(f"<p>{name}</p>")'),
+    ('xss_vulnerabilities', r'Markup\s*\([^)]*\{[^}]*\}', 'Markup(f"<b>{name}</b>")'),
+    ('xss_vulnerabilities', r'return\s+[^|]*\|safe', 'TEMPLATE = "return {{ body|safe }}"'),
+    ('xss_vulnerabilities', r'innerHTML\s*=\s*[^;]*[{\[]', 'SCRIPT = "el.innerHTML = data[0];"'),
+    ('hardcoded_secrets', r'password\s*=\s*["\'][^"\']{8,}["\']', 'password = "hunter2hunter2"'),
+    ('hardcoded_secrets', r'api_key\s*=\s*["\'][^"\']{20,}["\']', 'api_key = "sk-0123456789abcdefghij"'),
+    ('hardcoded_secrets', r'secret\s*=\s*["\'][^"\']{16,}["\']', 'secret = "0123456789abcdef"'),
+    ('hardcoded_secrets', r'token\s*=\s*["\'][^"\']{20,}["\']', 'token = "0123456789abcdefghijkl"'),
+    ('file_operations', r'open\s*\([^)]*["\'][^"\']*\.\.[^"\']*["\']', 'open("../etc/passwd")'),
+    ('file_operations', r'os\.path\.join\s*\([^)]*\.\.', 'os.path.join(base, "..", name)'),
+    ('file_operations', r'with\s+open\s*\([^)]*user_input', 'with open(user_input) as f:\n    pass'),
+    ('deserialization', r'pickle\.loads?\s*\(', 'pickle.loads(blob)'),
+    ('deserialization', r'yaml\.load\s*\(', 'yaml.load(document)'),
+    ('deserialization', r'json\.loads\s*\([^)]*user_input', 'json.loads(user_input)'),
+]
+
+# AST findings keep their original identifiers; os.system and shell=True were always command injection
+REPORTED_AS = {
+    'dangerous_functions': {'dangerous_function', 'dangerous_functions', 'command_injection'},
+    'hardcoded_secrets': {'hardcoded_secret', 'hardcoded_secrets'},
+    'sql_injection': {'sql_injection'},
+    'xss_vulnerabilities': {'xss_vulnerabilities'},
+    'file_operations': {'file_operations'},
+    'deserialization': {'deserialization'},
+}
+
+@pytest.mark.parametrize('pattern_type, pattern, code', OLD_PATTERN_SAMPLES,
+                         ids=[sample[1] for sample in OLD_PATTERN_SAMPLES])
+def test_visitor_catches_old_pattern_table(pattern_type, pattern, code):
+    assert re.search(pattern, code, re.IGNORECASE), 'sample no longer exercises the old pattern'
+    issues = SecurityAnalyzer().analyze_code(code)['issues']
+    assert {issue['type'] for issue in issues if issue['line'] == 1} & REPORTED_AS[pattern_type], issues
+
+# Only matches text that is not valid Python, so only the syntax-error fallback can see it
+FALLBACK_ONLY_PATTERN = r'\.format\s*\([^)]*\)\s*["\'][^"\']*SELECT'
+
+def test_samples_cover_the_whole_old_table():
+    analyzer = SecurityAnalyzer()
+    patterns = {pattern for pattern_list in analyzer.security_patterns.values() for pattern in pattern_list}
+    assert patterns == {sample[1] for sample in OLD_PATTERN_SAMPLES} | {FALLBACK_ONLY_PATTERN}
+
+def test_unparsable_code_falls_back_to_old_table():
+    code = 'query = "id = {}".format(user_id) "SELECT * FROM users"'
+    assert re.search(FALLBACK_ONLY_PATTERN, code)
+    issues = SecurityAnalyzer().analyze_code(code)['issues']
+    assert [i['type'] for i in issues] == ['syntax_error', 'sql_injection']
+
+@pytest.mark.parametrize('code', [
+    'connect(password="hunter2hunter2")',
+    'CONFIG = {"password": "hunter2hunter2"}',
+    'password: str = "hunter2hunter2"',
+    'self.db_password = "hunter2hunter2"',
+])
+def test_secret_names_in_keywords_dict_keys_and_annotations(code):
+    issues = SecurityAnalyzer().analyze_code(code)['issues']
+    assert [(i['type'], i['line']) for i in issues] == [('hardcoded_secrets', 1)]
+
+@pytest.mark.parametrize('code', [
+    'connect(password=os.environ["DB_PASSWORD"])',
+    'CONFIG = {"password": ""}',
+    'password: str',
+    'json.loads(payload)',
+    'open("report.txt")',
+    'cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))',
+    'message = "could not update " + name',
+])
+def test_safe_code_is_not_reported(code):
+    assert SecurityAnalyzer().analyze_code(code)['issues'] == []
+
+def test_user_input_sources():
+    code = 'json.loads(request.data)\nopen(request.args["path"])\nopen(input())\njson.loads(sys.argv[1])\n'
+    issues = SecurityAnalyzer().analyze_code(code)['issues']
+    assert [(i['type'], i['line']) for i in issues] == [
+        ('deserialization', 1), ('file_operations', 2), ('file_operations', 3), ('deserialization', 4)
+    ]
+
+def test_sql_string_passed_to_execute_is_reported_once():
+    code = 'cursor.execute("SELECT * FROM t WHERE a = " + a + " AND b = " + b)'
+    issues = SecurityAnalyzer().analyze_code(code)['issues']
+    assert [i['type'] for i in issues] == ['sql_injection']
+
+def test_reviewer_sample_lines():
+    code = '''import json
+
+def handler(user_input, conn):
+    data = json.loads(user_input)
+    with open(user_input) as f:
+        pass
+    conn.login(password="supersecret123")
+    settings = {"api_key": "abcdefghijklmnopqrstuvwxyz"}
+    limit: int = 3
+    token: str = "0123456789abcdefghijklmnop"
+    eval(data)
+'''
+    issues = SecurityAnalyzer().analyze_code(code)['issues']
+    assert sorted({i['line'] for i in issues}) == [4, 5, 7, 8, 10, 11]
@@ -0,0 +1,144 @@
+import json
+from utils.response_cache import ResponseCache
+from utils.report_cache import SecurityReportCache
+from utils.security_units import CodeUnitSplitter, build_delta_document
+from utils.simple_security import SimpleSecurityAnalyzer
+
+PYTHON_CODE = '''import os
+
+
+@decorator
+def first(x):
+    return eval(x)
+
+VALUE = 1
+
+class Second:
+    def run(self):
+        os.system("ls")
+'''
+
+class FakeAIService:
+    """Reports an issue on every line of the analyzed code that calls eval(), plus any extra issues"""
+
+    api_key = 'test'
+
+    def __init__(self, extra_issues=None, text_responses=0):
+        self.documents = []
+        self.extra_issues = extra_issues or []
+        # Number of requests answered with prose instead of JSON
+        self.text_responses = text_responses
+
+    def _make_chat_request(self, messages, model, cache_namespace=None):
+        code = messages[0]['content'].split('```python\n', 1)[1].rsplit('\n```', 1)[0]
+        self.documents.append(code)
+        if len(self.documents) <= self.text_responses:
+            return 'The code has a security vulnerability.'
+        issues = [{'type': 'code_injection', 'severity': 'High', 'line': number, 'title': 'eval'}
+                  for number, line in enumerate(code.split('\n'), 1) if 'eval(' in line]
+        return json.dumps({
+            'issues': issues + self.extra_issues,
+            'recommendations': ['Avoid eval'],
+            'overall_assessment': 'checked'
+        })
+
+def make_analyzer():
+    return SimpleSecurityAnalyzer(report_cache=SecurityReportCache(ResponseCache(db_path=None)))
+
+def test_python_units_cover_decorators_and_script_code():
+    units = CodeUnitSplitter().split(PYTHON_CODE, 'python')
+    assert [(u['kind'], u['name'], u['start_line'], u['end_line']) for u in units] == [
+        ('script', None, 1, 1),
+        ('function', 'first', 4, 6),
+        ('script', None, 8, 8),
+        ('class', 'Second', 10, 12),
+    ]
+    assert units[1]['code'].startswith('@decorator\n')
+
+def test_php_units_use_declaration_lines():
+    code = '<?php\n$a = 1;\n\n/** Doc */\nfunction f() {\n    return 1;\n}\necho f();\n'
+    units = CodeUnitSplitter().split(code, 'php')
+    assert [(u['kind'], u['name'], u['start_line'], u['end_line']) for u in units] == [
+        ('script', None, 1, 2),
+        ('function', 'f', 4, 7),
+        ('script', None, 8, 8),
+    ]
+
+def test_unit_hash_ignores_trailing_whitespace_and_line_endings():
+    assert CodeUnitSplitter.unit_hash('def f():  \r\n    pass', 'python') == \
+        CodeUnitSplitter.unit_hash('def f():\n    pass', 'python')
+    assert CodeUnitSplitter.unit_hash('x = 1', 'python') != CodeUnitSplitter.unit_hash('x = 1', 'php')
+
+def test_unparsable_python_is_one_unit():
+    units = CodeUnitSplitter().split('def broken(:\n    pass\n', 'python')
+    assert [(u['kind'], u['start_line'], u['end_line']) for u in units] == [('script', 1, 2)]
+
+def test_delta_document_offsets():
+    units = [{'code': 'a\nb'}, {'code': 'c'}, {'code': 'd\ne\nf'}]
+    document, offsets = build_delta_document(units)
+    lines = document.split('\n')
+    assert offsets == [1, 4, 6]
+    assert [lines[offset - 1] for offset in offsets] == ['a', 'c', 'd']
+
+def test_split_delta_findings_remaps_lines_and_keeps_strays_apart():
+    units = [{'code': 'a\nb'}, {'code': 'c'}]
+    document, offsets = build_delta_document(units)
+    report = {'issues': [
+        {'title': 'in first', 'line': 2},
+        {'title': 'in second', 'line': '4'},
+        {'title': 'blank separator', 'line': 3},
+        {'title': 'past the end', 'line': 40},
+        {'title': 'no line'},
+    ], 'recommendations': ['tip', None]}
+
+    findings, unattributed = make_analyzer()._split_delta_findings(report, units, offsets)
+
+    assert [[(i['title'], i['line']) for i in f['issues']] for f in findings] == [
+        [('in first', 2)],
+        [('in second', 1)],
+    ]
+    assert [f['recommendations'] for f in findings] == [['tip'], ['tip']]
+    assert [(i['title'], i['line']) for i in unattributed] == [
+        ('blank separator', None), ('past the end', None), ('no line', None)
+    ]
+
+def test_incremental_analysis_reuses_unchanged_units():
+    analyzer = make_analyzer()
+    ai_service = FakeAIService()
+
+    report = analyzer.analyze_code_security(PYTHON_CODE, 'python', 'model', ai_service)
+    assert report['incremental'] == {'units': 4, 'reanalyzed': 4, 'reused': 0}
+    assert [issue['line'] for issue in report['issues']] == [6]
+
+    # Shift every unit down and change only the class (the new line joins the first script unit)
+    edited = '# header\n' + PYTHON_CODE.replace('"ls"', '"pwd"')
+    report = analyzer.analyze_code_security(edited, 'python', 'model', ai_service)
+
+    assert report['incremental'] == {'units': 4, 'reanalyzed': 2, 'reused': 2}
+    assert 'eval' not in ai_service.documents[-1]
+    assert [issue['line'] for issue in report['issues']] == [7]
+
+def test_unattributed_findings_are_not_cached_per_unit():
+    analyzer = make_analyzer()
+    stray = {'type': 'config', 'severity': 'Low', 'line': 999, 'title': 'stray'}
+    report = analyzer.analyze_code_security(PYTHON_CODE, 'python', 'model', FakeAIService([stray]))
+    assert [issue['title'] for issue in report['issues']] == ['eval', 'stray']
+
+    # The same units in a new file come from the unit cache, without the stray finding
+    ai_service = FakeAIService()
+    report = analyzer.analyze_code_security(PYTHON_CODE + '\nprint(VALUE)\n', 'python', 'model', ai_service)
+    assert report['incremental'] == {'units': 5, 'reanalyzed': 1, 'reused': 4}
+    assert [issue['title'] for issue in report['issues']] == ['eval']
+
+def test_text_delta_response_falls_back_to_full_file_analysis():
+    analyzer = make_analyzer()
+    analyzer.analyze_code_security(PYTHON_CODE, 'python', 'model', FakeAIService())
+
+    edited = PYTHON_CODE.replace('"ls"', '"pwd"') + '\nprint(first(VALUE))\n'
+    ai_service = FakeAIService(text_responses=1)
+    report = analyzer.analyze_code_security(edited, 'python', 'model', ai_service)
+
+    assert len(ai_service.documents) == 2
+    assert ai_service.documents[-1] == edited
+    assert 'incremental' not in report
+    assert [issue['line'] for issue in report['issues']] == [6]
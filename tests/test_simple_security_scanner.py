@@ -0,0 +1,64 @@
+import re
+import pytest
+from utils.simple_security import PatternScanner, SimpleSecurityAnalyzer
+
+PHP_CODE = '''<?php
+$id = $_GET['id'];
+$rows = mysql_query("SELECT * FROM users WHERE id = " . $_GET['id']);
+echo $_POST['name'];
+include($_GET['page']);
+EVAL($code);
+$safe = "no issues here";
+'''
+
+PYTHON_CODE = '''import os, subprocess, pickle
+os.system(cmd)
+subprocess.run(cmd,
+    shell=True)
+subprocess.run(cmd, shell=True)
+cursor.execute("SELECT * FROM t WHERE id = %s" % uid)
+data = pickle.loads(blob)
+query = f"SELECT * FROM t WHERE id = {uid}"
+'''
+
+def reference_scan(patterns, code):
+    """What PatternScanner must return: re.search of every pattern on every line"""
+    results = []
+    for line_num, line in enumerate(code.split('\n'), 1):
+        for vuln_type, pattern_list in patterns.items():
+            for pattern in pattern_list:
+                if re.search(pattern, line, re.IGNORECASE):
+                    results.append((line_num, vuln_type, line, pattern))
+    return sorted(results)
+
+@pytest.mark.parametrize('language, code', [('php', PHP_CODE), ('python', PYTHON_CODE)])
+def test_scan_matches_per_line_search(language, code):
+    analyzer = SimpleSecurityAnalyzer()
+    patterns = analyzer.php_patterns if language == 'php' else analyzer.python_patterns
+    assert sorted(PatternScanner(patterns).scan(code)) == reference_scan(patterns, code)
+
+def test_whitespace_patterns_do_not_match_across_lines():
+    scanner = PatternScanner({'command_injection': [r'subprocess.*shell\s*=\s*True']})
+    assert scanner.scan('subprocess.run(cmd, shell=\nTrue)') == []
+    assert [r[0] for r in scanner.scan('x = 1\nsubprocess.run(cmd, shell = True)')] == [2]
+
+def test_negated_classes_do_not_match_across_lines():
+    scanner = PatternScanner({'sql_injection': [r'cursor\.execute\s*\(\s*["\'][^"\']*%[sd]']})
+    assert scanner.scan('cursor.execute("SELECT\n%s")') == []
+
+def test_required_keyword():
+    assert PatternScanner._required_keyword(r'pickle\.loads\s*\(') == 'pickle'
+    assert PatternScanner._required_keyword(r'echo\s+\$_') == 'echo'
+    # Alternation and optional parts cannot promise any literal
+    assert PatternScanner._required_keyword(r'(eval|exec)\(') is None
+    assert PatternScanner._required_keyword(r'colou?r') is None
+
+def test_keyword_check_is_case_insensitive():
+    scanner = PatternScanner({'code_execution': [r'eval\s*\(']})
+    assert scanner.scan('EvAl($x);') == [(1, 'code_execution', 'EvAl($x);', r'eval\s*\(')]
+
+def test_pattern_analysis_reports_lines():
+    report = SimpleSecurityAnalyzer()._pattern_security_analysis(PHP_CODE, 'php')
+    assert report['vulnerabilities_found'] == len(report['issues'])
+    assert {issue['line'] for issue in report['issues']} == {3, 4, 5, 6}
+    assert report['language'] == 'PHP'
@@ -1,103 +1,273 @@
+import os
+import time
+import random
+import threading
 import requests
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Union
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import ConnectTimeoutError
+from concurrent.futures import ThreadPoolExecutor
+from utils.preflight import PreflightChecker
+from utils.response_cache import ResponseCache
+from utils.php_chunker import PHPChunker
+from utils.rate_limiter import RateLimiter
+
+# Connection pool defaults, overridable per deployment
+DEFAULT_POOL_CONNECTIONS = int(os.environ.get('AI_POOL_CONNECTIONS', '4'))
+DEFAULT_POOL_MAXSIZE = int(os.environ.get('AI_POOL_MAXSIZE', '16'))
+DEFAULT_CONNECT_RETRIES = int(os.environ.get('AI_CONNECT_RETRIES', '2'))
+
+# Application-level retries for 429 responses and connect failures, with jittered exponential backoff
+DEFAULT_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES', '3'))
+RETRY_BACKOFF_BASE = 1.0
+RETRY_BACKOFF_CAP = 30.0
+# 5xx responses are retried (with backoff) for GET requests such as the model list, never for completions
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+def detect_provider(base_url: str) -> str:
+    """Identify the API flavour behind a base URL: gemini, anthropic, groq or openai"""
+    if 'generativelanguage.googleapis.com' in base_url:
+        return 'gemini'
+    if 'api.anthropic.com' in base_url:
+        return 'anthropic'
+    if 'api.groq.com' in base_url:
+        return 'groq'
+    return 'openai'
+
+# Sampling temperature for normal requests and for alternative (speculative) completions
+DEFAULT_TEMPERATURE = 0.1
+CANDIDATE_TEMPERATURE = 0.7
+# Providers that return several completions for one request (OpenAI "n", Gemini "candidateCount")
+MULTI_CHOICE_PROVIDERS = {'openai', 'gemini'}
+
+# Large-file conversion: chunk size in PHP characters and concurrent chunk requests
+DEFAULT_CHUNK_CHARS = int(os.environ.get('AI_CHUNK_CHARS', '6000'))
+DEFAULT_CHUNK_WORKERS = int(os.environ.get('AI_CHUNK_WORKERS', '4'))
 
 class AIService:
-    def __init__(self):
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 connect_retries: int = DEFAULT_CONNECT_RETRIES,
+                 response_cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES):
         self.base_url = None
         self.api_key = None
         self.headers = None
+        self.provider = None
+        self.models_url = None
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_retries = connect_retries
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        
+        # One keep-alive session per provider origin (scheme://host:port)
+        self._sessions: Dict[str, requests.Session] = {}
+        self._sessions_lock = threading.Lock()
     
-    def connect_and_get_models(self, base_url: str, api_key: str) -> List[Dict[str, Any]]:
-        """Connect to OpenAI-compatible API and fetch available models"""
+    def _create_session(self) -> requests.Session:
+        """Create a pooled keep-alive session with retry-safe adapters"""
+        # Connection errors happen before the request is sent, so they are safe
+        # to retry for POST too. Read errors and 5xx are only retried for
+        # idempotent methods so a completion is never billed twice.
+        retry = Retry(
+            total=None,
+            connect=self.connect_retries,
+            read=self.connect_retries,
+            status=self.connect_retries,
+            other=0,
+            allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+            status_forcelist=RETRYABLE_STATUS_CODES,
+            backoff_factor=0.2,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def _get_session(self, url: str) -> requests.Session:
+        """Return the pooled session for the origin of the given URL"""
+        parts = urlsplit(url)
+        origin = f'{parts.scheme}://{parts.netloc}'
+        
+        session = self._sessions.get(origin)
+        if session is not None:
+            return session
+        
+        with self._sessions_lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                session = self._create_session()
+                self._sessions[origin] = session
+            return session
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter so concurrent retries spread out"""
+        delay = min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+    
+    @staticmethod
+    def _is_connect_error(error: requests.exceptions.RequestException) -> bool:
+        """True when the request never reached the provider, so resending it cannot bill twice"""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+            # NewConnectionError (refused, DNS failure) subclasses ConnectTimeoutError
+            return isinstance(getattr(error.args[0], 'reason', error.args[0]), ConnectTimeoutError)
+        return False
+    
+    def _post_with_retries(self, url: str, payload: Dict[str, Any], model: str,
+                           stream: bool = False, timeout: Any = 60) -> requests.Response:
+        """POST through the rate limiter, retrying 429s and connect failures.
+
+        Completions are billed once the provider has the request, so read
+        timeouts, dropped connections and 5xx responses are never retried;
+        the 5xx response is returned to the caller.
+        """
+        provider = urlsplit(url).netloc
+        attempt = 0
+        
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(provider, model)
+            
+            try:
+                response = self._get_session(url).post(url, headers=self.headers, json=payload,
+                                                       timeout=timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if not self._is_connect_error(e) or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                reason = type(e).__name__
+            else:
+                if self.rate_limiter:
+                    retry_after = self.rate_limiter.observe(provider, model, response.status_code, response.headers)
+                else:
+                    retry_after = RateLimiter.parse_retry_after(response.headers.get('Retry-After'))
+                
+                # A 429 was rejected before any work was done, so it is always safe to resend
+                if response.status_code != 429 or attempt >= self.max_retries:
+                    return response
+                
+                response.close()
+                delay = retry_after if retry_after is not None else self._backoff_delay(attempt)
+                reason = f'HTTP {response.status_code}'
+            
+            attempt += 1
+            delay = min(delay, RETRY_BACKOFF_CAP)
+            logging.warning(f"{reason} from {provider} ({model}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+    
+    def close(self):
+        """Close all pooled provider sessions"""
+        with self._sessions_lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+    
+    def configure(self, base_url: str, api_key: str):
+        """Set credentials, provider and auth headers without any network call"""
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
         
-        # Detect API provider type
-        is_gemini = 'generativelanguage.googleapis.com' in base_url
-        is_anthropic = 'api.anthropic.com' in base_url
-        is_groq = 'api.groq.com' in base_url
+        # Detect API provider type once; chat requests reuse self.provider
+        self.provider = detect_provider(base_url)
         
-        if is_gemini:
+        if self.provider == 'gemini':
             # Gemini uses API key as query parameter
             self.headers = {'Content-Type': 'application/json'}
-            models_url = f'https://generativelanguage.googleapis.com/v1beta/models?key={api_key}'
-        elif is_anthropic:
+            self.models_url = f'https://generativelanguage.googleapis.com/v1beta/models?key={api_key}'
+        elif self.provider == 'anthropic':
             # Anthropic uses x-api-key header
             self.headers = {
                 'x-api-key': api_key,
                 'Content-Type': 'application/json',
                 'anthropic-version': '2023-06-01'
             }
-            # Anthropic doesn't have a models endpoint, so we'll return predefined models
-            models_url = None
-        elif is_groq:
+            self.models_url = f'{self.base_url}/v1/models?limit=100'
+        elif self.provider == 'groq':
             # Groq uses standard Bearer token
             self.headers = {
                 'Authorization': f'Bearer {api_key}',
                 'Content-Type': 'application/json'
             }
-            models_url = f'{self.base_url}/openai/v1/models'
+            self.models_url = f'{self.base_url}/openai/v1/models'
         else:
             # OpenAI-style authentication
             self.headers = {
                 'Authorization': f'Bearer {api_key}',
                 'Content-Type': 'application/json'
             }
-            models_url = f'{self.base_url}/models'
+            self.models_url = f'{self.base_url}/models'
+    
+    def connect_and_get_models(self, base_url: str, api_key: str) -> List[Dict[str, Any]]:
+        """Connect to OpenAI-compatible API and fetch available models"""
+        self.configure(base_url, api_key)
+        return self.fetch_models()
+    
+    def fetch_models(self) -> List[Dict[str, Any]]:
+        """Fetch the configured provider's model list, which also validates the API key"""
+        if not self.base_url or not self.api_key:
+            raise Exception("API not connected. Please connect first.")
+        
+        is_gemini = self.provider == 'gemini'
+        is_anthropic = self.provider == 'anthropic'
         
         try:
             models = []
             
-            if is_anthropic:
-                # Anthropic predefined models - test connection with a simple message
-                test_payload = {
-                    "model": "claude-3-5-sonnet-20241022",
-                    "max_tokens": 10,
-                    "messages": [{"role": "user", "content": "Hi"}]
-                }
-                test_response = requests.post(f'{self.base_url}/v1/messages', 
-                                            headers=self.headers, json=test_payload, timeout=30)
-                test_response.raise_for_status()
-                
-                # Return Anthropic models
-                models = [
-                    {'id': 'claude-3-5-sonnet-20241022', 'name': 'Claude 3.5 Sonnet (Latest)', 'created': 0},
-                    {'id': 'claude-3-5-haiku-20241022', 'name': 'Claude 3.5 Haiku', 'created': 0},
-                    {'id': 'claude-3-opus-20240229', 'name': 'Claude 3 Opus', 'created': 0},
-                    {'id': 'claude-3-sonnet-20240229', 'name': 'Claude 3 Sonnet', 'created': 0},
-                    {'id': 'claude-3-haiku-20240307', 'name': 'Claude 3 Haiku', 'created': 0}
-                ]
-            else:
-                # Fetch models from API endpoint
-                if models_url is None:
-                    raise Exception("Models URL not configured for this API provider")
-                response = requests.get(models_url, headers=self.headers, timeout=30)
-                response.raise_for_status()
-                
-                models_data = response.json()
-                
-                if is_gemini:
-                    # Gemini API structure
-                    if 'models' in models_data:
-                        for model in models_data['models']:
-                            model_name = model.get('name', '').replace('models/', '')
-                            if model_name and 'generateContent' in model.get('supportedGenerationMethods', []):
-                                models.append({
-                                    'id': model_name,
-                                    'name': model.get('displayName', model_name),
-                                    'created': 0
-                                })
-                else:
-                    # OpenAI/Groq API structure
-                    if 'data' in models_data:
-                        for model in models_data['data']:
+            # Listing models through the pooled session also warms the
+            # keep-alive connection used by subsequent chat requests
+            response = self._get_session(self.models_url).get(self.models_url, headers=self.headers, timeout=30)
+            
+            if is_anthropic and response.status_code == 404:
+                # Gateways without the models endpoint: validate with a minimal message instead
+                return self._anthropic_fallback_models()
+            
+            response.raise_for_status()
+            models_data = response.json()
+            
+            if is_gemini:
+                # Gemini API structure
+                if 'models' in models_data:
+                    for model in models_data['models']:
+                        model_name = model.get('name', '').replace('models/', '')
+                        if model_name and 'generateContent' in model.get('supportedGenerationMethods', []):
                             models.append({
-                                'id': model.get('id', ''),
-                                'name': model.get('id', ''),
-                                'created': model.get('created', 0)
+                                'id': model_name,
+                                'name': model.get('displayName', model_name),
+                                'created': 0
                             })
+            elif is_anthropic:
+                # Anthropic API structure
+                for model in models_data.get('data', []):
+                    models.append({
+                        'id': model.get('id', ''),
+                        'name': model.get('display_name', model.get('id', '')),
+                        'created': 0
+                    })
+            else:
+                # OpenAI/Groq API structure
+                if 'data' in models_data:
+                    for model in models_data['data']:
+                        models.append({
+                            'id': model.get('id', ''),
+                            'name': model.get('id', ''),
+                            'created': model.get('created', 0)
+                        })
             
             # Sort models by name
             models.sort(key=lambda x: x['name'])
@@ -109,14 +279,46 @@ class AIService:
             logging.error(f"API connection failed: {str(e)}")
             raise Exception(f"Failed to connect to API: {str(e)}")
     
-    def _make_chat_request(self, messages: List[Dict[str, str]], model: str, 
-                          response_format: Optional[Dict[str, str]] = None) -> str:
-        """Make a chat completion request to the API"""
+    def warm_up(self):
+        """Open a keep-alive connection to the provider ahead of the first chat request"""
+        try:
+            self.fetch_models()
+        except Exception as e:
+            logging.warning(f"Connection warm-up failed: {str(e)}")
+    
+    def _anthropic_fallback_models(self) -> List[Dict[str, Any]]:
+        """Validate an Anthropic key with a tiny message and return the predefined models"""
+        test_payload = {
+            "model": "claude-3-5-sonnet-20241022",
+            "max_tokens": 10,
+            "messages": [{"role": "user", "content": "Hi"}]
+        }
+        messages_url = f'{self.base_url}/v1/messages'
+        test_response = self._get_session(messages_url).post(
+            messages_url, headers=self.headers, json=test_payload, timeout=30)
+        test_response.raise_for_status()
+        
+        models = [
+            {'id': 'claude-3-5-haiku-20241022', 'name': 'Claude 3.5 Haiku', 'created': 0},
+            {'id': 'claude-3-5-sonnet-20241022', 'name': 'Claude 3.5 Sonnet (Latest)', 'created': 0},
+            {'id': 'claude-3-haiku-20240307', 'name': 'Claude 3 Haiku', 'created': 0},
+            {'id': 'claude-3-opus-20240229', 'name': 'Claude 3 Opus', 'created': 0},
+            {'id': 'claude-3-sonnet-20240229', 'name': 'Claude 3 Sonnet', 'created': 0}
+        ]
+        logging.info(f"Successfully connected to API. Found {len(models)} models.")
+        return models
+    
+    
+    def _build_chat_request(self, messages: List[Dict[str, str]], model: str,
+                            response_format: Optional[Dict[str, str]] = None,
+                            stream: bool = False, temperature: float = DEFAULT_TEMPERATURE,
+                            choices: int = 1) -> Tuple[str, Dict[str, Any]]:
+        """Build the provider-specific URL and payload for a chat request"""
         if not self.base_url or not self.api_key:
             raise Exception("API not connected. Please connect first.")
         
-        is_gemini = 'generativelanguage.googleapis.com' in self.base_url
-        is_anthropic = 'api.anthropic.com' in self.base_url
+        is_gemini = self.provider == 'gemini'
+        is_anthropic = self.provider == 'anthropic'
         
         if is_gemini:
             # Convert messages to Gemini format
@@ -132,12 +334,17 @@ class AIService:
                     'parts': [{'text': '\n\n'.join(content_parts)}]
                 }],
                 'generationConfig': {
-                    'temperature': 0.1,
+                    'temperature': temperature,
                     'maxOutputTokens': 4000
                 }
             }
+            if choices > 1:
+                payload['generationConfig']['candidateCount'] = choices
             
-            url = f'https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={self.api_key}'
+            if stream:
+                url = f'https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent?alt=sse&key={self.api_key}'
+            else:
+                url = f'https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={self.api_key}'
             
         elif is_anthropic:
             # Anthropic format - system message goes in separate field
@@ -153,7 +360,7 @@ class AIService:
             payload = {
                 'model': model,
                 'max_tokens': 4000,
-                'temperature': 0.1,
+                'temperature': temperature,
                 'messages': user_messages
             }
             
@@ -161,6 +368,9 @@ class AIService:
             if system_message:
                 payload['system'] = system_message
             
+            if stream:
+                payload['stream'] = True
+            
             url = f'{self.base_url}/v1/messages'
             
         else:
@@ -168,43 +378,188 @@ class AIService:
             payload = {
                 'model': model,
                 'messages': messages,
-                'temperature': 0.1,
+                'temperature': temperature,
                 'max_tokens': 4000
             }
+            if choices > 1:
+                payload['n'] = choices
             
             if response_format:
                 payload['response_format'] = response_format
             
+            if stream:
+                payload['stream'] = True
+            
             url = f'{self.base_url}/chat/completions'
         
+        return url, payload
+    
+    def _cache_key(self, url: str, payload: Dict[str, Any], variant: int = 0) -> str:
+        """Cache key for a request: provider endpoint plus model, messages and sampling settings"""
+        # The Gemini API key travels in the query string, so only origin and path are hashed
+        parts = urlsplit(url)
+        key_parts = {
+            'endpoint': f'{parts.scheme}://{parts.netloc}{parts.path}',
+            'payload': payload
+        }
+        if variant:
+            # Alternative samples of the same prompt must not share one cached answer
+            key_parts['variant'] = variant
+        return ResponseCache.make_key(key_parts)
+    
+    @property
+    def supports_multiple_choices(self) -> bool:
+        return self.provider in MULTI_CHOICE_PROVIDERS
+    
+    def _make_chat_request(self, messages: List[Dict[str, str]], model: str, 
+                          response_format: Optional[Dict[str, str]] = None,
+                          cache_namespace: Optional[str] = 'chat',
+                          temperature: float = DEFAULT_TEMPERATURE,
+                          variant: int = 0) -> str:
+        """Make a chat completion request to the API"""
+        url, payload = self._build_chat_request(messages, model, response_format, temperature=temperature)
+        
+        cache_key = None
+        if self.response_cache and cache_namespace:
+            cache_key = self._cache_key(url, payload, variant)
+            cached = self.response_cache.get(cache_key, cache_namespace)
+            if cached is not None:
+                return cached
+        
+        content = self._send_chat_request(url, payload, model)
+        
+        if cache_key:
+            self.response_cache.set(cache_key, content, cache_namespace)
+        
+        return content
+    
+    def _make_chat_choices(self, messages: List[Dict[str, str]], model: str, count: int,
+                           cache_namespace: Optional[str] = 'chat',
+                           temperature: float = CANDIDATE_TEMPERATURE) -> List[str]:
+        """Request several alternative completions in one call (providers in MULTI_CHOICE_PROVIDERS)"""
+        url, payload = self._build_chat_request(messages, model, temperature=temperature, choices=count)
+        
+        cache_key = None
+        if self.response_cache and cache_namespace:
+            cache_key = self._cache_key(url, payload)
+            cached = self.response_cache.get(cache_key, cache_namespace)
+            if cached is not None:
+                return json.loads(cached)
+        
+        choices = self._send_chat_request(url, payload, model, all_choices=True)
+        
+        if cache_key:
+            self.response_cache.set(cache_key, json.dumps(choices), cache_namespace)
+        
+        return choices
+    
+    def _send_chat_request(self, url: str, payload: Dict[str, Any], model: str,
+                           all_choices: bool = False) -> Union[str, List[str]]:
+        """Send a prepared chat request and extract the completion text (or every returned choice)"""
+        is_gemini = self.provider == 'gemini'
+        is_anthropic = self.provider == 'anthropic'
+        
         try:
-            response = requests.post(url, headers=self.headers, json=payload, timeout=60)
+            response = self._post_with_retries(url, payload, model)
             response.raise_for_status()
             
             data = response.json()
             
             if is_gemini:
                 # Extract content from Gemini response
-                if 'candidates' in data and len(data['candidates']) > 0:
-                    candidate = data['candidates'][0]
-                    if 'content' in candidate and 'parts' in candidate['content']:
-                        return candidate['content']['parts'][0]['text']
-                raise Exception("Invalid response format from Gemini API")
+                texts = [candidate['content']['parts'][0]['text'] for candidate in data.get('candidates', [])
+                         if 'content' in candidate and candidate['content'].get('parts')]
+                if not texts:
+                    raise Exception("Invalid response format from Gemini API")
             elif is_anthropic:
                 # Extract content from Anthropic response
                 if 'content' in data and len(data['content']) > 0:
-                    return data['content'][0]['text']
-                raise Exception("Invalid response format from Anthropic API")
+                    texts = [data['content'][0]['text']]
+                else:
+                    raise Exception("Invalid response format from Anthropic API")
             else:
                 # OpenAI format
-                return data['choices'][0]['message']['content']
+                texts = [choice['message']['content'] for choice in data['choices']]
+            
+            return texts if all_choices else texts[0]
             
         except requests.exceptions.RequestException as e:
             logging.error(f"Chat request failed: {str(e)}")
             raise Exception(f"AI request failed: {str(e)}")
     
-    def convert_php_to_python(self, php_code: str, model: str, apply_security: bool = True) -> str:
-        """Convert PHP code to secure Python code"""
+    def _stream_chat_request(self, messages: List[Dict[str, str]], model: str,
+                             cache_namespace: Optional[str] = 'chat') -> Iterator[str]:
+        """Stream a chat completion from the API, yielding text deltas as they arrive"""
+        cache_key = None
+        if self.response_cache and cache_namespace:
+            # Streamed and buffered requests share entries, so key on the buffered form
+            cache_key = self._cache_key(*self._build_chat_request(messages, model))
+            cached = self.response_cache.get(cache_key, cache_namespace)
+            if cached is not None:
+                yield cached
+                return
+        
+        chunks = []
+        for text in self._send_stream_request(messages, model):
+            chunks.append(text)
+            yield text
+        
+        if cache_key:
+            self.response_cache.set(cache_key, ''.join(chunks), cache_namespace)
+    
+    def _send_stream_request(self, messages: List[Dict[str, str]], model: str) -> Iterator[str]:
+        """Send a streaming chat request and yield text deltas from the provider's SSE frames"""
+        url, payload = self._build_chat_request(messages, model, stream=True)
+        
+        is_gemini = self.provider == 'gemini'
+        is_anthropic = self.provider == 'anthropic'
+        
+        try:
+            # The read timeout applies between chunks, not to the whole completion.
+            # Retries only happen before the first token, while nothing has been relayed.
+            with self._post_with_retries(url, payload, model, stream=True,
+                                         timeout=(10, 60)) as response:
+                response.raise_for_status()
+                
+                for line in response.iter_lines(decode_unicode=True):
+                    # All three providers frame events as SSE "data:" lines
+                    if not line or not line.startswith('data:'):
+                        continue
+                    data_str = line[5:].strip()
+                    if data_str == '[DONE]':
+                        break
+                    
+                    try:
+                        data = json.loads(data_str)
+                    except json.JSONDecodeError:
+                        continue
+                    
+                    if is_gemini:
+                        for candidate in data.get('candidates', [])[:1]:
+                            for part in candidate.get('content', {}).get('parts', []):
+                                if part.get('text'):
+                                    yield part['text']
+                    elif is_anthropic:
+                        if data.get('type') == 'content_block_delta':
+                            text = data.get('delta', {}).get('text')
+                            if text:
+                                yield text
+                        elif data.get('type') == 'error':
+                            raise Exception(data.get('error', {}).get('message', 'Anthropic stream error'))
+                    else:
+                        choices = data.get('choices') or []
+                        if choices:
+                            text = (choices[0].get('delta') or {}).get('content')
+                            if text:
+                                yield text
+                
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Streaming chat request failed: {str(e)}")
+            raise Exception(f"AI request failed: {str(e)}")
+    
+    
+    def _conversion_system_prompt(self, apply_security: bool) -> str:
+        """System prompt shared by whole-file and chunked conversion"""
         security_instructions = ""
         if apply_security:
             security_instructions = """
@@ -235,14 +590,61 @@ class AIService:
         IMPORTANT: Return ONLY the Python code without any markdown formatting, explanations, or extra text.
         Start directly with the Python code (imports first if needed, then the main logic)."""
         
+        return system_prompt
+    
+    def convert_php_to_python(self, php_code: str, model: str, apply_security: bool = True,
+                              stream: bool = False) -> Union[str, Iterator[str]]:
+        """Convert PHP code to secure Python code"""
         messages = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": self._conversion_system_prompt(apply_security)},
             {"role": "user", "content": f"Convert this PHP code to secure Python:\n\n```php\n{php_code}\n```"}
         ]
         
-        return self._make_chat_request(messages, model)
+        if stream:
+            return self._stream_chat_request(messages, model, cache_namespace='convert')
+        return self._make_chat_request(messages, model, cache_namespace='convert')
+    
+    def convert_large_php_to_python(self, php_code: str, model: str, apply_security: bool = True,
+                                    max_workers: int = DEFAULT_CHUNK_WORKERS,
+                                    max_chunk_chars: int = DEFAULT_CHUNK_CHARS) -> str:
+        """Convert a large PHP file chunk by chunk on a bounded worker pool"""
+        chunker = PHPChunker(max_chunk_chars=max_chunk_chars)
+        chunks = chunker.split(php_code)
+        
+        if len(chunks) <= 1:
+            return self.convert_php_to_python(php_code, model, apply_security)
+        
+        system_prompt = self._conversion_system_prompt(apply_security)
+        declared = ', '.join(chunker.declared_names(php_code)) or 'none'
+        
+        def convert_chunk(index: int, chunk: Dict[str, Any]) -> str:
+            if chunk['kind'] == 'script':
+                role = 'the global script code of the file'
+            else:
+                role = f"the declarations of {', '.join(chunk['names'])}"
+            
+            context = (
+                f"This is part {index + 1} of {len(chunks)} of a larger PHP file and contains {role}. "
+                f"Top-level classes and functions declared in the whole file: {declared}. "
+                "Convert only this part. Do not redefine or stub anything declared in the other parts, "
+                "and do not add a __main__ block unless this part is the global script code."
+            )
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"{context}\n\nConvert this PHP code to secure Python:\n\n```php\n{chunk['code']}\n```"}
+            ]
+            return self._make_chat_request(messages, model, cache_namespace='convert')
+        
+        logging.info(f"Converting large PHP file in {len(chunks)} chunks with {max_workers} workers")
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+            # map() keeps chunk order and re-raises the first chunk failure
+            python_chunks = list(executor.map(convert_chunk, range(len(chunks)), chunks))
+        
+        return chunker.stitch(python_chunks)
     
-    def explain_code(self, code: str, language: str, model: str) -> str:
+    def explain_code(self, code: str, language: str, model: str,
+                     stream: bool = False) -> Union[str, Iterator[str]]:
         """Generate detailed code explanation for non-technical users"""
         system_prompt = f"""You are a friendly teacher explaining {language} code to someone who has never programmed before.
         Use simple, everyday language and avoid technical jargon. Think of explaining to a curious friend.
@@ -267,7 +669,9 @@ class AIService:
             {"role": "user", "content": f"Explain this {language} code:\n\n```{language}\n{code}\n```"}
         ]
         
-        return self._make_chat_request(messages, model)
+        if stream:
+            return self._stream_chat_request(messages, model, cache_namespace='explain')
+        return self._make_chat_request(messages, model, cache_namespace='explain')
     
     def generate_tests(self, python_code: str, model: str) -> str:
         """Generate comprehensive pytest-based tests for Python code"""
@@ -298,10 +702,11 @@ class AIService:
             {"role": "user", "content": f"Generate comprehensive tests for this Python code:\n\n```python\n{python_code}\n```"}
         ]
         
-        return self._make_chat_request(messages, model)
+        return self._make_chat_request(messages, model, cache_namespace='tests')
     
     def generate_documentation(self, python_code: str, php_code: str, 
-                             security_report: Dict[str, Any], model: str) -> str:
+                             security_report: Dict[str, Any], model: str,
+                             stream: bool = False) -> Union[str, Iterator[str]]:
         """Generate comprehensive documentation"""
         system_prompt = """You are a technical documentation specialist.
         Generate comprehensive Markdown documentation for a PHP to Python code conversion.
@@ -342,10 +747,34 @@ class AIService:
             {"role": "user", "content": f"Generate documentation for this PHP to Python conversion:\n\nOriginal PHP:\n```php\n{php_code}\n```\n\nConverted Python:\n```python\n{python_code}\n```{security_summary}"}
         ]
         
-        return self._make_chat_request(messages, model)
+        if stream:
+            return self._stream_chat_request(messages, model, cache_namespace='docs')
+        return self._make_chat_request(messages, model, cache_namespace='docs')
+    
+    def fix_failing_code(self, python_code: str, test_code: str, test_results: Dict[str, Any], model: str,
+                         diagnostics: Optional[List[Dict[str, Any]]] = None,
+                         variant: Optional[int] = None) -> str:
+        """Automatically fix failing Python code based on test results.
+
+        variant (0, 1, ...) marks one of several speculative candidates. Every
+        candidate is sampled at CANDIDATE_TEMPERATURE, like fix_failing_code_choices.
+        """
+        messages = self._fix_messages(python_code, test_code, test_results, diagnostics)
+        if variant is not None:
+            return self._make_chat_request(messages, model, cache_namespace='fix',
+                                           temperature=CANDIDATE_TEMPERATURE, variant=variant)
+        return self._make_chat_request(messages, model, cache_namespace='fix')
+    
+    def fix_failing_code_choices(self, python_code: str, test_code: str, test_results: Dict[str, Any],
+                                 model: str, count: int,
+                                 diagnostics: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+        """Several alternative fixes from a single request, for providers that support it"""
+        messages = self._fix_messages(python_code, test_code, test_results, diagnostics)
+        return self._make_chat_choices(messages, model, count, cache_namespace='fix')
     
-    def fix_failing_code(self, python_code: str, test_code: str, test_results: Dict[str, Any], model: str) -> str:
-        """Automatically fix failing Python code based on test results"""
+    def _fix_messages(self, python_code: str, test_code: str, test_results: Dict[str, Any],
+                      diagnostics: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, str]]:
+        """Prompt for repairing code that fails its tests"""
         system_prompt = """You are an expert Python developer specializing in debugging and fixing code.
         Your task is to fix the provided Python code based on the failing test results.
         
@@ -380,12 +809,16 @@ class AIService:
         Exit Code: {test_results.get('exit_code', 0)}
         """
         
+        if diagnostics:
+            # Static findings from the local pre-flight check point straight at the broken lines
+            error_info += "\nStatic Analysis:\n" + PreflightChecker.format_diagnostics(diagnostics)
+        
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": f"Fix this Python code based on the test failures:\n\nOriginal Code:\n```python\n{python_code}\n```\n\nTest Code:\n```python\n{test_code}\n```\n\nTest Results:\n{error_info}"}
         ]
         
-        return self._make_chat_request(messages, model)
+        return messages
     
     def apply_security_fixes(self, code: str, security_report: Dict[str, Any], model: str, language: str = 'python') -> str:
         """Automatically apply security fixes to PHP or Python code based on security analysis"""
@@ -440,4 +873,4 @@ class AIService:
             {"role": "user", "content": f"Fix all security issues in this {language.upper()} code:\n\n{code_block}\n\n{issues_summary}"}
         ]
         
-        return self._make_chat_request(messages, model)
+        return self._make_chat_request(messages, model, cache_namespace='security_fix')
@@ -0,0 +1,92 @@
+import os
+import re
+import json
+import hashlib
+import tempfile
+from typing import Dict, Any, Optional
+from utils.response_cache import ResponseCache
+
+ARTIFACT_ID = re.compile(r'^[0-9a-f]{64}$')
+
+class ArtifactNotFound(Exception):
+    """A request referenced an artifact that expired or was never stored"""
+
+    def __init__(self, field: str, artifact_id: str):
+        super().__init__(f'Artifact for "{field}" not found or expired: {artifact_id}')
+        self.field = field
+        self.artifact_id = artifact_id
+
+class ArtifactStore:
+    """Uploads, conversions, reports and tests stored once by SHA-256 and referenced by ID.
+
+    Text is stored as-is and anything else as canonical JSON, so identical
+    documents always get the same ID. Storage is a ResponseCache: an
+    in-process LRU plus a SQLite file shared across workers, with TTL eviction.
+    """
+
+    def __init__(self, store: ResponseCache):
+        self.store = store
+
+    @classmethod
+    def from_env(cls) -> 'ArtifactStore':
+        """Build a store from ARTIFACT_* environment variables; an empty path keeps it in memory"""
+        db_path = os.environ.get(
+            'ARTIFACT_STORE_PATH',
+            os.path.join(tempfile.gettempdir(), 'php2py_artifacts.sqlite3')
+        )
+        return cls(ResponseCache(
+            db_path=db_path or None,
+            ttl=int(os.environ.get('ARTIFACT_TTL', str(24 * 3600))),
+            memory_entries=int(os.environ.get('ARTIFACT_MEMORY_ENTRIES', '256')),
+            max_disk_bytes=int(os.environ.get('ARTIFACT_MAX_BYTES', str(256 * 1024 * 1024)))
+        ))
+
+    @staticmethod
+    def _encode(value: Any) -> str:
+        if isinstance(value, str):
+            return value
+        return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+    @classmethod
+    def artifact_id(cls, value: Any) -> str:
+        return hashlib.sha256(cls._encode(value).encode('utf-8')).hexdigest()
+
+    def put(self, value: Any, kind: str) -> str:
+        """Store a document (code text or a JSON-serializable report) and return its ID"""
+        encoded = self._encode(value)
+        artifact_id = hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+        # Storing again refreshes the TTL of a document that is still in use
+        self.store.set(artifact_id, json.dumps({
+            'kind': kind,
+            'json': not isinstance(value, str),
+            'body': encoded
+        }))
+        return artifact_id
+
+    def get(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """Return {'id', 'kind', 'value', 'body'} for a stored artifact, or None"""
+        if not ARTIFACT_ID.match(artifact_id or ''):
+            return None
+        cached = self.store.get(artifact_id)
+        if cached is None:
+            return None
+        record = json.loads(cached)
+        return {
+            'id': artifact_id,
+            'kind': record['kind'],
+            'value': json.loads(record['body']) if record['json'] else record['body'],
+            'body': record['body']
+        }
+
+    def resolve(self, data: Dict[str, Any], field: str):
+        """Replace data['<field>_artifact'] with the stored document under data[field]"""
+        artifact_id = data.get(f'{field}_artifact')
+        if not artifact_id or data.get(field):
+            return
+        artifact = self.get(artifact_id)
+        if artifact is None:
+            raise ArtifactNotFound(field, artifact_id)
+        data[field] = artifact['value']
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
@@ -0,0 +1,249 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from utils.preflight import PreflightChecker
+
+class AutoFixRunner:
+    """Generate tests for Python code, run them, and let the AI repair failing code"""
+
+    def __init__(self, ai_service, code_executor, max_attempts: int = 3, candidates: int = 1):
+        self.ai_service = ai_service
+        self.code_executor = code_executor
+        self.max_attempts = max_attempts
+        # More than one candidate per round switches to speculative parallel fixing
+        self.candidates = max(1, candidates)
+        self.preflight = PreflightChecker(code_executor)
+
+    def run(self, python_code: str, model: str,
+            progress: Optional[Callable[..., None]] = None,
+            on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+            cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """Run the generate → test → fix cycle and return the /api/test response body.
+
+        on_event receives live output and per-test events tagged with the fix
+        round; setting cancel stops the running tests and skips further rounds.
+        """
+        report = progress or (lambda **kwargs: None)
+        self.on_event = on_event
+        self.cancel = cancel or threading.Event()
+
+        # Generate test cases using AI
+        report(stage='generating_tests')
+        test_code = self.preflight.check_tests(self.ai_service.generate_tests(python_code, model))
+
+        # Local checks first: mechanical problems are repaired without a model call
+        report(stage='preflight', fix_attempt=0)
+        checked = self.preflight.check(python_code)
+        fixed_code = checked['code']
+        test_results = self._run_checked_tests(fixed_code, test_code, checked, report, 0)
+
+        if test_results['success'] and fixed_code != python_code:
+            test_results['auto_fixed'] = True
+            test_results['fix_attempts'] = 0
+            test_results['original_code'] = python_code
+            test_results['fixed_code'] = fixed_code
+            logging.info("Code passed after local pre-flight repairs")
+
+        # If tests fail, automatically fix the code with multiple attempts
+        fix_attempts = 0
+
+        while not test_results['success'] and fix_attempts < self.max_attempts:
+            if self.cancel.is_set():
+                test_results['cancelled'] = True
+                logging.info("Test run cancelled, skipping remaining fix attempts")
+                break
+            fix_attempts += 1
+            logging.info(f"Tests failed, attempting automatic fix (attempt {fix_attempts}/{self.max_attempts})...")
+
+            # Try to fix the code
+            report(stage='fixing', fix_attempt=fix_attempts)
+            if self.candidates > 1:
+                winner = self._speculative_fix(fixed_code, test_code, test_results, model,
+                                               checked['diagnostics'], report, fix_attempts)
+                if winner is None:
+                    logging.warning(f"Fix attempt {fix_attempts} produced no usable candidates")
+                    break
+                fixed_code, checked, new_test_results = winner
+            else:
+                attempt_fixed_code = self.ai_service.fix_failing_code(
+                    fixed_code, test_code, test_results, model, diagnostics=checked['diagnostics']
+                )
+
+                report(stage='preflight', fix_attempt=fix_attempts)
+                checked = self.preflight.check(attempt_fixed_code)
+                attempt_fixed_code = checked['code']
+
+                if attempt_fixed_code == fixed_code or not attempt_fixed_code.strip():
+                    logging.warning(f"Fix attempt {fix_attempts} produced no changes")
+                    break
+
+                # Re-run tests on fixed code
+                fixed_code = attempt_fixed_code
+                new_test_results = self._run_checked_tests(fixed_code, test_code, checked, report, fix_attempts,
+                                                           focus=self._failing_tests(test_results))
+
+            if new_test_results['success']:
+                test_results = new_test_results
+                test_results['auto_fixed'] = True
+                test_results['fix_attempts'] = fix_attempts
+                test_results['original_code'] = python_code
+                test_results['fixed_code'] = fixed_code
+                logging.info(f"Code successfully fixed after {fix_attempts} attempts!")
+                break
+            else:
+                test_results = new_test_results
+                logging.info(f"Fix attempt {fix_attempts} still has issues, trying again...")
+
+        report(stage='done', fix_attempt=fix_attempts)
+
+        return {
+            'success': True,
+            'test_code': test_code,
+            'test_results': test_results,
+            'python_code': fixed_code if 'auto_fixed' in test_results else python_code
+        }
+
+    def _speculative_fix(self, current_code: str, test_code: str, test_results: Dict[str, Any], model: str,
+                         diagnostics, report: Callable[..., None],
+                         fix_attempt: int) -> Optional[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+        """Request several fixes at once, test each as it arrives and keep the first that passes.
+
+        Returns (code, pre-flight result, test results) for the winner, or for the
+        candidate that passed the most tests; None if no candidate changed the code.
+        Tests still running when a winner is found are cancelled.
+        """
+        round_cancel = threading.Event()
+        ai_pool = ThreadPoolExecutor(max_workers=self.candidates, thread_name_prefix='fix-candidate')
+        test_pool = ThreadPoolExecutor(max_workers=self.candidates, thread_name_prefix='fix-test')
+        fix_args = (current_code, test_code, test_results, model)
+        focus = self._failing_tests(test_results)
+
+        def request_variants(variants):
+            return {ai_pool.submit(lambda v=v: [self.ai_service.fix_failing_code(*fix_args, diagnostics=diagnostics, variant=v)])
+                    for v in variants}
+
+        if self.ai_service.supports_multiple_choices:
+            multi_choice = ai_pool.submit(self.ai_service.fix_failing_code_choices, *fix_args,
+                                          self.candidates, diagnostics=diagnostics)
+            ai_futures = {multi_choice}
+        else:
+            multi_choice = None
+            ai_futures = request_variants(range(self.candidates))
+
+        pending = set(ai_futures)
+        tests_in_flight: Dict[Any, Tuple[str, Dict[str, Any]]] = {}
+        seen = {current_code}
+        best = None
+
+        try:
+            while pending and not self.cancel.is_set():
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in tests_in_flight:
+                        code, checked = tests_in_flight[future]
+                        results = future.result()
+                        if results['success']:
+                            return code, checked, results
+                        if best is None or self._passed(results) > self._passed(best[2]):
+                            best = (code, checked, results)
+                        continue
+
+                    try:
+                        candidates = future.result()
+                    except Exception as e:
+                        if future is multi_choice:
+                            # The endpoint rejected n/candidateCount: fall back to separate requests
+                            logging.warning(f"Multi-choice fix request failed, requesting candidates separately: {str(e)}")
+                            new_requests = request_variants(range(self.candidates))
+                            ai_futures |= new_requests
+                            pending |= new_requests
+                        else:
+                            logging.warning(f"Fix candidate request failed: {str(e)}")
+                        continue
+
+                    if future is multi_choice and len(candidates) < self.candidates:
+                        # Some OpenAI-compatible servers ignore n and return a single choice
+                        new_requests = request_variants(range(len(candidates), self.candidates))
+                        ai_futures |= new_requests
+                        pending |= new_requests
+
+                    for candidate in candidates:
+                        checked = self.preflight.check(candidate)
+                        if not checked['code'].strip() or checked['code'] in seen:
+                            continue
+                        seen.add(checked['code'])
+                        test_future = test_pool.submit(
+                            self._run_checked_tests, checked['code'], test_code, checked, report, fix_attempt,
+                            candidate=len(tests_in_flight), cancel=round_cancel, focus=focus
+                        )
+                        tests_in_flight[test_future] = (checked['code'], checked)
+                        pending.add(test_future)
+            return best
+        finally:
+            round_cancel.set()
+            ai_pool.shutdown(wait=False, cancel_futures=True)
+            test_pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _passed(test_results: Dict[str, Any]) -> int:
+        return sum(1 for test in test_results.get('tests', []) if test['outcome'] == 'passed')
+
+    @staticmethod
+    def _failing_tests(test_results: Dict[str, Any]) -> List[str]:
+        """Node IDs that failed in the last run, quickest first so a focused re-run reaches a verdict soon"""
+        failing = [test for test in test_results.get('tests', []) if test['outcome'] in ('failed', 'error')]
+        return list(dict.fromkeys(test['nodeid'] for test in sorted(failing, key=lambda test: test['duration'])))
+
+    def _run_checked_tests(self, python_code: str, test_code: str, checked: Dict[str, Any],
+                           report: Callable[..., None], fix_attempt: int, candidate: Optional[int] = None,
+                           cancel: Optional[threading.Event] = None,
+                           focus: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Run tests unless pre-flight found a blocking problem, attaching its findings to the results.
+
+        With focus, the previously failing tests run first and stop at the first
+        failure; the full suite only runs once they all pass.
+        """
+        preflight = {'repairs': checked['repairs'], 'diagnostics': checked['diagnostics']}
+
+        if not checked['ok']:
+            # pytest could not even import this code, so skip the subprocess
+            return {
+                'success': False,
+                'stdout': '',
+                'stderr': 'Pre-flight check failed:\n' + self.preflight.format_diagnostics(checked['diagnostics']),
+                'exit_code': 1,
+                'execution_time': 0,
+                'preflight': preflight
+            }
+
+        cancel = cancel or self.cancel
+        tags = {'fix_attempt': fix_attempt}
+        if candidate is not None:
+            tags['candidate'] = candidate
+
+        if focus:
+            report(stage='running_failed_tests', **tags)
+            test_results = self._execute_tests(python_code, test_code, tags, cancel, test_ids=focus, fail_fast=True)
+            # Exit code 4 means pytest rejected the selection itself; fall back to the full suite
+            if not test_results['success'] and test_results['exit_code'] != 4:
+                test_results['preflight'] = preflight
+                return test_results
+
+        report(stage='running_tests', **tags)
+        test_results = self._execute_tests(python_code, test_code, tags, cancel)
+        test_results['preflight'] = preflight
+        return test_results
+
+    def _execute_tests(self, python_code: str, test_code: str, tags: Dict[str, Any],
+                       cancel: threading.Event, **selection) -> Dict[str, Any]:
+        if not self.on_event:
+            return self.code_executor.run_tests(python_code, test_code, cancel=cancel, **selection)
+
+        test_results = None
+        for event in self.code_executor.iter_tests(python_code, test_code, cancel=cancel, **selection):
+            if event['type'] == 'result':
+                test_results = event['result']
+            else:
+                self.on_event({**event, **tags})
+        return test_results
@@ -0,0 +1,167 @@
+import io
+import json
+import time
+import zipfile
+import tarfile
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any
+
+from utils.code_fences import strip_code_fences
+
+class BatchConverter:
+    """Convert every PHP file of an uploaded project archive"""
+
+    PHP_EXTENSIONS = ('.php', '.phtml', '.inc')
+
+    def __init__(self, max_workers: int = 4, large_file_lines: int = 300,
+                 max_files: int = 2000, max_total_bytes: int = 64 * 1024 * 1024):
+        self.max_workers = max_workers
+        self.large_file_lines = large_file_lines
+        self.max_files = max_files
+        self.max_total_bytes = max_total_bytes
+
+    def extract_php_files(self, filename: str, data: bytes) -> Dict[str, str]:
+        """Read PHP sources out of a zip or tar archive held in memory"""
+        members: Dict[str, bytes] = {}
+        lowered = filename.lower()
+
+        if lowered.endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not self._is_php(info.filename):
+                        continue
+                    self._check_limits(members, info.file_size)
+                    members[info.filename] = archive.read(info)
+        elif lowered.endswith(('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')):
+            with tarfile.open(fileobj=io.BytesIO(data), mode='r:*') as archive:
+                for member in archive.getmembers():
+                    if not member.isfile() or not self._is_php(member.name):
+                        continue
+                    self._check_limits(members, member.size)
+                    members[member.name] = archive.extractfile(member).read()
+        else:
+            raise ValueError('Project archive must be a .zip, .tar, .tar.gz, .tgz, .tar.bz2 or .tar.xz file')
+
+        files = {}
+        for name, content in members.items():
+            path = self._safe_path(name)
+            if path:
+                files[path] = content.decode('utf-8', errors='replace')
+
+        if not files:
+            raise ValueError('No PHP files found in the archive')
+
+        return files
+
+    def convert(self, job, ai_service, files: Dict[str, str], model: str,
+                apply_security: bool = True) -> Dict[str, Any]:
+        """Convert all files with the session's AIService, reporting per-file progress on the job"""
+        started = time.time()
+        outputs = self._output_paths(files)
+        job.update(total=len(files), completed=0, failed=0,
+                   files={path: {'status': 'pending'} for path in sorted(files)})
+
+        converted: Dict[str, str] = {}
+        failures: Dict[str, str] = {}
+
+        def convert_file(path: str) -> str:
+            # One entry per update, so progress costs O(files) overall rather than O(files²)
+            job.update_item('files', path, {'status': 'running'})
+            php_code = files[path]
+            if php_code.count('\n') + 1 > self.large_file_lines:
+                python_code = ai_service.convert_large_php_to_python(php_code, model, apply_security)
+            else:
+                python_code = ai_service.convert_php_to_python(php_code, model, apply_security)
+            return strip_code_fences(python_code) + '\n'
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(files)))) as executor:
+            futures = {}
+            for path in sorted(files):
+                futures[executor.submit(self._timed, convert_file, path)] = path
+
+            for future in as_completed(futures):
+                path = futures[future]
+                seconds, python_code, error = future.result()
+                if error is None:
+                    converted[outputs[path]] = python_code
+                    job.update_item('files', path, {'status': 'completed', 'seconds': round(seconds, 2),
+                                                    'output': outputs[path]})
+                else:
+                    logging.warning(f"Batch conversion of {path} failed: {error}")
+                    failures[path] = error
+                    job.update_item('files', path, {'status': 'failed', 'seconds': round(seconds, 2),
+                                                    'error': error})
+                job.update(completed=len(converted), failed=len(failures))
+
+        return {
+            'files': converted,
+            'failures': failures,
+            'total_seconds': round(time.time() - started, 2)
+        }
+
+    def build_archive(self, result: Dict[str, Any], progress: Dict[str, Any]) -> bytes:
+        """Zip the converted tree together with a per-file conversion report"""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for path, python_code in sorted(result['files'].items()):
+                archive.writestr(path, python_code)
+            archive.writestr('conversion_report.json', json.dumps({
+                'files': progress.get('files', {}),
+                'failures': result['failures'],
+                'total_seconds': result['total_seconds']
+            }, indent=2))
+        return buffer.getvalue()
+
+    def _timed(self, func, path: str):
+        started = time.time()
+        try:
+            result = func(path)
+            return time.time() - started, result, None
+        except Exception as e:
+            return time.time() - started, None, str(e)
+
+    def _is_php(self, name: str) -> bool:
+        return name.lower().endswith(self.PHP_EXTENSIONS)
+
+    def _check_limits(self, members: Dict[str, bytes], size: int):
+        if len(members) >= self.max_files:
+            raise ValueError(f'Archive contains more than {self.max_files} PHP files')
+        if sum(len(c) for c in members.values()) + size > self.max_total_bytes:
+            raise ValueError(f'Archive PHP sources exceed {self.max_total_bytes // (1024 * 1024)}MB')
+
+    @staticmethod
+    def _safe_path(name: str) -> str:
+        """Normalize an archive member path, rejecting absolute and parent-escaping paths"""
+        path = posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+        if path.startswith('..') or path in ('', '.'):
+            return ''
+        return path
+
+    @staticmethod
+    def _python_path(path: str) -> str:
+        return posixpath.splitext(path)[0] + '.py'
+
+    @classmethod
+    def _output_paths(cls, paths) -> Dict[str, str]:
+        """Map each source to a unique .py path; foo.php keeps foo.py and a sibling foo.inc becomes foo_inc.py"""
+        groups: Dict[str, list] = {}
+        for path in sorted(paths):
+            groups.setdefault(cls._python_path(path), []).append(path)
+
+        outputs = {}
+        taken = set(groups)
+        for target, sources in sorted(groups.items()):
+            sources.sort(key=lambda p: (not p.lower().endswith('.php'), p))
+            outputs[sources[0]] = target
+            for path in sources[1:]:
+                stem, extension = posixpath.splitext(path)
+                candidate = f'{stem}_{extension.lstrip(".").lower()}.py'
+                suffix = 2
+                while candidate in taken:
+                    candidate = f'{stem}_{extension.lstrip(".").lower()}_{suffix}.py'
+                    suffix += 1
+                taken.add(candidate)
+                outputs[path] = candidate
+        return outputs
@@ -0,0 +1,125 @@
+import time
+import uuid
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Callable
+
+from utils.ai_service import AIService
+from utils.model_cache import ModelListCache
+
+class ClientRegistry:
+    """Connected AIService clients keyed by browser session, with scheduled idle eviction"""
+
+    def __init__(self, client_factory: Callable[[], AIService], idle_ttl: int = 1800,
+                 sweep_interval: int = 60, model_cache: Optional[ModelListCache] = None):
+        self.client_factory = client_factory
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.model_cache = model_cache or ModelListCache()
+        self.default_client: Optional[AIService] = None
+        self.default_model: Optional[str] = None
+        self._clients: Dict[str, AIService] = {}
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+
+    @staticmethod
+    def new_client_id() -> str:
+        return uuid.uuid4().hex
+
+    def connect(self, client_id: str, base_url: str, api_key: str) -> List[Dict[str, Any]]:
+        """Connect (or reconnect) the client for this session and return its models"""
+        with self._lock:
+            existing = self._clients.get(client_id)
+
+        # Reconnecting with the same credentials keeps the warm connection pool
+        if existing and existing.base_url == base_url.rstrip('/') and existing.api_key == api_key:
+            client = existing
+        else:
+            client = self.client_factory()
+
+        # Credentials are only registered once the provider accepts them
+        models = self.list_models(client, base_url, api_key)
+
+        with self._lock:
+            replaced = self._clients.get(client_id)
+            self._clients[client_id] = client
+            self._last_used[client_id] = time.time()
+        if replaced is not None and replaced is not client:
+            replaced.close()
+
+        self._ensure_sweeper()
+        return models
+
+    def list_models(self, client: AIService, base_url: str, api_key: str) -> List[Dict[str, Any]]:
+        """Configure the client and return its models, from cache when this key was seen recently"""
+        client.configure(base_url, api_key)
+
+        fetched = []
+        def fetch():
+            fetched.append(True)
+            return client.fetch_models()
+
+        models = self.model_cache.get_or_fetch(base_url, api_key, fetch)
+        if not fetched:
+            # Cache hit: nothing has opened a connection for this client yet
+            threading.Thread(target=client.warm_up, name='client-warm-up', daemon=True).start()
+        return models
+
+    def configure_default(self, base_url: str, api_key: str, default_model: Optional[str] = None):
+        """Register a server-side provider used by sessions that never called /api/connect"""
+        client = self.client_factory()
+        client.configure(base_url, api_key)
+        self.default_client = client
+        self.default_model = default_model
+
+        def prefetch():
+            try:
+                self.model_cache.get_or_fetch(base_url, api_key, client.fetch_models)
+            except Exception as e:
+                logging.warning(f"Preconfigured provider model prefetch failed: {str(e)}")
+
+        threading.Thread(target=prefetch, name='default-client-prefetch', daemon=True).start()
+
+    def get(self, client_id: Optional[str]) -> Optional[AIService]:
+        """Return the session's connected client, else the preconfigured one, refreshing its idle timer"""
+        if not client_id:
+            return self.default_client
+        with self._lock:
+            client = self._clients.get(client_id)
+            if client is not None:
+                self._last_used[client_id] = time.time()
+                return client
+        return self.default_client
+
+    def evict_idle(self):
+        """Close and drop clients that have not been used within idle_ttl"""
+        cutoff = time.time() - self.idle_ttl
+        with self._lock:
+            idle_ids = [cid for cid, used in self._last_used.items() if used < cutoff]
+            evicted = [self._clients.pop(cid) for cid in idle_ids]
+            for cid in idle_ids:
+                del self._last_used[cid]
+
+        for client in evicted:
+            client.close()
+        if evicted:
+            logging.info(f"Evicted {len(evicted)} idle AI clients")
+
+    def _ensure_sweeper(self):
+        """Start the background eviction thread on first use (after gunicorn forks)"""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='client-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logging.error(f"Client eviction failed: {str(e)}")
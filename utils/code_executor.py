@@ -1,20 +1,134 @@
+import re
 import subprocess
 import tempfile
 import os
 import signal
 import logging
-from typing import Dict, Any
+import threading
+import queue
+import inspect
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Iterator, List
 import sys
+from utils.pytest_forkserver import PytestForkServer
+from utils.sandbox_pool import SandboxPool
+from utils.output_capture import BoundedOutput, EventCallback, EventLineReader, output_listener
+from utils.resource_limits import ResourceLimits
+from utils.test_result_cache import TestResultCache
+from utils import pytest_events
+
+EVENTS_PLUGIN_SOURCE = inspect.getsource(pytest_events)
+TEST_FUNCTION = re.compile(r'^\s*(?:async\s+)?def\s+test', re.MULTILINE)
 
 class CodeExecutor:
-    def __init__(self, timeout: int = 30):
+    def __init__(self, timeout: int = 30, fork_server: Optional[PytestForkServer] = None,
+                 sandbox_pool: Optional[SandboxPool] = None,
+                 resource_limits: Optional[ResourceLimits] = None,
+                 max_output_bytes: int = 1024 * 1024, max_shards: int = 1,
+                 result_cache: Optional[TestResultCache] = None,
+                 shard_min_tests: int = 20, shard_min_seconds: float = 5.0):
         self.timeout = timeout
+        self.fork_server = fork_server
+        self.sandbox_pool = sandbox_pool
+        self.resource_limits = resource_limits if resource_limits is not None else ResourceLimits()
+        self.max_output_bytes = max_output_bytes
+        self.max_shards = max(1, max_shards)
+        self.result_cache = result_cache
+        # Starting extra pytest processes only pays off for large or slow suites
+        self.shard_min_tests = shard_min_tests
+        self.shard_min_seconds = shard_min_seconds
+        # Per test suite: last unsharded duration and test count; per code and tests: collected IDs
+        self._suite_runs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._collected_ids: 'OrderedDict[str, List[str]]' = OrderedDict()
+        self._suites_lock = threading.Lock()
+    
+    def _sandbox(self):
+        """Working directory for one run: a pooled sandbox when configured, else a fresh temp dir"""
+        if self.sandbox_pool:
+            return self.sandbox_pool.acquire()
+        return tempfile.TemporaryDirectory()
     
-    def run_tests(self, python_code: str, test_code: str) -> Dict[str, Any]:
-        """Execute generated tests against Python code"""
+    def iter_tests(self, python_code: str, test_code: str, cancel: Optional[threading.Event] = None,
+                   test_ids: Optional[List[str]] = None, fail_fast: bool = False) -> Iterator[Dict[str, Any]]:
+        """Run tests in the background, yielding output and per-test events as they happen.
+
+        The last event is {'type': 'result', 'result': <run_tests result>}.
+        Abandoning the iterator early stops the run.
+        """
+        cancel = cancel or threading.Event()
+        events: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+        
+        def worker():
+            result = self.run_tests(python_code, test_code, on_event=events.put, cancel=cancel,
+                                    test_ids=test_ids, fail_fast=fail_fast)
+            events.put({'type': 'result', 'result': result})
+        
+        threading.Thread(target=worker, name='test-run', daemon=True).start()
+        finished = False
+        try:
+            while not finished:
+                event = events.get()
+                finished = event['type'] == 'result'
+                yield event
+        finally:
+            if not finished:
+                cancel.set()
+    
+    def run_tests(self, python_code: str, test_code: str, on_event: Optional[EventCallback] = None,
+                  cancel: Optional[threading.Event] = None, test_ids: Optional[List[str]] = None,
+                  fail_fast: bool = False) -> Dict[str, Any]:
+        """Execute generated tests against Python code, reusing stored results for an identical run.
+
+        test_ids restricts the run to those node IDs, in that order; fail_fast
+        stops at the first failure.
+        """
+        if not self.result_cache:
+            return self._execute_tests(python_code, test_code, on_event, cancel, test_ids, fail_fast)
+        
+        config = self._result_config()
+        if test_ids:
+            config['selection'] = {'test_ids': test_ids, 'fail_fast': fail_fast}
+        key = self.result_cache.key(python_code, test_code, config)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            if on_event:
+                self._replay(cached, on_event)
+            return cached
+        
+        test_results = self._execute_tests(python_code, test_code, on_event, cancel, test_ids, fail_fast)
+        # Timeouts, cancellations and executor errors say nothing about the code
+        if test_results['exit_code'] != -1 and 'tests' in test_results and not (cancel and cancel.is_set()):
+            self.result_cache.set(key, test_results)
+        return test_results
+    
+    def _result_config(self) -> Dict[str, Any]:
+        """Executor settings that can change a run's outcome or output"""
+        return {
+            'timeout': self.timeout,
+            'limits': self.resource_limits.to_dict(),
+            'max_output_bytes': self.max_output_bytes,
+            'max_shards': self.max_shards
+        }
+    
+    @staticmethod
+    def _replay(test_results: Dict[str, Any], on_event: EventCallback):
+        """Emit the events a live run would have produced for stored results"""
+        for stream in ('stdout', 'stderr'):
+            if test_results[stream]:
+                on_event({'type': 'output', 'stream': stream, 'text': test_results[stream]})
+        on_event({'type': 'collected', 'count': len(test_results['tests']), 'cached': True})
+        for test in test_results['tests']:
+            on_event({'type': 'test', **test, 'cached': True})
+        on_event({'type': 'session_finished', 'exit_status': test_results['exit_code'], 'cached': True})
+    
+    def _execute_tests(self, python_code: str, test_code: str, on_event: Optional[EventCallback],
+                       cancel: Optional[threading.Event], test_ids: Optional[List[str]],
+                       fail_fast: bool) -> Dict[str, Any]:
         try:
             # Create temporary directory for test execution
-            with tempfile.TemporaryDirectory() as temp_dir:
+            with self._sandbox() as temp_dir:
                 # Write main code to file
                 main_file = os.path.join(temp_dir, 'main.py')
                 with open(main_file, 'w') as f:
@@ -34,19 +148,49 @@ from main import *
 """
                     f.write(test_imports + test_code)
                 
-                # Run tests using pytest
-                result = self._run_command([
-                    sys.executable, '-m', 'pytest', 
-                    test_file, '-v', '--tb=short'
-                ], cwd=temp_dir)
+                # Per-test outcomes and timings come from a plugin loaded as the sandbox's conftest.py
+                with open(os.path.join(temp_dir, 'conftest.py'), 'w') as f:
+                    f.write(EVENTS_PLUGIN_SOURCE)
                 
-                return {
+                tests: List[Dict[str, Any]] = []
+                def record(event: Dict[str, Any]):
+                    if event['type'] == 'test':
+                        tests.append({
+                            'nodeid': event['nodeid'],
+                            'outcome': event['outcome'],
+                            'duration': event['duration']
+                        })
+                    if on_event:
+                        on_event(event)
+                
+                if test_ids:
+                    # A focused re-run is small and ordered, so it stays in one process
+                    shard_count = 1
+                    pytest_args = list(test_ids) + ['-v', '--tb=short'] + (['-x'] if fail_fast else [])
+                    result = self._run_pytest(temp_dir, pytest_args, record, cancel)
+                else:
+                    all_ids = self._shardable_test_ids(temp_dir, python_code, test_code, cancel)
+                    shard_count = min(self.max_shards, len(all_ids))
+                    if shard_count > 1:
+                        result = self._run_shards(temp_dir, all_ids, shard_count, record, cancel)
+                    else:
+                        result = self._run_pytest(temp_dir, [test_file, '-v', '--tb=short'], record, cancel)
+                    if not (cancel and cancel.is_set()):
+                        self._record_suite_run(test_code, tests, result, sharded=shard_count > 1)
+                
+                test_results = {
                     'success': result['exit_code'] == 0,
                     'stdout': result['stdout'],
                     'stderr': result['stderr'],
                     'exit_code': result['exit_code'],
-                    'execution_time': result['execution_time']
+                    'execution_time': result['execution_time'],
+                    'tests': tests
                 }
+                if shard_count > 1:
+                    test_results['shards'] = shard_count
+                if test_ids:
+                    test_results['selected'] = list(test_ids)
+                return test_results
                 
         except Exception as e:
             logging.error(f"Test execution error: {str(e)}")
@@ -58,6 +202,119 @@ from main import *
                 'execution_time': 0
             }
     
+    def _run_pytest(self, cwd: str, pytest_args: List[str], on_event: Optional[EventCallback],
+                    cancel: Optional[threading.Event]) -> Dict[str, Any]:
+        """Run pytest, forked from a pre-warmed interpreter when available"""
+        result = None
+        if self.fork_server:
+            result = self.fork_server.run(pytest_args, cwd=cwd, timeout=self.timeout,
+                                          limits=self.resource_limits,
+                                          max_output_bytes=self.max_output_bytes,
+                                          on_event=on_event, cancel=cancel)
+        if result is None:
+            result = self._run_command([sys.executable, '-m', 'pytest'] + pytest_args, cwd=cwd,
+                                       on_event=on_event, cancel=cancel)
+        return result
+    
+    def _run_shards(self, cwd: str, test_ids: List[str], shard_count: int, on_event: EventCallback,
+                    cancel: Optional[threading.Event]) -> Dict[str, Any]:
+        """Run test IDs round-robin across parallel pytest processes and merge their results"""
+        import time
+        
+        start_time = time.time()
+        shards = [test_ids[i::shard_count] for i in range(shard_count)]
+        
+        def run_shard(index: int) -> Dict[str, Any]:
+            def tag(event: Dict[str, Any]):
+                on_event({**event, 'shard': index})
+            # The cache plugin would have every shard write .pytest_cache at once
+            return self._run_pytest(cwd, shards[index] + ['-v', '--tb=short', '-p', 'no:cacheprovider'], tag, cancel)
+        
+        with ThreadPoolExecutor(max_workers=shard_count, thread_name_prefix='test-shard') as pool:
+            results = list(pool.map(run_shard, range(shard_count)))
+        
+        exit_codes = [r['exit_code'] for r in results]
+        failed = [code for code in exit_codes if code != 0]
+        # A timed-out or cancelled shard (-1) decides the verdict over ordinary failures
+        exit_code = (-1 if -1 in failed else max(failed)) if failed else 0
+        
+        def merged(stream: str) -> str:
+            return '\n'.join(
+                f"===== shard {i + 1}/{shard_count} =====\n{r[stream]}"
+                for i, r in enumerate(results) if r[stream].strip()
+            )
+        
+        return {
+            'stdout': merged('stdout'),
+            'stderr': merged('stderr'),
+            'exit_code': exit_code,
+            'execution_time': time.time() - start_time
+        }
+    
+    def _shardable_test_ids(self, cwd: str, python_code: str, test_code: str,
+                            cancel: Optional[threading.Event]) -> List[str]:
+        """Node IDs to shard across processes, or [] when the suite should run in one process"""
+        if self.max_shards <= 1:
+            return []
+        
+        with self._suites_lock:
+            last_run = self._suite_runs.get(self._suite_key(test_code))
+        if last_run is not None:
+            test_count, seconds = last_run['tests'], last_run.get('seconds', 0.0)
+        else:
+            # Before the first run, count test functions in the source (parametrized cases count once)
+            test_count, seconds = len(TEST_FUNCTION.findall(test_code)), 0.0
+        # Collecting imports the user's code in an extra process; only pay for it when sharding is likely
+        if test_count < self.shard_min_tests and seconds < self.shard_min_seconds:
+            return []
+        
+        key = self._suite_key(python_code + '\0' + test_code)
+        with self._suites_lock:
+            test_ids = self._collected_ids.get(key)
+        if test_ids is None:
+            test_ids = self._collect_test_ids(cwd, cancel)
+            with self._suites_lock:
+                self._remember(self._collected_ids, key, test_ids)
+        if len(test_ids) < self.shard_min_tests and seconds < self.shard_min_seconds:
+            return []
+        return test_ids
+    
+    def _collect_test_ids(self, cwd: str, cancel: Optional[threading.Event]) -> List[str]:
+        """Node IDs as pytest collects them (classes, parametrization and re-exported tests included)"""
+        result = self._run_pytest(cwd, ['test_main.py', '--collect-only', '-q', '-p', 'no:cacheprovider'],
+                                  None, cancel)
+        if result['exit_code'] != 0:
+            # Let a single run report collection errors
+            return []
+        return [line.strip() for line in result['stdout'].splitlines()
+                if '::' in line and not line.startswith(' ')]
+    
+    @staticmethod
+    def _suite_key(test_code: str) -> str:
+        return hashlib.sha256(test_code.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _remember(cache: 'OrderedDict[str, Any]', key: str, value: Any):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > 256:
+            cache.popitem(last=False)
+    
+    def _record_suite_run(self, test_code: str, tests: List[Dict[str, Any]], result: Dict[str, Any],
+                          sharded: bool):
+        """Remember a full run's test count and duration, so a large or slow suite is sharded next time"""
+        with self._suites_lock:
+            key = self._suite_key(test_code)
+            run = dict(self._suite_runs.get(key, {}))
+            run['tests'] = max(len(tests), run.get('tests', 0))
+            if result['exit_code'] == -1:
+                # A suite that hits the timeout is slow by any threshold, not a run to forget
+                run['seconds'] = max(result['execution_time'], self.timeout, self.shard_min_seconds)
+            elif not sharded:
+                # Sharded runs are faster by design, so they keep the last unsharded duration
+                run['seconds'] = result['execution_time']
+            self._remember(self._suite_runs, key, run)
+    
     def validate_python_syntax(self, python_code: str) -> Dict[str, Any]:
         """Validate Python code syntax without executing it"""
         try:
@@ -88,7 +345,7 @@ from main import *
     def run_code_safely(self, python_code: str, input_data: str = '') -> Dict[str, Any]:
         """Execute Python code safely in an isolated environment"""
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
+            with self._sandbox() as temp_dir:
                 # Write code to temporary file
                 code_file = os.path.join(temp_dir, 'code.py')
                 with open(code_file, 'w') as f:
@@ -125,13 +382,32 @@ from main import *
                 'execution_time': 0
             }
     
-    def _run_command(self, cmd: list, cwd: str = None, stdin_data: bytes = None) -> Dict[str, Any]:
-        """Run a command with timeout and capture output"""
+    def _run_command(self, cmd: list, cwd: str = None, stdin_data: bytes = None,
+                     apply_limits: bool = True, on_event: Optional[EventCallback] = None,
+                     cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """Run a command with timeout, resource limits and bounded output capture.
+
+        With on_event, output chunks are reported as they arrive and the pytest
+        events plugin gets a pipe to report per-test outcomes on.
+        """
         import time
         
         start_time = time.time()
+        limits = self.resource_limits if apply_limits else None
         
+        def child_setup():
+            os.setsid()
+            if limits:
+                limits.apply()
+        
+        events_r = events_w = None
         try:
+            popen_kwargs = {}
+            if on_event and os.name != 'nt':
+                events_r, events_w = os.pipe()
+                popen_kwargs['pass_fds'] = (events_w,)
+                popen_kwargs['env'] = dict(os.environ, **{pytest_events.EVENTS_FD_ENV: str(events_w)})
+            
             # Run the command with timeout
             process = subprocess.Popen(
                 cmd,
@@ -139,27 +415,70 @@ from main import *
                 stderr=subprocess.PIPE,
                 stdin=subprocess.PIPE if stdin_data else None,
                 cwd=cwd,
-                text=True,
-                preexec_fn=os.setsid if os.name != 'nt' else None
+                preexec_fn=child_setup if os.name != 'nt' else None,
+                **popen_kwargs
             )
+            if events_w is not None:
+                os.close(events_w)
+                events_w = None
+            
+            # Stream output into bounded buffers instead of holding all of it in memory
+            limit = self.max_output_bytes
+            stdout_capture = BoundedOutput(limit, listener=output_listener(on_event, 'stdout', limit))
+            stderr_capture = BoundedOutput(limit, listener=output_listener(on_event, 'stderr', limit))
+            threads = [
+                threading.Thread(target=stdout_capture.drain, args=(process.stdout,), daemon=True),
+                threading.Thread(target=stderr_capture.drain, args=(process.stderr,), daemon=True)
+            ]
+            if events_r is not None:
+                threads.append(threading.Thread(target=EventLineReader(on_event).drain_fd, args=(events_r,), daemon=True))
+                events_r = None
+            if stdin_data:
+                threads.append(threading.Thread(target=self._feed_stdin, args=(process.stdin, stdin_data), daemon=True))
+            for thread in threads:
+                thread.start()
             
-            try:
-                stdout, stderr = process.communicate(
-                    input=stdin_data.decode() if stdin_data else None,
-                    timeout=self.timeout
-                )
-                exit_code = process.returncode
+            stop_reason = None
+            deadline = start_time + self.timeout
+            while True:
+                try:
+                    exit_code = process.wait(timeout=max(0.0, min(0.2, deadline - time.time())))
+                    break
+                except subprocess.TimeoutExpired:
+                    if cancel is not None and cancel.is_set():
+                        stop_reason = 'cancelled'
+                    elif time.time() >= deadline:
+                        stop_reason = 'timeout'
+                    else:
+                        continue
                 
-            except subprocess.TimeoutExpired:
                 # Kill the process group to ensure all child processes are terminated
                 if os.name != 'nt':
                     os.killpg(os.getpgid(process.pid), signal.SIGTERM)
                 else:
                     process.terminate()
-                
-                stdout, stderr = process.communicate()
+                try:
+                    process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    if os.name != 'nt':
+                        os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+                    process.kill()
+                    process.wait()
                 exit_code = -1
+                break
+            
+            # Grandchildren that escaped the group may hold the pipes open; don't wait on them forever
+            for thread in threads:
+                thread.join(timeout=5)
+            
+            stdout = stdout_capture.text()
+            stderr = stderr_capture.text()
+            if stop_reason == 'timeout':
                 stderr += f"\nProcess terminated due to timeout ({self.timeout}s)"
+            elif stop_reason == 'cancelled':
+                stderr += "\nProcess terminated because the run was cancelled"
+            elif os.name != 'nt' and exit_code == -signal.SIGXCPU:
+                stderr += "\nProcess terminated after exceeding its CPU time limit"
             
             execution_time = time.time() - start_time
             
@@ -171,6 +490,9 @@ from main import *
             }
             
         except Exception as e:
+            for fd in (events_r, events_w):
+                if fd is not None:
+                    os.close(fd)
             execution_time = time.time() - start_time
             return {
                 'stdout': '',
@@ -179,6 +501,14 @@ from main import *
                 'execution_time': execution_time
             }
     
+    @staticmethod
+    def _feed_stdin(stdin, data: bytes):
+        try:
+            stdin.write(data)
+            stdin.close()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+    
     def install_dependencies(self, requirements: list) -> Dict[str, Any]:
         """Install Python dependencies safely"""
         try:
@@ -197,7 +527,8 @@ from main import *
             
             # Install packages
             cmd = [sys.executable, '-m', 'pip', 'install'] + safe_requirements
-            result = self._run_command(cmd)
+            # pip needs more memory than a test run; only the timeout applies here
+            result = self._run_command(cmd, apply_limits=False)
             
             return {
                 'success': result['exit_code'] == 0,
@@ -0,0 +1,31 @@
+import re
+
+_OPENING_FENCE = re.compile(r'^\s*```[\w+#.-]*\s*$')
+_CLOSING_FENCE = re.compile(r'^\s*```\s*$')
+
+def strip_code_fences(code: str) -> str:
+    """Remove a markdown fence the model may wrap around code; fences inside the code are kept.
+
+    Only an opening fence line (with or without a language tag) and a closing
+    fence at the very end are removed, along with surrounding blank lines.
+    """
+    lines = code.split('\n')
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    while lines and not lines[-1].strip():
+        lines.pop()
+
+    opened = bool(lines) and _OPENING_FENCE.match(lines[0]) is not None
+    if opened:
+        lines.pop(0)
+        while lines and not lines[0].strip():
+            lines.pop(0)
+    if lines and _CLOSING_FENCE.match(lines[-1]):
+        lines.pop()
+    elif opened and lines and lines[-1].rstrip().endswith('```'):
+        # A closing fence glued to the last line of code
+        lines[-1] = lines[-1].rstrip()[:-3].rstrip()
+
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return '\n'.join(lines)
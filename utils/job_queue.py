@@ -0,0 +1,190 @@
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, List, Tuple
+
+# Events kept per job for late or reconnecting stream readers, bounded by count and total size
+EVENT_BACKLOG = 2000
+EVENT_BACKLOG_BYTES = 2 * 1024 * 1024
+# Largest output event built by merging consecutive chunks
+EVENT_MERGE_BYTES = 64 * 1024
+
+class Job:
+    """A background job whose status and progress can be polled by ID"""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancelled = threading.Event()
+        self._events: deque = deque()
+        self._event_bytes = 0
+        self._event_seq = 0
+        # Highest sequence number handed to a reader; later events can still be merged
+        self._read_seq = 0
+        self._readers = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def update(self, **progress):
+        """Merge progress fields reported by the running job"""
+        with self._lock:
+            self.progress.update(progress)
+            streamed = self._readers > 0
+        # Pollers read progress from to_dict(); only live streams need it as an event
+        if streamed:
+            self.emit({'type': 'progress', **progress})
+
+    def update_item(self, field: str, key: str, value: Any):
+        """Set one entry of a dict progress field (e.g. one file of a batch) without copying the rest"""
+        with self._lock:
+            self.progress.setdefault(field, {})[key] = value
+            streamed = self._readers > 0
+        if streamed:
+            self.emit({'type': 'progress', field: {key: value}})
+
+    def emit(self, event: Dict[str, Any]):
+        """Append an event for stream readers, merging output no reader has seen yet"""
+        with self._changed:
+            if self._events and self._mergeable(self._events[-1], event):
+                seq, last = self._events.pop()
+                self._event_bytes -= self._event_size(last)
+                event = {**last, 'text': last['text'] + event['text']}
+            else:
+                self._event_seq += 1
+                seq = self._event_seq
+            self._events.append((seq, event))
+            self._event_bytes += self._event_size(event)
+            while len(self._events) > 1 and (len(self._events) > EVENT_BACKLOG
+                                             or self._event_bytes > EVENT_BACKLOG_BYTES):
+                _, dropped = self._events.popleft()
+                self._event_bytes -= self._event_size(dropped)
+            self._changed.notify_all()
+
+    def _mergeable(self, last: Tuple[int, Dict[str, Any]], event: Dict[str, Any]) -> bool:
+        seq, previous = last
+        if seq <= self._read_seq or previous.get('type') != 'output' or event.get('type') != 'output':
+            return False
+        if len(previous.get('text', '')) + len(event.get('text', '')) > EVENT_MERGE_BYTES:
+            return False
+        return ({k: v for k, v in previous.items() if k != 'text'} ==
+                {k: v for k, v in event.items() if k != 'text'})
+
+    @staticmethod
+    def _event_size(event: Dict[str, Any]) -> int:
+        if event.get('type') == 'output':
+            return len(event.get('text', '')) + 64
+        return len(json.dumps(event, default=str))
+
+    def subscribe(self):
+        """Register a stream reader; progress events are only recorded while one is attached"""
+        with self._lock:
+            self._readers += 1
+            snapshot = {k: dict(v) if isinstance(v, dict) else v for k, v in self.progress.items()}
+        # Catch the new reader up on progress reported while nobody was listening
+        if snapshot:
+            self.emit({'type': 'progress', **snapshot})
+
+    def unsubscribe(self):
+        with self._lock:
+            self._readers -= 1
+
+    def events_since(self, seq: int, timeout: float = 15.0) -> List[Tuple[int, Dict[str, Any]]]:
+        """Events after sequence number seq, waiting up to timeout for new ones while the job runs"""
+        with self._changed:
+            if self._event_seq <= seq and not self.finished:
+                self._changed.wait(timeout)
+            events = [(n, event) for n, event in self._events if n > seq]
+            if events:
+                self._read_seq = max(self._read_seq, events[-1][0])
+            return events
+
+    def cancel(self):
+        """Ask the running job to stop at its next checkpoint"""
+        self.cancelled.set()
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'progress': {k: dict(v) if isinstance(v, dict) else v for k, v in self.progress.items()},
+                'error': self.error,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at
+            }
+            if include_result:
+                data['result'] = self.result
+            return data
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('completed', 'failed')
+
+class JobQueue:
+    """Bounded in-process worker pool for long-running jobs, with result TTL eviction"""
+
+    def __init__(self, max_workers: int = 2, result_ttl: int = 3600):
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable[..., Any], *args, **kwargs) -> Job:
+        """Queue func(job, *args, **kwargs); its return value becomes the job result"""
+        self.evict_expired()
+
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by ID; expired jobs are gone"""
+        self.evict_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def evict_expired(self):
+        """Drop finished jobs whose results are older than result_ttl"""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            statuses: Dict[str, int] = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {'max_workers': self.max_workers, 'jobs': statuses}
+
+    def _run(self, job: Job, func: Callable[..., Any], args: tuple, kwargs: dict):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = 'completed'
+        except Exception as e:
+            logging.error(f"Background {job.kind} job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            job.emit({'type': 'status', 'status': job.status})
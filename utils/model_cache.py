@@ -0,0 +1,72 @@
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Callable, Tuple
+
+class ModelListCache:
+    """Provider model listings keyed by base URL and API key fingerprint.
+
+    Entries are served for ``ttl`` seconds. Once an entry is older than
+    ``refresh_after`` it is still returned, and a background refresh is started.
+    """
+
+    def __init__(self, ttl: int = 6 * 3600, refresh_after: int = 3600):
+        self.ttl = ttl
+        self.refresh_after = refresh_after
+        self._entries: Dict[str, Tuple[List[Dict[str, Any]], float]] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(base_url: str, api_key: str) -> str:
+        """Cache key that never holds the API key itself"""
+        fingerprint = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+        return f"{base_url.rstrip('/')}|{fingerprint}"
+
+    def get_or_fetch(self, base_url: str, api_key: str,
+                     fetch: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Return cached models, fetching synchronously only when missing or expired"""
+        key = self.key(base_url, api_key)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None:
+            models, fetched_at = entry
+            age = now - fetched_at
+            if age < self.ttl:
+                if age >= self.refresh_after:
+                    self._refresh_in_background(key, fetch)
+                return models
+
+        return self._fetch(key, fetch)
+
+    def invalidate(self, base_url: str, api_key: str):
+        with self._lock:
+            self._entries.pop(self.key(base_url, api_key), None)
+
+    def _fetch(self, key: str, fetch: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        models = fetch()
+        with self._lock:
+            self._entries[key] = (models, time.time())
+        return models
+
+    def _refresh_in_background(self, key: str, fetch: Callable[[], List[Dict[str, Any]]]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch(key, fetch)
+            except Exception as e:
+                # Keep serving the previous listing; a revoked key fails on its next chat request
+                logging.warning(f"Background model list refresh failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name='model-refresh', daemon=True).start()
@@ -0,0 +1,132 @@
+import os
+import json
+import codecs
+import threading
+from collections import deque
+from typing import Deque, Dict, Any, Callable, Optional
+
+EventCallback = Callable[[Dict[str, Any]], None]
+
+class BoundedOutput:
+    """Byte capture that keeps the first and last part of a stream and drops the middle.
+
+    At most ``max_bytes`` are held: ``head_bytes`` from the start of the stream
+    and the rest as a ring buffer of the most recent output.
+    """
+
+    def __init__(self, max_bytes: int = 1024 * 1024, head_bytes: int = None,
+                 listener: Optional[Callable[[bytes], None]] = None):
+        self.max_bytes = max_bytes
+        self.listener = listener
+        self.head_bytes = head_bytes if head_bytes is not None else max_bytes // 4
+        self.tail_bytes = max_bytes - self.head_bytes
+        self.head = bytearray()
+        self.tail: Deque[bytes] = deque()
+        self.tail_size = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def append(self, chunk: bytes):
+        if self.listener:
+            self.listener(chunk)
+        with self._lock:
+            room = self.head_bytes - len(self.head)
+            if room > 0:
+                self.head.extend(chunk[:room])
+                chunk = chunk[room:]
+            if not chunk:
+                return
+
+            self.tail.append(chunk)
+            self.tail_size += len(chunk)
+            while self.tail_size > self.tail_bytes:
+                excess = self.tail_size - self.tail_bytes
+                oldest = self.tail[0]
+                if len(oldest) <= excess:
+                    self.tail.popleft()
+                    self.tail_size -= len(oldest)
+                    self.dropped += len(oldest)
+                else:
+                    self.tail[0] = oldest[excess:]
+                    self.tail_size -= excess
+                    self.dropped += excess
+
+    def drain(self, stream, chunk_size: int = 65536):
+        """Read a buffered binary stream to EOF (meant to run in a reader thread)"""
+        try:
+            for chunk in iter(lambda: stream.read1(chunk_size), b''):
+                self.append(chunk)
+        except (OSError, ValueError):
+            pass
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped > 0
+
+    def text(self) -> str:
+        with self._lock:
+            head = self.head.decode('utf-8', errors='replace')
+            tail = b''.join(self.tail).decode('utf-8', errors='replace')
+            if self.dropped:
+                return f"{head}\n... [{self.dropped} bytes of output truncated] ...\n{tail}"
+            return head + tail
+
+def output_listener(on_event: Optional[EventCallback], stream: str,
+                    max_bytes: Optional[int] = None) -> Optional[Callable[[bytes], None]]:
+    """Turn raw output chunks into 'output' events, decoding UTF-8 across chunk boundaries.
+
+    After max_bytes of a stream have been sent, one truncation notice is sent
+    instead of the rest, the same limit BoundedOutput applies to captured output.
+    """
+    if not on_event:
+        return None
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    sent = 0
+
+    def listener(chunk: bytes):
+        nonlocal sent
+        if max_bytes is not None:
+            if sent > max_bytes:
+                return
+            room = max_bytes - sent
+            sent += len(chunk)
+            if sent > max_bytes:
+                # A character cut in half at the limit is dropped rather than replaced
+                text = decoder.decode(chunk[:room])
+                on_event({'type': 'output', 'stream': stream,
+                          'text': text + f'\n... [live {stream} truncated after {max_bytes} bytes] ...\n'})
+                return
+        text = decoder.decode(chunk)
+        if text:
+            on_event({'type': 'output', 'stream': stream, 'text': text})
+    return listener
+
+class EventLineReader:
+    """Split a byte stream of JSON lines (from the pytest events plugin) into events"""
+
+    def __init__(self, on_event: EventCallback):
+        self.on_event = on_event
+        self._pending = bytearray()
+
+    def feed(self, chunk: bytes):
+        self._pending.extend(chunk)
+        while b'\n' in self._pending:
+            line, _, rest = bytes(self._pending).partition(b'\n')
+            self._pending = bytearray(rest)
+            try:
+                self.on_event(json.loads(line))
+            except ValueError:
+                continue
+
+    def drain_fd(self, fd: int):
+        """Read an events pipe to EOF (meant to run in a reader thread)"""
+        try:
+            while True:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    break
+                self.feed(chunk)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
@@ -0,0 +1,243 @@
+import re
+from typing import Dict, List, Tuple
+from utils.code_fences import strip_code_fences
+
+_OPEN_TAG = re.compile(r'<\?(php\b|=)?')
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+_FUNCTION_NAME = re.compile(r'\s*&?\s*([A-Za-z_][A-Za-z0-9_]*)\s*\(')
+_TYPE_NAME = re.compile(r'\s+([A-Za-z_][A-Za-z0-9_]*)')
+_HEREDOC_START = re.compile(r'<<<[ \t]*([\'"]?)([A-Za-z_][A-Za-z0-9_]*)\1')
+_IMPORT_LINE = re.compile(r'^(import\s|from\s+\S+\s+import\s)')
+
+class PHPChunker:
+    """Split PHP source at top-level declarations and stitch converted Python back together"""
+
+    DECLARATION_KEYWORDS = {'class', 'interface', 'trait', 'enum', 'function'}
+    MODIFIERS = {'abstract', 'final', 'readonly'}
+
+    def __init__(self, max_chunk_chars: int = 6000):
+        self.max_chunk_chars = max_chunk_chars
+
+    def split(self, php_code: str) -> List[Dict[str, str]]:
+        """Split PHP into conversion chunks.
+
+        Classes and functions come first (PHP hoists them, Python does not),
+        followed by the global script body. Adjacent pieces of the same kind
+        are packed together up to max_chunk_chars.
+        """
+        declarations = []
+        script = []
+        pos = 0
+
+        for start, end, kind, name in self._find_declarations(php_code):
+            if php_code[pos:start].strip():
+                script.append({'kind': 'script', 'names': [], 'code': php_code[pos:start]})
+            declarations.append({'kind': kind, 'names': [name], 'code': php_code[start:end]})
+            pos = end
+
+        if php_code[pos:].strip():
+            script.append({'kind': 'script', 'names': [], 'code': php_code[pos:]})
+
+        return self._pack(declarations) + self._pack(script)
+
+    def declared_names(self, php_code: str) -> List[str]:
+        """Names of all top-level classes and functions in the file"""
+        return [name for _, _, _, name in self._find_declarations(php_code)]
+
+    def stitch(self, python_chunks: List[str]) -> str:
+        """Join converted chunks, hoisting and de-duplicating their top-level imports"""
+        future_imports: List[str] = []
+        imports: List[str] = []
+        bodies: List[str] = []
+        seen = set()
+
+        for chunk in python_chunks:
+            chunk_imports, body = self._extract_imports(strip_code_fences(chunk))
+            for statement in chunk_imports:
+                normalized = ' '.join(statement.split())
+                if normalized in seen:
+                    continue
+                seen.add(normalized)
+                if statement.startswith('from __future__'):
+                    future_imports.append(statement)
+                else:
+                    imports.append(statement)
+            if body.strip():
+                bodies.append(body.strip('\n'))
+
+        header = '\n'.join(future_imports + imports)
+        parts = ([header] if header else []) + bodies
+        return '\n\n\n'.join(parts) + '\n'
+
+    def _pack(self, pieces: List[Dict]) -> List[Dict]:
+        """Merge consecutive pieces into chunks no larger than max_chunk_chars"""
+        chunks: List[Dict] = []
+        for piece in pieces:
+            if chunks and len(chunks[-1]['code']) + len(piece['code']) <= self.max_chunk_chars:
+                chunks[-1]['code'] += piece['code']
+                chunks[-1]['names'].extend(piece['names'])
+            else:
+                chunks.append({'kind': piece['kind'], 'names': list(piece['names']), 'code': piece['code']})
+        return chunks
+
+    def _extract_imports(self, python_code: str) -> Tuple[List[str], str]:
+        """Pull unindented import statements (including parenthesised ones) out of a chunk"""
+        imports = []
+        body = []
+        lines = python_code.split('\n')
+        i = 0
+
+        while i < len(lines):
+            line = lines[i]
+            if _IMPORT_LINE.match(line):
+                statement = [line]
+                # Follow parenthesised or backslash-continued imports
+                while i + 1 < len(lines) and (
+                    ('(' in ''.join(statement) and ')' not in ''.join(statement))
+                    or statement[-1].rstrip().endswith('\\')
+                ):
+                    i += 1
+                    statement.append(lines[i])
+                imports.append('\n'.join(statement).rstrip())
+            else:
+                body.append(line)
+            i += 1
+
+        return imports, '\n'.join(body)
+
+    def _find_declarations(self, code: str) -> List[Tuple[int, int, str, str]]:
+        """Locate top-level class/interface/trait/enum/function declarations.
+
+        Returns (start, end, kind, name) tuples. Start is extended back over the
+        docblock, comments and attributes directly above the declaration.
+        """
+        declarations = []
+        depth = 0
+        in_php = False
+        decl = None  # (start, kind, name) of the declaration being closed
+        prev_words: List[str] = []
+        i = 0
+        n = len(code)
+
+        while i < n:
+            if not in_php:
+                match = _OPEN_TAG.search(code, i)
+                if not match:
+                    break
+                in_php = True
+                i = match.end()
+                continue
+
+            ch = code[i]
+
+            if code.startswith('?>', i):
+                in_php = False
+                i += 2
+            elif ch in '\'"`':
+                i = self._skip_string(code, i, ch)
+            elif code.startswith('//', i) or (ch == '#' and not code.startswith('#[', i)):
+                # Line comments also end at a closing tag
+                newline = code.find('\n', i)
+                close_tag = code.find('?>', i)
+                ends = [p for p in (newline, close_tag) if p != -1]
+                i = min(ends) if ends else n
+            elif code.startswith('/*', i):
+                end = code.find('*/', i + 2)
+                i = n if end == -1 else end + 2
+            elif code.startswith('<<<', i):
+                i = self._skip_heredoc(code, i)
+            elif ch == '{':
+                depth += 1
+                i += 1
+            elif ch == '}':
+                depth -= 1
+                i += 1
+                if depth == 0 and decl is not None:
+                    # Take the rest of the line (e.g. a trailing comment) with the declaration
+                    newline = code.find('\n', i)
+                    end = n if newline == -1 else newline + 1
+                    declarations.append((decl[0], end, decl[1], decl[2]))
+                    decl = None
+                    i = end
+            elif ch.isalpha() or ch == '_':
+                match = _IDENTIFIER.match(code, i)
+                word = match.group(0)
+                lowered = word.lower()
+                if depth == 0 and decl is None and lowered in self.DECLARATION_KEYWORDS:
+                    found = self._match_declaration(code, i, match.end(), lowered, prev_words)
+                    if found:
+                        decl = found
+                prev_words = (prev_words + [lowered])[-2:]
+                i = match.end()
+            else:
+                if ch == ':' and code.startswith('::', i):
+                    # Foo::class is a constant, not a declaration
+                    prev_words = ['::']
+                elif not ch.isspace():
+                    prev_words = []
+                i += 1
+
+        return declarations
+
+    def _match_declaration(self, code: str, keyword_start: int, keyword_end: int,
+                           keyword: str, prev_words: List[str]):
+        """Return (start, kind, name) if the keyword at this position opens a named declaration"""
+        if prev_words and prev_words[-1] in ('new', '::'):
+            return None
+
+        if keyword == 'function':
+            match = _FUNCTION_NAME.match(code, keyword_end)
+        else:
+            match = _TYPE_NAME.match(code, keyword_end)
+        if not match:
+            return None
+
+        line_start = code.rfind('\n', 0, keyword_start) + 1
+        before = code[line_start:keyword_start].split()
+        if any(token.lower() not in self.MODIFIERS for token in before):
+            return None
+
+        return (self._leading_comment_start(code, line_start), keyword, match.group(1))
+
+    def _leading_comment_start(self, code: str, line_start: int) -> int:
+        """Walk back over docblocks, comments and attributes directly above a declaration"""
+        start = line_start
+        in_block = False
+        while start > 0:
+            prev_start = code.rfind('\n', 0, start - 1) + 1
+            line = code[prev_start:start].strip()
+            if in_block:
+                start = prev_start
+                if line.startswith('/*'):
+                    in_block = False
+                continue
+            if line.endswith('*/'):
+                start = prev_start
+                in_block = not line.startswith('/*')
+            elif line.startswith(('//', '#')):
+                start = prev_start
+            else:
+                break
+        return start
+
+    def _skip_string(self, code: str, i: int, quote: str) -> int:
+        """Return the index just past the string literal starting at i"""
+        i += 1
+        n = len(code)
+        while i < n:
+            if code[i] == '\\':
+                i += 2
+            elif code[i] == quote:
+                return i + 1
+            else:
+                i += 1
+        return n
+
+    def _skip_heredoc(self, code: str, i: int) -> int:
+        """Return the index just past the heredoc/nowdoc starting at i"""
+        match = _HEREDOC_START.match(code, i)
+        if not match:
+            return i + 3
+        terminator = re.compile(r'^[ \t]*' + re.escape(match.group(2)) + r'\b', re.MULTILINE)
+        end = terminator.search(code, match.end())
+        return len(code) if not end else end.end()
@@ -0,0 +1,219 @@
+import io
+import re
+import ast
+import sys
+import builtins
+import tokenize
+import importlib.util
+from typing import Dict, List, Any, Set
+from utils.code_fences import strip_code_fences
+
+_LEADING_WHITESPACE = re.compile(r'^[ \t]*')
+
+# Names the model often uses without importing them
+TYPING_NAMES = {'Any', 'Callable', 'Dict', 'Iterable', 'Iterator', 'List', 'Optional',
+                'Set', 'Tuple', 'Type', 'Union'}
+MODULE_GLOBALS = {'__name__', '__file__', '__doc__', '__builtins__', '__spec__',
+                  '__package__', '__loader__', '__annotations__'}
+
+class PreflightChecker:
+    """Local checks run before tests and fix rounds: fences, syntax, imports and undefined names.
+
+    Mechanical problems (markdown fences, missing stdlib/typing imports, tab
+    indentation) are repaired in place; everything else is reported as
+    diagnostics for the fix prompt.
+    """
+
+    def __init__(self, code_executor):
+        self.code_executor = code_executor
+        self._import_cache: Dict[str, bool] = {}
+
+    def check(self, python_code: str) -> Dict[str, Any]:
+        """Return the (possibly repaired) code, what was repaired, and the remaining diagnostics"""
+        repairs: List[str] = []
+        code = self._strip_fences(python_code, repairs)
+
+        syntax = self.code_executor.validate_python_syntax(code)
+        if not syntax['valid'] and '\t' in code:
+            expanded = self._expand_indentation(code)
+            if expanded != code and self.code_executor.validate_python_syntax(expanded)['valid']:
+                code = expanded
+                repairs.append('Replaced tab indentation with spaces')
+                syntax = {'valid': True, 'error': None}
+
+        if not syntax['valid']:
+            error = syntax['error']
+            return {
+                'ok': False,
+                'code': code,
+                'repairs': repairs,
+                'diagnostics': [{
+                    'type': 'syntax_error',
+                    'blocking': True,
+                    'line': error.get('line'),
+                    'message': error['message']
+                }]
+            }
+
+        tree = ast.parse(code)
+        undefined = self._undefined_names(tree)
+
+        missing_imports = self._repairable_imports(tree, undefined)
+        if missing_imports:
+            code = self._add_imports(code, tree, missing_imports)
+            repairs.extend(f'Added missing "{statement}"' for statement in missing_imports)
+            tree = ast.parse(code)
+            undefined = self._undefined_names(tree)
+
+        diagnostics = self._unresolved_imports(tree)
+        for name, line in sorted(undefined.items(), key=lambda item: item[1]):
+            diagnostics.append({
+                'type': 'undefined_name',
+                'blocking': False,
+                'line': line,
+                'message': f'Name "{name}" is used but never defined or imported'
+            })
+
+        return {
+            'ok': not any(d['blocking'] for d in diagnostics),
+            'code': code,
+            'repairs': repairs,
+            'diagnostics': diagnostics
+        }
+
+    def check_tests(self, test_code: str) -> str:
+        """Strip fence remnants from generated tests; other problems surface when pytest runs"""
+        return self._strip_fences(test_code, [])
+
+    @staticmethod
+    def format_diagnostics(diagnostics: List[Dict[str, Any]]) -> str:
+        """One line per diagnostic, for the fix prompt and synthesized test output"""
+        return '\n'.join(
+            f"{d['type']}" + (f" (line {d['line']})" if d.get('line') else '') + f": {d['message']}"
+            for d in diagnostics
+        )
+
+    @staticmethod
+    def _strip_fences(code: str, repairs: List[str]) -> str:
+        """Drop a markdown fence wrapped around code that does not parse; fences inside strings are kept"""
+        try:
+            ast.parse(code)
+            return code
+        except (SyntaxError, ValueError):
+            pass
+
+        stripped = strip_code_fences(code)
+        if stripped.strip() != code.strip():
+            repairs.append('Removed the markdown fence around the code')
+            return stripped + '\n'
+        return code
+
+    @staticmethod
+    def _expand_indentation(code: str) -> str:
+        """Replace tabs in leading indentation only, leaving lines that continue a multi-line string alone"""
+        string_lines = set()
+        try:
+            for token in tokenize.generate_tokens(io.StringIO(code).readline):
+                if token.type == tokenize.STRING and token.end[0] > token.start[0]:
+                    string_lines.update(range(token.start[0] + 1, token.end[0] + 1))
+        except (tokenize.TokenError, SyntaxError):
+            # Mixed indentation can confuse the tokenizer too; still only touch leading whitespace
+            pass
+
+        lines = code.split('\n')
+        for number, line in enumerate(lines, 1):
+            indent = _LEADING_WHITESPACE.match(line).group(0)
+            if '\t' in indent and number not in string_lines:
+                lines[number - 1] = indent.expandtabs(4) + line[len(indent):]
+        return '\n'.join(lines)
+
+    def _unresolved_imports(self, tree: ast.AST) -> List[Dict[str, Any]]:
+        diagnostics = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                if not self._importable(module):
+                    diagnostics.append({
+                        'type': 'unresolved_import',
+                        'blocking': False,
+                        'line': node.lineno,
+                        'message': f'Module "{module}" is not installed in the test environment'
+                    })
+        return diagnostics
+
+    def _importable(self, module: str) -> bool:
+        top_level = module.split('.')[0]
+        if top_level not in self._import_cache:
+            try:
+                self._import_cache[top_level] = importlib.util.find_spec(top_level) is not None
+            except (ImportError, ValueError):
+                self._import_cache[top_level] = False
+        return self._import_cache[top_level]
+
+    @staticmethod
+    def _undefined_names(tree: ast.AST) -> Dict[str, int]:
+        """Names loaded but bound nowhere in the module (scope-insensitive, so it never flags valid code)"""
+        bound: Set[str] = set(dir(builtins)) | MODULE_GLOBALS
+        loaded: Dict[str, int] = {}
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and any(alias.name == '*' for alias in node.names):
+                return {}
+            if isinstance(node, ast.Name):
+                if isinstance(node.ctx, ast.Load):
+                    loaded.setdefault(node.id, node.lineno)
+                else:
+                    bound.add(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                bound.add(node.name)
+            elif isinstance(node, ast.arg):
+                bound.add(node.arg)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    bound.add((alias.asname or alias.name).split('.')[0])
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                bound.add(node.name)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                bound.update(node.names)
+            elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+                bound.add(node.name)
+            elif isinstance(node, ast.MatchMapping) and node.rest:
+                bound.add(node.rest)
+
+        return {name: line for name, line in loaded.items() if name not in bound}
+
+    def _repairable_imports(self, tree: ast.AST, undefined: Dict[str, int]) -> List[str]:
+        """Import statements for undefined names that are unambiguously stdlib modules or typing names"""
+        if not undefined:
+            return []
+
+        attribute_bases = {node.value.id for node in ast.walk(tree)
+                           if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)}
+        statements = []
+        typing_names = sorted(name for name in undefined if name in TYPING_NAMES)
+        if typing_names:
+            statements.append(f"from typing import {', '.join(typing_names)}")
+        for name in sorted(undefined):
+            if name in attribute_bases and name in sys.stdlib_module_names and not name.startswith('_'):
+                statements.append(f'import {name}')
+        return statements
+
+    @staticmethod
+    def _add_imports(code: str, tree: ast.Module, statements: List[str]) -> str:
+        """Insert imports after the module docstring and any __future__ imports"""
+        insert_after = 0
+        for index, node in enumerate(tree.body):
+            is_docstring = (index == 0 and isinstance(node, ast.Expr)
+                            and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str))
+            is_future = isinstance(node, ast.ImportFrom) and node.module == '__future__'
+            if not (is_docstring or is_future):
+                break
+            insert_after = node.end_lineno
+
+        lines = code.split('\n')
+        return '\n'.join(lines[:insert_after] + statements + lines[insert_after:])
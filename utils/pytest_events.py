@@ -0,0 +1,64 @@
+"""pytest plugin that reports collection and per-test outcomes as JSON lines.
+
+CodeExecutor writes this file into the sandbox as conftest.py when a caller
+wants live events. Events go to the file descriptor named by
+PHP2PY_PYTEST_EVENTS_FD, so stdout and stderr stay exactly as pytest prints
+them. This module must only depend on the standard library.
+"""
+import os
+import json
+
+EVENTS_FD_ENV = 'PHP2PY_PYTEST_EVENTS_FD'
+MAX_MESSAGE_CHARS = 2000
+
+class EventReporter:
+    def __init__(self, fd: int):
+        self.stream = os.fdopen(fd, 'w', buffering=1)
+
+    def emit(self, event):
+        try:
+            self.stream.write(json.dumps(event) + '\n')
+        except (OSError, ValueError):
+            # The reader went away; the run itself must not fail because of it
+            pass
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.emit({
+                'type': 'collect_error',
+                'nodeid': report.nodeid,
+                'message': report.longreprtext[-MAX_MESSAGE_CHARS:]
+            })
+
+    def pytest_collection_finish(self, session):
+        self.emit({'type': 'collected', 'count': len(session.items)})
+
+    def pytest_runtest_logreport(self, report):
+        if report.when == 'call':
+            outcome = report.outcome
+        elif report.failed:
+            outcome = 'error'
+        elif report.skipped and report.when == 'setup':
+            outcome = 'skipped'
+        else:
+            return
+
+        event = {
+            'type': 'test',
+            'nodeid': report.nodeid,
+            'outcome': outcome,
+            'when': report.when,
+            'duration': round(report.duration, 6)
+        }
+        if report.failed:
+            event['message'] = report.longreprtext[-MAX_MESSAGE_CHARS:]
+        self.emit(event)
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        self.emit({'type': 'session_finished', 'exit_status': int(exitstatus)})
+        self.stream.flush()
+
+def pytest_configure(config):
+    fd = os.environ.get(EVENTS_FD_ENV)
+    if fd:
+        config.pluginmanager.register(EventReporter(int(fd)), 'php2py-events')
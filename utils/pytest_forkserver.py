@@ -0,0 +1,393 @@
+"""Long-lived process with pytest pre-imported that forks one child per test run.
+
+The server listens on a Unix socket. A client sends a JSON request line
+together with its stdout/stderr (and optional events) pipe write ends over
+SCM_RIGHTS; the server forks, the child becomes a process group leader,
+points fds 1 and 2 at those pipes and runs pytest.main() in the requested
+directory. The server replies with the child's pid, and later with its exit
+code once the child has been reaped.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import shutil
+import socket
+import logging
+import selectors
+import tempfile
+import threading
+import subprocess
+import importlib
+from typing import Dict, Any, List, Optional
+from utils.output_capture import BoundedOutput, EventCallback, EventLineReader, output_listener
+from utils.resource_limits import ResourceLimits
+from utils.pytest_events import EVENTS_FD_ENV
+
+DEFAULT_PRELOAD = ['pytest', 'json', 're', 'datetime', 'collections', 'flask', 'requests']
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class PytestForkServer:
+    """Client side: starts the server on first use and runs pytest through it"""
+
+    def __init__(self, preload: Optional[List[str]] = None, start_timeout: float = 10.0):
+        self.preload = preload if preload is not None else list(DEFAULT_PRELOAD)
+        self.start_timeout = start_timeout
+        self.socket_path: Optional[str] = None
+        self._socket_dir: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._owner_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional['PytestForkServer']:
+        """Build a fork server from TEST_FORK_SERVER* environment variables, or None when disabled"""
+        if not hasattr(os, 'fork') or not hasattr(socket, 'send_fds'):
+            return None
+        if os.environ.get('TEST_FORK_SERVER', '1').lower() in ('0', 'false', 'no'):
+            return None
+        preload = os.environ.get('TEST_FORK_SERVER_PRELOAD')
+        return cls(preload=[m.strip() for m in preload.split(',') if m.strip()] if preload is not None else None)
+
+    def run(self, args: List[str], cwd: str, timeout: int, limits: Optional[ResourceLimits] = None,
+            max_output_bytes: int = 1024 * 1024, on_event: Optional[EventCallback] = None,
+            cancel: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+        """Run pytest with args in cwd; returns the _run_command result dict, or None if the server is unavailable"""
+        if not self._ensure_started():
+            return None
+
+        start_time = time.time()
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+        except OSError as e:
+            logging.warning(f"Pytest fork server unreachable, running cold: {str(e)}")
+            return None
+
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        events_r, events_w = os.pipe() if on_event else (None, None)
+        read_ends = [fd for fd in (out_r, err_r, events_r) if fd is not None]
+        write_ends = [fd for fd in (out_w, err_w, events_w) if fd is not None]
+        try:
+            request = json.dumps({
+                'args': args,
+                'cwd': cwd,
+                'limits': limits.to_dict() if limits else None
+            }).encode('utf-8') + b'\n'
+            socket.send_fds(sock, [request], write_ends)
+        except OSError as e:
+            for fd in read_ends:
+                os.close(fd)
+            sock.close()
+            logging.warning(f"Pytest fork server request failed, running cold: {str(e)}")
+            return None
+        finally:
+            for fd in write_ends:
+                os.close(fd)
+
+        return self._collect(sock, out_r, err_r, events_r, timeout, start_time, max_output_bytes,
+                             on_event, cancel)
+
+    def close(self):
+        with self._lock:
+            if self._process is not None and self._owner_pid == os.getpid():
+                self._process.terminate()
+                self._remove_socket_dir()
+            self._process = None
+
+    def _remove_socket_dir(self):
+        if self._socket_dir:
+            shutil.rmtree(self._socket_dir, ignore_errors=True)
+            self._socket_dir = None
+
+    def _ensure_started(self) -> bool:
+        # A forked web worker must not share its parent's server connection state
+        if self._process is not None and self._owner_pid == os.getpid() and self._process.poll() is None:
+            return True
+
+        with self._lock:
+            if self._process is not None and self._owner_pid == os.getpid() and self._process.poll() is None:
+                return True
+
+            if self._owner_pid == os.getpid():
+                # Restarting after the server died; a forked worker leaves its parent's directory alone
+                self._remove_socket_dir()
+            self._socket_dir = tempfile.mkdtemp(prefix='php2py-forkserver-')
+            self.socket_path = os.path.join(self._socket_dir, 'server.sock')
+            try:
+                self._process = subprocess.Popen(
+                    [sys.executable, '-m', 'utils.pytest_forkserver', self.socket_path, ','.join(self.preload)],
+                    cwd=PACKAGE_ROOT,
+                    stdin=subprocess.DEVNULL,
+                    start_new_session=True
+                )
+            except OSError as e:
+                logging.warning(f"Could not start pytest fork server: {str(e)}")
+                self._process = None
+                self._remove_socket_dir()
+                return False
+            self._owner_pid = os.getpid()
+
+            deadline = time.time() + self.start_timeout
+            while time.time() < deadline:
+                if os.path.exists(self.socket_path):
+                    return True
+                if self._process.poll() is not None:
+                    break
+                time.sleep(0.02)
+
+            logging.warning("Pytest fork server did not come up; running tests cold")
+            self._process.kill()
+            self._process = None
+            self._remove_socket_dir()
+            return False
+
+    def _collect(self, sock: socket.socket, out_r: int, err_r: int, events_r: Optional[int], timeout: int,
+                 start_time: float, max_output_bytes: int, on_event: Optional[EventCallback],
+                 cancel: Optional[threading.Event]) -> Dict[str, Any]:
+        """Read child output, events and the server's status lines until the child exits or is stopped"""
+        selector = selectors.DefaultSelector()
+        buffers = {
+            out_r: BoundedOutput(max_output_bytes,
+                                 listener=output_listener(on_event, 'stdout', max_output_bytes)),
+            err_r: BoundedOutput(max_output_bytes,
+                                 listener=output_listener(on_event, 'stderr', max_output_bytes))
+        }
+        for fd in buffers:
+            selector.register(fd, selectors.EVENT_READ)
+        events = EventLineReader(on_event) if events_r is not None else None
+        if events_r is not None:
+            selector.register(events_r, selectors.EVENT_READ)
+        selector.register(sock, selectors.EVENT_READ)
+
+        control = bytearray()
+        pid = None
+        exit_code = None
+        stop_reason = None
+        deadline = start_time + timeout
+        kill_deadline = None
+
+        def kill_group(sig):
+            if pid is not None:
+                try:
+                    os.killpg(pid, sig)
+                except ProcessLookupError:
+                    pass
+
+        try:
+            while len(selector.get_map()) > 0:
+                now = time.time()
+                if stop_reason is None:
+                    if cancel is not None and cancel.is_set():
+                        stop_reason = 'cancelled'
+                    elif now >= deadline:
+                        stop_reason = 'timeout'
+                    if stop_reason:
+                        kill_group(signal.SIGTERM)
+                        # Give the killed group a moment to close its pipes
+                        kill_deadline = now + 5
+                elif now >= kill_deadline:
+                    kill_group(signal.SIGKILL)
+                    break
+
+                if stop_reason:
+                    wait = kill_deadline - now
+                else:
+                    # Wake up regularly to notice cancellation
+                    wait = min(deadline - now, 0.2) if cancel is not None else deadline - now
+
+                for key, _ in selector.select(timeout=max(0.0, wait)):
+                    if key.fileobj is sock:
+                        chunk = sock.recv(4096)
+                        if not chunk:
+                            selector.unregister(sock)
+                            continue
+                        control.extend(chunk)
+                        while b'\n' in control:
+                            line, _, rest = bytes(control).partition(b'\n')
+                            control = bytearray(rest)
+                            message = json.loads(line)
+                            if 'pid' in message:
+                                pid = message['pid']
+                                if stop_reason:
+                                    kill_group(signal.SIGTERM)
+                            if 'exit_code' in message:
+                                exit_code = message['exit_code']
+                    else:
+                        chunk = os.read(key.fd, 65536)
+                        if not chunk:
+                            selector.unregister(key.fd)
+                        elif key.fd == events_r:
+                            events.feed(chunk)
+                        else:
+                            buffers[key.fd].append(chunk)
+        finally:
+            selector.close()
+            sock.close()
+            for fd in (out_r, err_r, events_r):
+                if fd is not None:
+                    os.close(fd)
+
+        stdout = buffers[out_r].text()
+        stderr = buffers[err_r].text()
+        if stop_reason == 'timeout':
+            exit_code = -1
+            stderr += f"\nProcess terminated due to timeout ({timeout}s)"
+        elif stop_reason == 'cancelled':
+            exit_code = -1
+            stderr += "\nProcess terminated because the run was cancelled"
+        elif exit_code == -signal.SIGXCPU:
+            stderr += "\nProcess terminated after exceeding its CPU time limit"
+        elif exit_code is None:
+            exit_code = 1
+            stderr += "\nPytest fork server lost the test process"
+
+        return {
+            'stdout': stdout,
+            'stderr': stderr,
+            'exit_code': exit_code,
+            'execution_time': time.time() - start_time
+        }
+
+def _run_child(request: Dict[str, Any], out_fd: int, err_fd: int, events_fd: Optional[int] = None):
+    """Body of a forked child: never returns"""
+    exit_code = 1
+    try:
+        os.setsid()
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_fd, 1)
+        os.dup2(err_fd, 2)
+        for fd in (devnull, out_fd, err_fd):
+            os.close(fd)
+
+        if events_fd is not None:
+            os.environ[EVENTS_FD_ENV] = str(events_fd)
+        if request.get('limits'):
+            ResourceLimits.from_dict(request['limits']).apply()
+        os.chdir(request['cwd'])
+        _isolate_imports(request['cwd'])
+        import pytest
+        exit_code = int(pytest.main(request['args']))
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+def _isolate_imports(cwd: str):
+    """Give test code the sandbox as its import path, as a cold `python -m pytest` run would have.
+
+    The server runs from the repository root, so without this user code could
+    import the application's own utils package.
+    """
+    sys.path[:] = [cwd] + [path for path in sys.path
+                           if path and os.path.abspath(path) != PACKAGE_ROOT]
+    for name in [name for name in sys.modules if name == 'utils' or name.startswith('utils.')]:
+        del sys.modules[name]
+
+def serve(socket_path: str, preload: List[str]):
+    """Server main loop: one fork per request, children reaped on SIGCHLD"""
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass
+
+    parent_pid = os.getppid()
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path + '.tmp')
+    os.rename(socket_path + '.tmp', socket_path)
+    listener.listen(64)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wakeup_r, selectors.EVENT_READ)
+    children: Dict[int, socket.socket] = {}
+
+    while True:
+        # Exit once the web worker that started us is gone
+        if os.getppid() != parent_pid:
+            break
+
+        for key, _ in selector.select(timeout=1.0):
+            if key.fileobj is listener:
+                conn, _ = listener.accept()
+                try:
+                    message, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+                    while not message.endswith(b'\n'):
+                        more = conn.recv(65536)
+                        if not more:
+                            break
+                        message += more
+                    if len(fds) not in (2, 3):
+                        for fd in fds:
+                            os.close(fd)
+                        raise ValueError('expected stdout, stderr and optional events descriptors')
+                    request = json.loads(message)
+                except Exception:
+                    conn.close()
+                    continue
+
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    listener.close()
+                    for other in children.values():
+                        other.close()
+                    conn.close()
+                    _run_child(request, *fds)
+
+                for fd in fds:
+                    os.close(fd)
+                children[pid] = conn
+                try:
+                    conn.sendall(json.dumps({'pid': pid}).encode('utf-8') + b'\n')
+                except OSError:
+                    pass
+            else:
+                try:
+                    os.read(wakeup_r, 512)
+                except BlockingIOError:
+                    pass
+
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            conn = children.pop(pid, None)
+            if conn is not None:
+                try:
+                    conn.sendall(json.dumps({'exit_code': os.waitstatus_to_exitcode(status)}).encode('utf-8') + b'\n')
+                except OSError:
+                    pass
+                conn.close()
+
+    listener.close()
+    try:
+        os.unlink(socket_path)
+    except OSError:
+        pass
+
+if __name__ == '__main__':
+    serve(sys.argv[1], [m for m in sys.argv[2].split(',') if m] if len(sys.argv) > 2 else DEFAULT_PRELOAD)
@@ -0,0 +1,173 @@
+import os
+import re
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+class TokenBucket:
+    """Token bucket that can also be paused until a provider-announced reset time"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.remaining: Optional[int] = None
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, now: float) -> float:
+        """Take a token if one is available, otherwise return how long to wait"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class RateLimiter:
+    """Client-side limiter keyed by provider and model, fed by rate-limit response headers"""
+
+    def __init__(self, default_rate: float = 5.0, default_capacity: float = 10.0,
+                 provider_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 max_wait: float = 60.0):
+        self.default_rate = default_rate
+        self.default_capacity = default_capacity
+        self.provider_limits = provider_limits or {}
+        self.max_wait = max_wait
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'RateLimiter':
+        """Build a limiter from AI_RATE_* environment variables.
+
+        AI_RATE_LIMITS takes host=rate/capacity pairs, e.g.
+        "api.groq.com=0.5/5,generativelanguage.googleapis.com=0.25/4".
+        """
+        provider_limits = {}
+        for item in os.environ.get('AI_RATE_LIMITS', '').split(','):
+            if '=' not in item:
+                continue
+            host, limit = item.split('=', 1)
+            rate, _, capacity = limit.partition('/')
+            provider_limits[host.strip()] = (float(rate), float(capacity or rate))
+
+        return cls(
+            default_rate=float(os.environ.get('AI_RATE_DEFAULT', '5')),
+            default_capacity=float(os.environ.get('AI_RATE_BURST', '10')),
+            provider_limits=provider_limits,
+            max_wait=float(os.environ.get('AI_RATE_MAX_WAIT', '60'))
+        )
+
+    def acquire(self, provider: str, model: str):
+        """Block until a request to this provider/model may be sent"""
+        deadline = time.monotonic() + self.max_wait
+        bucket = self._bucket(provider, model)
+
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                wait = bucket.reserve(now)
+                if wait > 0:
+                    bucket.throttled += 1
+            if wait <= 0:
+                return
+            if now + wait > deadline:
+                raise Exception(f"Rate limit for {provider} ({model}) not lifted within {self.max_wait:.0f}s")
+            time.sleep(min(wait, 1.0))
+
+    def observe(self, provider: str, model: str, status_code: int, headers) -> Optional[float]:
+        """Update limiter state from a response; returns the Retry-After delay if any"""
+        retry_after = self.parse_retry_after(headers.get('Retry-After') or headers.get('retry-after'))
+        remaining, reset = self._parse_rate_headers(headers)
+        bucket = self._bucket(provider, model)
+
+        with self._lock:
+            now = time.monotonic()
+            if remaining is not None:
+                bucket.remaining = remaining
+            if status_code == 429:
+                pause = retry_after if retry_after is not None else (reset if reset is not None else 1.0)
+                bucket.blocked_until = max(bucket.blocked_until, now + pause)
+                bucket.tokens = 0
+            elif remaining == 0 and reset is not None:
+                # Out of quota: hold requests until the window resets instead of collecting 429s
+                bucket.blocked_until = max(bucket.blocked_until, now + reset)
+
+        return retry_after
+
+    def stats(self) -> Dict[str, Any]:
+        """Current limiter state per provider/model"""
+        now = time.monotonic()
+        with self._lock:
+            state = {}
+            for (provider, model), bucket in self._buckets.items():
+                bucket._refill(now)
+                state[f'{provider}/{model}'] = {
+                    'rate_per_second': bucket.rate,
+                    'capacity': bucket.capacity,
+                    'tokens': round(bucket.tokens, 2),
+                    'blocked_for_seconds': round(max(0.0, bucket.blocked_until - now), 2),
+                    'provider_remaining': bucket.remaining,
+                    'throttled': bucket.throttled
+                }
+            return state
+
+    def _bucket(self, provider: str, model: str) -> TokenBucket:
+        key = (provider, model)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, capacity = self.provider_limits.get(provider, (self.default_rate, self.default_capacity))
+                bucket = TokenBucket(rate, capacity)
+                self._buckets[key] = bucket
+            return bucket
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Parse a Retry-After header given as seconds or as an HTTP date"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def _parse_rate_headers(cls, headers) -> Tuple[Optional[int], Optional[float]]:
+        """Read remaining requests and seconds until reset from OpenAI/Groq or Anthropic headers"""
+        remaining = headers.get('x-ratelimit-remaining-requests') or headers.get('anthropic-ratelimit-requests-remaining')
+        reset = headers.get('x-ratelimit-reset-requests') or headers.get('anthropic-ratelimit-requests-reset')
+
+        try:
+            remaining = int(remaining) if remaining is not None else None
+        except ValueError:
+            remaining = None
+
+        return remaining, cls._parse_reset(reset) if reset else None
+
+    @staticmethod
+    def _parse_reset(value: str) -> Optional[float]:
+        """Parse reset values like "1s", "6m0s", "250ms" or an RFC 3339 timestamp"""
+        units = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+        parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+        if parts and ''.join(n + u for n, u in parts) == value.strip():
+            return sum(float(n) * units[u] for n, u in parts)
+        try:
+            reset_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return max(0.0, (reset_at - datetime.now(reset_at.tzinfo)).total_seconds())
+        except ValueError:
+            return None
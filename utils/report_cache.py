@@ -0,0 +1,76 @@
+import os
+import json
+import hashlib
+import tempfile
+from typing import Dict, Any, Optional
+from utils.response_cache import ResponseCache
+
+# Bump when the security prompts or report format change so old reports are ignored
+ANALYZER_VERSION = '2'
+
+class SecurityReportCache:
+    """Security reports keyed by code fingerprint, language, model and analyzer version"""
+
+    def __init__(self, store: ResponseCache, analyzer_version: str = ANALYZER_VERSION):
+        self.store = store
+        self.analyzer_version = analyzer_version
+
+    @classmethod
+    def from_env(cls) -> Optional['SecurityReportCache']:
+        """Build a report cache from SECURITY_CACHE_* environment variables, or None when disabled"""
+        if os.environ.get('SECURITY_CACHE_ENABLED', '1').lower() in ('0', 'false', 'no'):
+            return None
+
+        db_path = os.environ.get(
+            'SECURITY_CACHE_PATH',
+            os.path.join(tempfile.gettempdir(), 'php2py_security_reports.sqlite3')
+        )
+        store = ResponseCache(
+            db_path=db_path or None,
+            ttl=int(os.environ.get('SECURITY_CACHE_TTL', str(24 * 3600))),
+            memory_entries=int(os.environ.get('SECURITY_CACHE_MEMORY_ENTRIES', '128')),
+            max_disk_bytes=int(os.environ.get('SECURITY_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        )
+        return cls(store)
+
+    @staticmethod
+    def fingerprint(code: str) -> str:
+        """Hash of the code as the endpoints see it (surrounding whitespace ignored)"""
+        return hashlib.sha256(code.strip().encode('utf-8')).hexdigest()
+
+    def _prefix(self, code: str, language: str) -> str:
+        return f'{self.fingerprint(code)}:{language.lower()}:'
+
+    def _key(self, code: str, language: str, model: str) -> str:
+        return f'{self._prefix(code, language)}{self.analyzer_version}:{model}'
+
+    def get(self, code: str, language: str, model: str) -> Optional[Dict[str, Any]]:
+        """Return the cached report for this code, or None"""
+        cached = self.store.get(self._key(code, language, model))
+        if cached is None:
+            return None
+        report = json.loads(cached)
+        report['cached'] = True
+        return report
+
+    def set(self, code: str, language: str, model: str, report: Dict[str, Any]):
+        """Store a report computed for this code"""
+        report = {k: v for k, v in report.items() if k != 'cached'}
+        self.store.set(self._key(code, language, model), json.dumps(report))
+
+    def invalidate(self, code: str, language: str):
+        """Drop reports for this code under every model and analyzer version"""
+        if code and code.strip():
+            self.store.delete_prefix(self._prefix(code, language))
+
+    def get_unit(self, unit_hash: str, model: str) -> Optional[Dict[str, Any]]:
+        """Return findings stored for one function/class unit, with lines relative to the unit"""
+        cached = self.store.get(f'unit:{unit_hash}:{self.analyzer_version}:{model}')
+        return json.loads(cached) if cached is not None else None
+
+    def set_unit(self, unit_hash: str, model: str, findings: Dict[str, Any]):
+        """Store findings for one unit; units are content-addressed so they never need invalidating"""
+        self.store.set(f'unit:{unit_hash}:{self.analyzer_version}:{model}', json.dumps(findings))
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
@@ -0,0 +1,64 @@
+import os
+from typing import Dict, Any, Optional
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; limits are then skipped
+    resource = None
+
+class ResourceLimits:
+    """Per-run rlimits applied in the child process before user code starts"""
+
+    def __init__(self, memory_bytes: Optional[int] = 512 * 1024 * 1024,
+                 cpu_seconds: Optional[int] = 60, max_processes: Optional[int] = None):
+        self.memory_bytes = memory_bytes
+        self.cpu_seconds = cpu_seconds
+        self.max_processes = max_processes
+
+    @classmethod
+    def from_env(cls) -> 'ResourceLimits':
+        """Build limits from EXEC_* environment variables; 0 leaves a limit unset.
+
+        RLIMIT_NPROC counts every process of the user, not just the child's, so
+        EXEC_MAX_PROCESSES is off by default and should be set with headroom
+        for the web workers running as the same user.
+        """
+        def optional(name: str, default: str) -> Optional[int]:
+            value = int(os.environ.get(name, default))
+            return value or None
+
+        memory_mb = optional('EXEC_MEMORY_LIMIT_MB', '512')
+        return cls(
+            memory_bytes=memory_mb * 1024 * 1024 if memory_mb else None,
+            cpu_seconds=optional('EXEC_CPU_LIMIT_SECONDS', '60'),
+            max_processes=optional('EXEC_MAX_PROCESSES', '0')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'memory_bytes': self.memory_bytes,
+            'cpu_seconds': self.cpu_seconds,
+            'max_processes': self.max_processes
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ResourceLimits':
+        return cls(data.get('memory_bytes'), data.get('cpu_seconds'), data.get('max_processes'))
+
+    def apply(self):
+        """Lower this process's soft and hard limits; never raises a limit above the current hard limit"""
+        if resource is None:
+            return
+        for limit, value in ((resource.RLIMIT_AS, self.memory_bytes),
+                             (resource.RLIMIT_CPU, self.cpu_seconds),
+                             (resource.RLIMIT_NPROC, self.max_processes)):
+            if not value:
+                continue
+            _, hard = resource.getrlimit(limit)
+            # One extra CPU second so SIGXCPU at the soft limit arrives before SIGKILL at the hard one
+            new_hard = value + 1 if limit == resource.RLIMIT_CPU else value
+            if hard != resource.RLIM_INFINITY:
+                value = min(value, hard)
+                new_hard = min(new_hard, hard)
+            resource.setrlimit(limit, (value, new_hard))
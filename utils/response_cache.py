@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Iterable
+
+class ResponseCache:
+    """Two-tier cache for AI completions: in-process LRU plus a SQLite file shared across workers"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl: int = 7 * 24 * 3600,
+                 memory_entries: int = 256, max_disk_bytes: int = 256 * 1024 * 1024,
+                 disabled_namespaces: Optional[Iterable[str]] = None):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.disabled_namespaces = set(disabled_namespaces or [])
+
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes_since_prune = 0
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'bypassed': 0}
+
+        if self.db_path:
+            try:
+                self._init_db()
+            except sqlite3.Error as e:
+                # The memory tier still works without the shared disk tier
+                logging.warning(f"Response cache disk tier disabled: {str(e)}")
+                self.db_path = None
+
+    @classmethod
+    def from_env(cls) -> Optional['ResponseCache']:
+        """Build a cache from RESPONSE_CACHE_* environment variables, or None when disabled"""
+        if os.environ.get('RESPONSE_CACHE_ENABLED', '1').lower() in ('0', 'false', 'no'):
+            return None
+
+        db_path = os.environ.get(
+            'RESPONSE_CACHE_PATH',
+            os.path.join(tempfile.gettempdir(), 'php2py_response_cache.sqlite3')
+        )
+        disabled = [n.strip() for n in os.environ.get('RESPONSE_CACHE_DISABLE', '').split(',') if n.strip()]
+
+        return cls(
+            db_path=db_path or None,
+            ttl=int(os.environ.get('RESPONSE_CACHE_TTL', str(7 * 24 * 3600))),
+            memory_entries=int(os.environ.get('RESPONSE_CACHE_MEMORY_ENTRIES', '256')),
+            max_disk_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+            disabled_namespaces=disabled
+        )
+
+    @staticmethod
+    def make_key(parts: Dict[str, Any]) -> str:
+        """Hash the request parts that determine a completion into a cache key"""
+        canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def is_enabled(self, namespace: Optional[str]) -> bool:
+        """Check whether caching is allowed for the given endpoint namespace"""
+        return namespace not in self.disabled_namespaces
+
+    def get(self, key: str, namespace: Optional[str] = None) -> Optional[str]:
+        """Look up a cached completion, checking memory first and then disk"""
+        if not self.is_enabled(namespace):
+            self._count('bypassed')
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+
+        if self.db_path:
+            try:
+                conn = self._get_conn()
+                row = conn.execute(
+                    'SELECT value, created_at FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if now - created_at <= self.ttl:
+                        conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+                        conn.commit()
+                        self._remember(key, value, created_at)
+                        self._count('disk_hits')
+                        return value
+                    conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Response cache read failed: {str(e)}")
+
+        self._count('misses')
+        return None
+
+    def set(self, key: str, value: str, namespace: Optional[str] = None):
+        """Store a completion in both tiers"""
+        if not self.is_enabled(namespace) or not value:
+            return
+
+        now = time.time()
+        self._remember(key, value, now)
+        self._count('stores')
+
+        if self.db_path:
+            try:
+                conn = self._get_conn()
+                conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, value, created_at, last_access, size) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, value, now, now, len(value.encode('utf-8')))
+                )
+                conn.commit()
+
+                with self._lock:
+                    self._writes_since_prune += 1
+                    should_prune = self._writes_since_prune >= 50
+                    if should_prune:
+                        self._writes_since_prune = 0
+                if should_prune:
+                    self.prune()
+            except sqlite3.Error as e:
+                logging.warning(f"Response cache write failed: {str(e)}")
+
+    def delete(self, key: str):
+        """Remove a single entry from both tiers"""
+        self.delete_prefix(key, exact=True)
+
+    def delete_prefix(self, prefix: str, exact: bool = False):
+        """Remove every entry whose key starts with prefix from both tiers"""
+        with self._lock:
+            stale = [k for k in self._memory if (k == prefix if exact else k.startswith(prefix))]
+            for key in stale:
+                del self._memory[key]
+
+        if self.db_path:
+            try:
+                conn = self._get_conn()
+                if exact:
+                    conn.execute('DELETE FROM responses WHERE key = ?', (prefix,))
+                else:
+                    conn.execute('DELETE FROM responses WHERE substr(key, 1, ?) = ?', (len(prefix), prefix))
+                conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Response cache delete failed: {str(e)}")
+
+    def prune(self):
+        """Evict expired entries, then least recently used ones until under the size budget"""
+        if not self.db_path:
+            return
+
+        conn = self._get_conn()
+        conn.execute('DELETE FROM responses WHERE created_at < ?', (time.time() - self.ttl,))
+
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total > self.max_disk_bytes:
+            excess = total - self.max_disk_bytes
+            freed = 0
+            stale_keys = []
+            for key, size in conn.execute('SELECT key, size FROM responses ORDER BY last_access ASC'):
+                stale_keys.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany('DELETE FROM responses WHERE key = ?', stale_keys)
+        conn.commit()
+
+    def clear(self):
+        """Drop every cached completion"""
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            conn = self._get_conn()
+            conn.execute('DELETE FROM responses')
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        stats['disk_enabled'] = bool(self.db_path)
+        stats['disabled_namespaces'] = sorted(self.disabled_namespaces)
+        return stats
+
+    def _remember(self, key: str, value: str, created_at: float):
+        """Insert into the memory tier, evicting the least recently used entry when full"""
+        with self._lock:
+            self._memory[key] = (value, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Return this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._get_conn()
+        # WAL lets gunicorn workers read while another one writes
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)')
+        conn.commit()
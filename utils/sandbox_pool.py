@@ -0,0 +1,109 @@
+import os
+import queue
+import atexit
+import shutil
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+MEMORY_FILESYSTEM = '/dev/shm'
+
+class SandboxPool:
+    """Pre-created sandbox directories, scrubbed and reused between code runs.
+
+    Directories live under ``root`` (a memory-backed filesystem by default).
+    At most ``size`` are handed out at once; a caller that finds the pool empty
+    waits up to ``acquire_timeout`` seconds, then gets a one-off directory.
+    """
+
+    def __init__(self, root: Optional[str] = None, size: int = 2, acquire_timeout: float = 30.0):
+        self.root = root or self.default_root()
+        self.size = max(1, size)
+        self.acquire_timeout = acquire_timeout
+        self._free: 'queue.Queue[str]' = queue.Queue()
+        self._created: List[str] = []
+        self._owner_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, default_size: int) -> 'SandboxPool':
+        """Build a pool from SANDBOX_* environment variables, sized to the concurrent test runs by default"""
+        return cls(
+            root=os.environ.get('SANDBOX_ROOT') or None,
+            size=int(os.environ.get('SANDBOX_POOL_SIZE', str(default_size))),
+            acquire_timeout=float(os.environ.get('SANDBOX_ACQUIRE_TIMEOUT', '30'))
+        )
+
+    @staticmethod
+    def default_root() -> str:
+        if os.path.isdir(MEMORY_FILESYSTEM) and os.access(MEMORY_FILESYSTEM, os.W_OK):
+            return MEMORY_FILESYSTEM
+        return tempfile.gettempdir()
+
+    @contextmanager
+    def acquire(self) -> Iterator[str]:
+        """Yield an empty sandbox directory and scrub it afterwards"""
+        self._ensure_created()
+        try:
+            directory = self._free.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            logging.warning("Sandbox pool exhausted, using a one-off directory")
+            with tempfile.TemporaryDirectory(dir=self.root, prefix='php2py-sandbox-') as directory:
+                yield directory
+            return
+
+        try:
+            yield directory
+        finally:
+            self._release(directory)
+
+    def close(self):
+        """Remove every pooled directory created by this process"""
+        with self._lock:
+            if self._owner_pid != os.getpid():
+                return
+            for directory in self._created:
+                shutil.rmtree(directory, ignore_errors=True)
+            self._created = []
+            self._free = queue.Queue()
+            self._owner_pid = None
+
+    def _ensure_created(self):
+        # Forked web workers must not share their parent's directories
+        if self._owner_pid == os.getpid():
+            return
+        with self._lock:
+            if self._owner_pid == os.getpid():
+                return
+            self._free = queue.Queue()
+            self._created = []
+            for _ in range(self.size):
+                directory = tempfile.mkdtemp(dir=self.root, prefix=f'php2py-sandbox-{os.getpid()}-')
+                self._created.append(directory)
+                self._free.put(directory)
+            self._owner_pid = os.getpid()
+
+    def _release(self, directory: str):
+        try:
+            self._scrub(directory)
+        except OSError as e:
+            # Never hand out a directory that may still hold another run's files
+            logging.warning(f"Replacing sandbox {directory} after failed scrub: {str(e)}")
+            shutil.rmtree(directory, ignore_errors=True)
+            replacement = tempfile.mkdtemp(dir=self.root, prefix=f'php2py-sandbox-{os.getpid()}-')
+            with self._lock:
+                self._created = [d for d in self._created if d != directory] + [replacement]
+            directory = replacement
+        self._free.put(directory)
+
+    @staticmethod
+    def _scrub(directory: str):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
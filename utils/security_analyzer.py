@@ -1,7 +1,190 @@
 import re
 import ast
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Callable, Optional
+from utils.simple_security import PatternScanner
+
+SECRET_NAME_MIN_LENGTHS = {'password': 8, 'api_key': 20, 'secret': 16, 'token': 20}
+SECRET_KEYWORDS = ('password', 'secret', 'key', 'token')
+SQL_KEYWORDS = ('select', 'insert', 'update', 'delete')
+SQL_STATEMENT = re.compile(r'\b(select|insert\s+into|update\s+\w+\s+set|delete\s+from)\b', re.IGNORECASE)
+# Where request data enters a program: the user_input convention, input(), sys.argv and Flask's request
+USER_INPUT_NAMES = ('user_input',)
+USER_INPUT_CALLS = ('input', 'raw_input')
+USER_INPUT_ROOTS = ('request', 'sys.argv')
+
+class SecurityRuleVisitor(ast.NodeVisitor):
+    """Single-pass AST walk that dispatches each node only to rules registered for its type"""
+
+    def __init__(self, analyzer: 'SecurityAnalyzer', lines: List[str]):
+        self.analyzer = analyzer
+        self.lines = lines
+        self.issues: List[Dict[str, Any]] = []
+        self.rules: Dict[type, List[Callable[[ast.AST], None]]] = {}
+        # Nodes already inside a reported SQL string, so nested parts are not reported again
+        self._sql_reported: set = set()
+
+        self.register(ast.Call, self._check_dangerous_call)
+        self.register(ast.Call, self._check_sql_call)
+        self.register(ast.Call, self._check_sql_string)
+        self.register(ast.BinOp, self._check_sql_string)
+        self.register(ast.JoinedStr, self._check_sql_string)
+        self.register(ast.Call, self._check_markup_call)
+        self.register(ast.Call, self._check_file_call)
+        self.register(ast.Call, self._check_deserialization_call)
+        self.register(ast.Constant, self._check_secret_literal)
+        self.register(ast.Assign, self._check_secret_assignment)
+        self.register(ast.AnnAssign, self._check_secret_assignment)
+        self.register(ast.keyword, self._check_secret_keyword)
+        self.register(ast.Dict, self._check_secret_dict)
+
+    def register(self, node_type: type, rule: Callable[[ast.AST], None]):
+        self.rules.setdefault(node_type, []).append(rule)
+
+    def visit(self, node: ast.AST):
+        for rule in self.rules.get(type(node), ()):
+            rule(node)
+        self.generic_visit(node)
+
+    def report(self, pattern_type: str, node: ast.AST, message: str, issue_type: Optional[str] = None):
+        """Record an issue; issue_type keeps an identifier that differs from its pattern family"""
+        line_num = getattr(node, 'lineno', 0)
+        line = self.lines[line_num - 1] if 0 < line_num <= len(self.lines) else ''
+        self.issues.append(self.analyzer._make_issue(pattern_type, line_num, message, line, issue_type))
+
+    @staticmethod
+    def _call_name(node: ast.Call) -> str:
+        """Dotted name of the called function, e.g. 'os.system' or 'cursor.execute'"""
+        parts = []
+        func = node.func
+        while isinstance(func, ast.Attribute):
+            parts.append(func.attr)
+            func = func.value
+        if isinstance(func, ast.Name):
+            parts.append(func.id)
+        return '.'.join(reversed(parts))
+
+    @staticmethod
+    def _is_dynamic_string(node: Optional[ast.AST]) -> bool:
+        """f-strings, % / + concatenation and .format() build strings from runtime values"""
+        if isinstance(node, ast.JoinedStr):
+            return any(isinstance(v, ast.FormattedValue) for v in node.values)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Mod, ast.Add)):
+            return True
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'format':
+            return True
+        return False
+
+    @staticmethod
+    def _string_literals(node: ast.AST) -> List[str]:
+        return [n.value for n in ast.walk(node) if isinstance(n, ast.Constant) and isinstance(n.value, str)]
+
+    @classmethod
+    def _uses_user_input(cls, node: ast.AST) -> bool:
+        """Whether any argument expression reads request or user-supplied data"""
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and any(name in child.id.lower() for name in USER_INPUT_NAMES):
+                return True
+            if isinstance(child, ast.Call) and cls._call_name(child) in USER_INPUT_CALLS:
+                return True
+            if isinstance(child, ast.Attribute):
+                dotted = ast.unparse(child)
+                if any(dotted == root or dotted.startswith(root + '.') for root in USER_INPUT_ROOTS):
+                    return True
+        return False
+
+    def _call_arguments_use_user_input(self, node: ast.Call) -> bool:
+        return any(self._uses_user_input(arg) for arg in node.args + [kw.value for kw in node.keywords])
+
+    def _check_dangerous_call(self, node: ast.Call):
+        name = self._call_name(node)
+        if name in ('eval', 'exec', 'compile', '__import__'):
+            self.report('dangerous_functions', node, f'Dangerous function call: {name}()',
+                        issue_type='dangerous_function')
+        elif name == 'os.system':
+            self.report('command_injection', node, 'Potential command injection with os.system()')
+        elif name.startswith('subprocess.'):
+            uses_shell = any(kw.arg == 'shell' and isinstance(kw.value, ast.Constant) and kw.value.value is True
+                             for kw in node.keywords)
+            if uses_shell:
+                self.report('command_injection', node, f'{name}() called with shell=True')
+            elif name == 'subprocess.call':
+                self.report('dangerous_functions', node, 'Process execution with subprocess.call()')
+
+    def _check_sql_call(self, node: ast.Call):
+        if not self._call_name(node).endswith('.execute') or not node.args:
+            return
+        query = node.args[0]
+        if self._is_dynamic_string(query):
+            literals = ' '.join(self._string_literals(query)).lower()
+            if any(keyword in literals for keyword in SQL_KEYWORDS) or '%' in literals or not literals:
+                self.report('sql_injection', node, 'SQL query built from runtime values; use parameters')
+                self._sql_reported.update(id(child) for child in ast.walk(query))
+
+    def _check_sql_string(self, node: ast.AST):
+        """SQL statements assembled from runtime values outside a direct execute() call"""
+        if id(node) in self._sql_reported or not self._is_dynamic_string(node):
+            return
+        if SQL_STATEMENT.search(' '.join(self._string_literals(node))):
+            self.report('sql_injection', node, 'SQL statement built from runtime values; use parameters')
+            self._sql_reported.update(id(child) for child in ast.walk(node))
+
+    def _check_markup_call(self, node: ast.Call):
+        name = self._call_name(node).split('.')[-1]
+        if name in ('render_template_string', 'Markup') and node.args and self._is_dynamic_string(node.args[0]):
+            self.report('xss_vulnerabilities', node, f'{name}() rendered from a dynamically built string')
+
+    def _check_file_call(self, node: ast.Call):
+        name = self._call_name(node)
+        if name in ('open', 'os.path.join') and any('..' in s for s in self._string_literals(node)):
+            self.report('file_operations', node, f'Path traversal sequence passed to {name}()')
+        elif name == 'open' and self._call_arguments_use_user_input(node):
+            self.report('file_operations', node, 'File opened from a user-supplied path')
+
+    def _check_deserialization_call(self, node: ast.Call):
+        name = self._call_name(node)
+        if name in ('pickle.load', 'pickle.loads', 'marshal.loads'):
+            self.report('deserialization', node, f'Untrusted data deserialized with {name}()')
+        elif name == 'yaml.load':
+            safe_loader = any(kw.arg == 'Loader' and 'Safe' in ast.unparse(kw.value) for kw in node.keywords)
+            if not safe_loader:
+                self.report('deserialization', node, 'yaml.load() without SafeLoader')
+        elif name == 'json.loads' and self._call_arguments_use_user_input(node):
+            self.report('deserialization', node, 'User input deserialized with json.loads() without validation')
+
+    def _check_secret_literal(self, node: ast.Constant):
+        if isinstance(node.value, str) and len(node.value) > 20:
+            lowered = node.value.lower()
+            if any(keyword in lowered for keyword in SECRET_KEYWORDS):
+                self.report('hardcoded_secrets', node, 'Potential hardcoded secret detected',
+                            issue_type='hardcoded_secret')
+
+    def _check_secret_value(self, name: str, value: Optional[ast.AST], node: ast.AST) -> bool:
+        """Report a string literal stored under a secret-looking name; True when reported"""
+        if not (isinstance(value, ast.Constant) and isinstance(value.value, str)):
+            return False
+        for secret_name, min_length in SECRET_NAME_MIN_LENGTHS.items():
+            if secret_name in name.lower() and len(value.value) >= min_length:
+                self.report('hardcoded_secrets', node, f'Hardcoded value assigned to {name}')
+                return True
+        return False
+
+    def _check_secret_assignment(self, node: ast.AST):
+        # Assign has several targets, AnnAssign (password: str = '...') exactly one
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        for target in targets:
+            target_name = target.id if isinstance(target, ast.Name) else getattr(target, 'attr', '')
+            if self._check_secret_value(target_name, node.value, node):
+                return
+
+    def _check_secret_keyword(self, node: ast.keyword):
+        if node.arg:
+            self._check_secret_value(node.arg, node.value, node)
+
+    def _check_secret_dict(self, node: ast.Dict):
+        for key, value in zip(node.keys, node.values):
+            if isinstance(key, ast.Constant) and isinstance(key.value, str):
+                self._check_secret_value(key.value, value, key)
 
 class SecurityAnalyzer:
     def __init__(self):
@@ -45,15 +228,31 @@ class SecurityAnalyzer:
                 r'json\.loads\s*\([^)]*user_input',
             ]
         }
+        
+        # Template and browser markup inside string literals is opaque to the AST
+        self.text_patterns = {
+            'xss_vulnerabilities': [
+                r'return\s+[^|]*\|safe',
+                r'innerHTML\s*=\s*[^;]*[{\[]',
+            ]
+        }
+        
+        self._text_scanner = PatternScanner(self.text_patterns)
+        self._fallback_scanner = PatternScanner(self.security_patterns)
     
     def analyze_code(self, python_code: str) -> Dict[str, Any]:
         """Analyze Python code for security vulnerabilities"""
         issues = []
         
         try:
-            # Parse the code to check for AST-level issues
+            # One AST pass; each node is only handed to the rules registered for its type
             tree = ast.parse(python_code)
-            issues.extend(self._analyze_ast(tree))
+            visitor = SecurityRuleVisitor(self, python_code.split('\n'))
+            visitor.visit(tree)
+            issues.extend(visitor.issues)
+            
+            # Regex rules only for what the AST cannot see (markup inside strings)
+            text_scanner = self._text_scanner
         except SyntaxError as e:
             issues.append({
                 'type': 'syntax_error',
@@ -62,11 +261,15 @@ class SecurityAnalyzer:
                 'message': f'Syntax error: {str(e)}',
                 'recommendation': 'Fix syntax errors before deployment'
             })
+            # Without a tree, fall back to the full pattern table
+            text_scanner = self._fallback_scanner
+        
+        for line_num, pattern_type, line, _ in text_scanner.scan(python_code):
+            issues.append(self._make_issue(
+                pattern_type, line_num, f'Potential {pattern_type.replace("_", " ")} vulnerability', line
+            ))
         
-        # Pattern-based analysis
-        lines = python_code.split('\n')
-        for line_num, line in enumerate(lines, 1):
-            issues.extend(self._analyze_line(line, line_num))
+        issues.sort(key=lambda issue: issue['line'] or 0)
         
         # Generate security score
         security_score = self._calculate_security_score(issues)
@@ -88,66 +291,20 @@ class SecurityAnalyzer:
             'recommendations': self._generate_recommendations(issues)
         }
     
-    def _analyze_ast(self, tree: ast.AST) -> List[Dict[str, Any]]:
-        """Analyze AST for security issues"""
-        issues = []
-        
-        for node in ast.walk(tree):
-            # Check for dangerous function calls
-            if isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name):
-                    if node.func.id in ['eval', 'exec', 'compile']:
-                        issues.append({
-                            'type': 'dangerous_function',
-                            'severity': 'high',
-                            'line': getattr(node, 'lineno', 0),
-                            'message': f'Dangerous function call: {node.func.id}()',
-                            'recommendation': f'Avoid using {node.func.id}(). Use safer alternatives.'
-                        })
-                
-                elif isinstance(node.func, ast.Attribute):
-                    if (isinstance(node.func.value, ast.Name) and 
-                        node.func.value.id == 'os' and 
-                        node.func.attr == 'system'):
-                        issues.append({
-                            'type': 'command_injection',
-                            'severity': 'high',
-                            'line': getattr(node, 'lineno', 0),
-                            'message': 'Potential command injection with os.system()',
-                            'recommendation': 'Use subprocess with shell=False instead'
-                        })
-            
-            # Check for hardcoded strings that might be secrets
-            if isinstance(node, ast.Str) and len(node.s) > 20:
-                if any(keyword in node.s.lower() for keyword in ['password', 'secret', 'key', 'token']):
-                    issues.append({
-                        'type': 'hardcoded_secret',
-                        'severity': 'medium',
-                        'line': getattr(node, 'lineno', 0),
-                        'message': 'Potential hardcoded secret detected',
-                        'recommendation': 'Use environment variables for secrets'
-                    })
-        
-        return issues
-    
-    def _analyze_line(self, line: str, line_num: int) -> List[Dict[str, Any]]:
-        """Analyze a single line for security patterns"""
-        issues = []
-        
-        for pattern_type, patterns in self.security_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    severity = self._get_severity_for_pattern_type(pattern_type)
-                    issues.append({
-                        'type': pattern_type,
-                        'severity': severity,
-                        'line': line_num,
-                        'message': f'Potential {pattern_type.replace("_", " ")} vulnerability',
-                        'code_snippet': line.strip(),
-                        'recommendation': self._get_recommendation_for_pattern_type(pattern_type)
-                    })
-        
-        return issues
+    def _make_issue(self, pattern_type: str, line_num: int, message: str, line: str = None,
+                    issue_type: Optional[str] = None) -> Dict[str, Any]:
+        """Build an issue dict with the severity and recommendation for its pattern type"""
+        issue = {
+            # AST findings keep the identifiers report consumers already key on
+            'type': issue_type or pattern_type,
+            'severity': self._get_severity_for_pattern_type(pattern_type),
+            'line': line_num,
+            'message': message,
+            'recommendation': self._get_recommendation_for_pattern_type(pattern_type)
+        }
+        if line is not None:
+            issue['code_snippet'] = line.strip()
+        return issue
     
     def _get_severity_for_pattern_type(self, pattern_type: str) -> str:
         """Get severity level for different pattern types"""
@@ -432,13 +589,13 @@ class SecurityAnalyzer:
         """Generate general security recommendations"""
         recommendations = []
         
-        if any(i['type'] == 'dangerous_functions' for i in issues):
+        if any(i['type'] in ('dangerous_functions', 'dangerous_function') for i in issues):
             recommendations.append('Replace dangerous functions (eval, exec) with safer alternatives')
         
         if any(i['type'] == 'sql_injection' for i in issues):
             recommendations.append('Implement parameterized queries for all database operations')
         
-        if any(i['type'] == 'hardcoded_secrets' for i in issues):
+        if any(i['type'] in ('hardcoded_secrets', 'hardcoded_secret') for i in issues):
             recommendations.append('Move all secrets to environment variables')
         
         if any(i['type'] == 'xss_vulnerabilities' for i in issues):
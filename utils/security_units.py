@@ -0,0 +1,108 @@
+import ast
+import hashlib
+from typing import Dict, List, Any, Optional, Tuple
+from utils.php_chunker import PHPChunker
+
+SEVERITY_WEIGHTS = {'critical': 25, 'high': 15, 'medium': 8, 'low': 3}
+
+class CodeUnitSplitter:
+    """Split source into top-level functions/classes plus the module-level code between them"""
+
+    def __init__(self):
+        self.php_chunker = PHPChunker()
+
+    def split(self, code: str, language: str) -> List[Dict[str, Any]]:
+        """Return units as dicts with kind, name, start_line (1-based), code and hash"""
+        lines = code.split('\n')
+        if language.lower() == 'php':
+            declarations = self._php_declarations(code)
+        else:
+            declarations = self._python_declarations(code)
+
+        units = []
+        next_line = 1
+        for start, end, kind, name in declarations:
+            if start < next_line:
+                # Overlapping ranges (several declarations on one line) stay in the previous unit
+                if units and end >= next_line:
+                    self._extend(units[-1], lines, end, language)
+                    next_line = end + 1
+                continue
+            self._add_unit(units, lines, next_line, start - 1, 'script', None, language)
+            self._add_unit(units, lines, start, end, kind, name, language)
+            next_line = end + 1
+        self._add_unit(units, lines, next_line, len(lines), 'script', None, language)
+        return units
+
+    @staticmethod
+    def normalize(code: str) -> str:
+        """Ignore trailing whitespace and line-ending differences when hashing a unit"""
+        return '\n'.join(line.rstrip() for line in code.replace('\r\n', '\n').split('\n'))
+
+    @classmethod
+    def unit_hash(cls, code: str, language: str) -> str:
+        return hashlib.sha256(f'{language.lower()}\n{cls.normalize(code)}'.encode('utf-8')).hexdigest()
+
+    def _add_unit(self, units: List[Dict[str, Any]], lines: List[str], start: int, end: int,
+                  kind: str, name: Optional[str], language: str):
+        """Append lines start..end (1-based, inclusive) as a unit, trimming blank edge lines"""
+        while start <= end and not lines[start - 1].strip():
+            start += 1
+        while end >= start and not lines[end - 1].strip():
+            end -= 1
+        if start > end:
+            return
+        unit_code = '\n'.join(lines[start - 1:end])
+        units.append({
+            'kind': kind,
+            'name': name,
+            'start_line': start,
+            'end_line': end,
+            'code': unit_code,
+            'hash': self.unit_hash(unit_code, language)
+        })
+
+    def _extend(self, unit: Dict[str, Any], lines: List[str], end: int, language: str):
+        unit['end_line'] = end
+        unit['code'] = '\n'.join(lines[unit['start_line'] - 1:end])
+        unit['hash'] = self.unit_hash(unit['code'], language)
+
+    @staticmethod
+    def _python_declarations(code: str) -> List[Tuple[int, int, str, str]]:
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            # Unparsable code is analyzed as a single unit
+            return []
+
+        declarations = []
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                kind = 'class' if isinstance(node, ast.ClassDef) else 'function'
+                declarations.append((start, node.end_lineno, kind, node.name))
+        return declarations
+
+    def _php_declarations(self, code: str) -> List[Tuple[int, int, str, str]]:
+        declarations = []
+        for start, end, kind, name in self.php_chunker._find_declarations(code):
+            start_line = code.count('\n', 0, start) + 1
+            end_line = code.count('\n', 0, max(start, end - 1)) + 1
+            declarations.append((start_line, end_line, kind, name))
+        return declarations
+
+def build_delta_document(units: List[Dict[str, Any]]) -> Tuple[str, List[int]]:
+    """Join units into one document, returning it and the line each unit starts on"""
+    parts = []
+    offsets = []
+    line = 1
+    for unit in units:
+        offsets.append(line)
+        parts.append(unit['code'])
+        line += unit['code'].count('\n') + 2
+    return '\n\n'.join(parts), offsets
+
+def score_issues(issues: List[Dict[str, Any]]) -> int:
+    """Security score for a merged report, weighted by issue severity"""
+    penalty = sum(SEVERITY_WEIGHTS.get(str(issue.get('severity', '')).lower(), 8) for issue in issues)
+    return max(0, 100 - penalty)
@@ -1,8 +1,87 @@
+import re
+import bisect
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+from utils.report_cache import SecurityReportCache
+from utils.security_units import CodeUnitSplitter, build_delta_document, score_issues
+
+class PatternScanner:
+    """Compiled vulnerability patterns scanned over a whole document in one pass.
+
+    A combined, line-bounded alternation finds the lines where any pattern
+    matches. Only those lines are then checked against the individual patterns,
+    so results equal a per-line re.search over every pattern. Patterns whose
+    required literal keyword is absent from the document are left out of the
+    combined scan entirely.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]]):
+        # (vuln_type, compiled per-line pattern, required lowercase keyword or None)
+        self.entries: List[Tuple[str, re.Pattern, Optional[str]]] = []
+        self._line_bounded: List[str] = []
+        for vuln_type, pattern_list in patterns.items():
+            for pattern in pattern_list:
+                self.entries.append((vuln_type, re.compile(pattern, re.IGNORECASE), self._required_keyword(pattern)))
+                self._line_bounded.append(self._bound_to_line(pattern))
+        self._combined_cache: Dict[Tuple[int, ...], re.Pattern] = {}
+
+    def scan(self, code: str) -> List[Tuple[int, str, str, str]]:
+        """Return (line_number, vuln_type, line, pattern) for every pattern matching a line"""
+        # casefold() mirrors how re.IGNORECASE compares characters
+        folded = code.casefold()
+        active = tuple(i for i, (_, _, keyword) in enumerate(self.entries)
+                       if keyword is None or keyword in folded)
+        if not active:
+            return []
+
+        combined = self._combined(active)
+        line_starts = [0] + [m.end() for m in re.finditer('\n', code)]
+
+        candidate_lines = []
+        for match in combined.finditer(code):
+            line_index = bisect.bisect_right(line_starts, match.start()) - 1
+            if not candidate_lines or candidate_lines[-1] != line_index:
+                candidate_lines.append(line_index)
+
+        results = []
+        for line_index in candidate_lines:
+            start = line_starts[line_index]
+            end = line_starts[line_index + 1] - 1 if line_index + 1 < len(line_starts) else len(code)
+            line = code[start:end]
+            for i in active:
+                vuln_type, compiled, _ = self.entries[i]
+                if compiled.search(line):
+                    results.append((line_index + 1, vuln_type, line, compiled.pattern))
+        return results
+
+    def _combined(self, active: Tuple[int, ...]) -> re.Pattern:
+        combined = self._combined_cache.get(active)
+        if combined is None:
+            combined = re.compile('|'.join(f'(?:{self._line_bounded[i]})' for i in active), re.IGNORECASE)
+            self._combined_cache[active] = combined
+        return combined
+
+    @staticmethod
+    def _bound_to_line(pattern: str) -> str:
+        """Keep whitespace and negated classes from matching across newlines"""
+        return pattern.replace('[^', '[^\\n').replace('\\s', '[^\\S\\n]')
+
+    @staticmethod
+    def _required_keyword(pattern: str) -> Optional[str]:
+        """Longest literal word every match must contain, or None if it cannot be derived safely"""
+        stripped = re.sub(r'\\.', ' ', pattern)
+        if '|' in stripped or '?' in stripped or '(' in stripped:
+            return None
+        stripped = re.sub(r'\[[^\]]*\]', ' ', stripped)
+        words = re.findall(r'[A-Za-z_]{3,}', stripped)
+        # A word directly followed by a quantifier does not have its last letter guaranteed
+        words = [w for w in words if not re.search(re.escape(w) + r'[*+{]', stripped)]
+        return max(words, key=len).lower() if words else None
 
 class SimpleSecurityAnalyzer:
-    def __init__(self):
+    def __init__(self, report_cache: Optional[SecurityReportCache] = None):
+        self.report_cache = report_cache
+        self.unit_splitter = CodeUnitSplitter()
         self.php_patterns = {
             'sql_injection': [
                 r'\$_GET\[.*\].*mysql_query',
@@ -55,6 +134,12 @@ class SimpleSecurityAnalyzer:
                 r'marshal\.loads\s*\('
             ]
         }
+        
+        # Compile the pattern tables once instead of on every analysis
+        self._scanners = {
+            'php': PatternScanner(self.php_patterns),
+            'python': PatternScanner(self.python_patterns)
+        }
 
     def analyze_code_security(self, code: str, language: str, model: str, ai_service) -> Dict[str, Any]:
         """Simple security analysis for PHP or Python code"""
@@ -64,8 +149,19 @@ class SimpleSecurityAnalyzer:
             
             # Try AI analysis first if available
             if ai_service and ai_service.api_key and model:
+                if self.report_cache:
+                    cached = self.report_cache.get(code, language, model)
+                    if cached is not None:
+                        return cached
                 try:
-                    return self._ai_security_analysis(code, language, model, ai_service)
+                    if self.report_cache:
+                        report = self._incremental_ai_analysis(code, language, model, ai_service)
+                    else:
+                        report = self._ai_security_analysis(code, language, model, ai_service)
+                    # Text-format fallbacks carry no issue list, so only parsed reports are kept
+                    if self.report_cache and 'raw_analysis' not in report:
+                        self.report_cache.set(code, language, model, report)
+                    return report
                 except Exception as e:
                     logging.warning(f"AI analysis failed: {str(e)}, falling back to pattern matching")
             
@@ -129,7 +225,7 @@ Python Code:
             {"role": "user", "content": prompt}
         ]
         
-        response = ai_service._make_chat_request(messages, model)
+        response = ai_service._make_chat_request(messages, model, cache_namespace='security')
         
         # Try to parse JSON response
         import json
@@ -151,27 +247,115 @@ Python Code:
             # Fallback if JSON parsing fails
             return self._parse_ai_text_response(response, language)
 
+    def _incremental_ai_analysis(self, code: str, language: str, model: str, ai_service) -> Dict[str, Any]:
+        """AI analysis that only sends functions/classes whose source changed since they were last analyzed"""
+        units = self.unit_splitter.split(code, language)
+        findings_by_hash: Dict[str, Dict[str, Any]] = {}
+        changed: Dict[str, Dict[str, Any]] = {}
+
+        for unit in units:
+            if unit['hash'] in findings_by_hash or unit['hash'] in changed:
+                continue
+            findings = self.report_cache.get_unit(unit['hash'], model)
+            if findings is None:
+                changed[unit['hash']] = unit
+            else:
+                findings_by_hash[unit['hash']] = findings
+
+        assessment = None
+        unattributed: List[Dict[str, Any]] = []
+        if changed:
+            changed_units = list(changed.values())
+            delta_code, offsets = build_delta_document(changed_units)
+            delta_report = self._ai_security_analysis(delta_code, language, model, ai_service)
+            if 'raw_analysis' in delta_report:
+                # Nothing can be attributed to units without a parsed issue list, and a text
+                # report on the changed units says nothing about the rest of the file
+                if delta_code == code:
+                    return delta_report
+                return self._ai_security_analysis(code, language, model, ai_service)
+
+            unit_findings, unattributed = self._split_delta_findings(delta_report, changed_units, offsets)
+            for unit, findings in zip(changed_units, unit_findings):
+                self.report_cache.set_unit(unit['hash'], model, findings)
+                findings_by_hash[unit['hash']] = findings
+
+            if len(changed_units) == len(units):
+                assessment = delta_report.get('overall_assessment')
+
+        issues = []
+        recommendations = []
+        for unit in units:
+            findings = findings_by_hash[unit['hash']]
+            for issue in findings['issues']:
+                # Stored lines are relative to the unit; shift them to where the unit is now
+                issue = dict(issue)
+                if issue.get('line') is not None:
+                    issue['line'] = unit['start_line'] + issue['line'] - 1
+                issues.append(issue)
+            for recommendation in findings['recommendations']:
+                if recommendation not in recommendations:
+                    recommendations.append(recommendation)
+        # Findings no unit owns belong to this report only; caching them per unit would keep them forever
+        issues.extend(unattributed)
+
+        reused = len(units) - sum(1 for unit in units if unit['hash'] in changed)
+        return {
+            "vulnerabilities_found": len(issues),
+            "security_score": score_issues(issues),
+            "overall_assessment": assessment or f"Re-analyzed {len(units) - reused} of {len(units)} code units; "
+                                                f"{reused} unchanged units reused from earlier analysis",
+            "issues": issues,
+            "recommendations": recommendations or self._get_recommendations(language),
+            "language": language.upper(),
+            "incremental": {"units": len(units), "reanalyzed": len(units) - reused, "reused": reused}
+        }
+
+    def _split_delta_findings(self, report: Dict[str, Any], units: List[Dict[str, Any]],
+                              offsets: List[int]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Attribute issues from a multi-unit report back to their units, with unit-relative lines.
+
+        Returns the per-unit findings and the issues without a line inside any unit.
+        """
+        recommendations = [r for r in report.get('recommendations', []) if isinstance(r, str)]
+        findings = [{'issues': [], 'recommendations': recommendations} for _ in units]
+        unattributed = []
+
+        for issue in report.get('issues', []):
+            if not isinstance(issue, dict):
+                continue
+            issue = dict(issue)
+            try:
+                line = int(issue.get('line'))
+            except (TypeError, ValueError):
+                line = None
+
+            index = bisect.bisect_right(offsets, line) - 1 if line is not None else -1
+            if index >= 0 and line < offsets[index] + units[index]['code'].count('\n') + 1:
+                issue['line'] = line - offsets[index] + 1
+                findings[index]['issues'].append(issue)
+            else:
+                # Lines outside any unit (or missing) cannot be remapped later
+                issue['line'] = None
+                unattributed.append(issue)
+
+        return findings, unattributed
+
     def _pattern_security_analysis(self, code: str, language: str) -> Dict[str, Any]:
         """Pattern-based security analysis"""
-        import re
-        
-        patterns = self.php_patterns if language.lower() == 'php' else self.python_patterns
+        scanner = self._scanners['php' if language.lower() == 'php' else 'python']
         issues = []
-        lines = code.split('\n')
         
-        for line_num, line in enumerate(lines, 1):
-            for vuln_type, pattern_list in patterns.items():
-                for pattern in pattern_list:
-                    if re.search(pattern, line, re.IGNORECASE):
-                        issues.append({
-                            "type": vuln_type,
-                            "severity": "Medium",
-                            "line": line_num,
-                            "title": f"Potential {vuln_type.replace('_', ' ').title()}",
-                            "description": f"Found pattern that may indicate {vuln_type.replace('_', ' ')}",
-                            "fix": f"Review and secure this {vuln_type.replace('_', ' ')} vulnerability",
-                            "code_snippet": line.strip()
-                        })
+        for line_num, vuln_type, line, _ in scanner.scan(code):
+            issues.append({
+                "type": vuln_type,
+                "severity": "Medium",
+                "line": line_num,
+                "title": f"Potential {vuln_type.replace('_', ' ').title()}",
+                "description": f"Found pattern that may indicate {vuln_type.replace('_', ' ')}",
+                "fix": f"Review and secure this {vuln_type.replace('_', ' ')} vulnerability",
+                "code_snippet": line.strip()
+            })
         
         # Calculate score
         score = max(50, 100 - (len(issues) * 15))
@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import site
+import hashlib
+import tempfile
+from typing import Dict, Any, Optional
+from utils.response_cache import ResponseCache
+
+class TestResultCache:
+    """Test run results keyed by code, tests, interpreter and executor configuration"""
+
+    def __init__(self, store: ResponseCache):
+        self.store = store
+        self.runtime = f'{sys.implementation.name}-{sys.version}:pytest-{self._pytest_version()}'
+
+    @classmethod
+    def from_env(cls) -> Optional['TestResultCache']:
+        """Build a result cache from TEST_CACHE_* environment variables, or None when disabled"""
+        if os.environ.get('TEST_CACHE_ENABLED', '1').lower() in ('0', 'false', 'no'):
+            return None
+
+        db_path = os.environ.get(
+            'TEST_CACHE_PATH',
+            os.path.join(tempfile.gettempdir(), 'php2py_test_results.sqlite3')
+        )
+        store = ResponseCache(
+            db_path=db_path or None,
+            ttl=int(os.environ.get('TEST_CACHE_TTL', str(24 * 3600))),
+            memory_entries=int(os.environ.get('TEST_CACHE_MEMORY_ENTRIES', '128')),
+            max_disk_bytes=int(os.environ.get('TEST_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        )
+        return cls(store)
+
+    @staticmethod
+    def _pytest_version() -> str:
+        try:
+            from importlib.metadata import version
+            return version('pytest')
+        except Exception:
+            return 'unknown'
+
+    @staticmethod
+    def _packages_stamp() -> int:
+        """Changes whenever a package is installed or removed (e.g. by install_dependencies)"""
+        directories = list(site.getsitepackages()) + [site.getusersitepackages()]
+        stamp = 0
+        for directory in directories:
+            try:
+                stamp = max(stamp, os.stat(directory).st_mtime_ns)
+            except OSError:
+                continue
+        return stamp
+
+    def key(self, python_code: str, test_code: str, config: Dict[str, Any]) -> str:
+        """Key for one run; config holds the executor settings that can change its outcome"""
+        return ResponseCache.make_key({
+            'code': hashlib.sha256(python_code.encode('utf-8')).hexdigest(),
+            'tests': hashlib.sha256(test_code.encode('utf-8')).hexdigest(),
+            'runtime': self.runtime,
+            'packages': self._packages_stamp(),
+            'config': config
+        })
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored results for this run, or None"""
+        cached = self.store.get(key)
+        if cached is None:
+            return None
+        results = json.loads(cached)
+        results['cached'] = True
+        return results
+
+    def set(self, key: str, results: Dict[str, Any]):
+        self.store.set(key, json.dumps({k: v for k, v in results.items() if k != 'cached'}))
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()